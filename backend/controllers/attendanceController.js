@@ -172,6 +172,10 @@ exports.markAttendance = asyncHandler(async (req, res) => {
       }
       
       // For other errors, fail the request for security
+      if (error.response?.status === 503 && error.response.headers?.['retry-after']) {
+        // ML service is shedding load - pass its back-off hint on to the client
+        res.set('Retry-After', error.response.headers['retry-after']);
+      }
       return res.status(503).json({
         success: false,
         message: 'Face verification service temporarily unavailable. Please try again.'
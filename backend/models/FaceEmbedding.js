@@ -1,5 +1,30 @@
 const mongoose = require('mongoose');
 
+// Packed little-endian embeddings written by the ML service (EMBEDDING_STORAGE)
+const BINARY_EMBEDDING_VERSIONS = {
+  facenet_v1_f32le: 4,
+  facenet_v1_f16le: 2
+};
+const EMBEDDING_DIMENSIONS = [128, 512];
+
+// Raw bytes of a binary embedding (Buffer or BSON Binary), or null for arrays
+const embeddingBytes = function(value) {
+  if (Buffer.isBuffer(value)) return value;
+  if (value && value._bsontype === 'Binary') return Buffer.from(value.buffer);
+  return null;
+};
+
+// IEEE 754 half precision to number
+const halfToFloat = function(bits) {
+  const sign = bits & 0x8000 ? -1 : 1;
+  const exponent = (bits >> 10) & 0x1f;
+  const fraction = bits & 0x03ff;
+
+  if (exponent === 0) return sign * Math.pow(2, -14) * (fraction / 1024);
+  if (exponent === 0x1f) return fraction ? NaN : sign * Infinity;
+  return sign * Math.pow(2, exponent - 15) * (1 + fraction / 1024);
+};
+
 const FaceEmbeddingSchema = new mongoose.Schema({
   userId: {
     type: String,
@@ -8,13 +33,23 @@ const FaceEmbeddingSchema = new mongoose.Schema({
     ref: 'User'
   },
   embedding: {
-    type: [Number],
+    // Array of numbers, or packed float32/float16 binary (see embedding_version)
+    type: mongoose.Schema.Types.Mixed,
     required: true,
     validate: {
-      validator: function(arr) {
-        return arr.length === 128 || arr.length === 512; // Support both 128-D and 512-D embeddings
+      validator: function(value) {
+        if (Array.isArray(value)) {
+          // Support both 128-D and 512-D embeddings
+          return EMBEDDING_DIMENSIONS.includes(value.length) && value.every(Number.isFinite);
+        }
+
+        const bytes = embeddingBytes(value);
+        if (!bytes) return false;
+
+        const itemSize = BINARY_EMBEDDING_VERSIONS[this.embedding_version];
+        return Boolean(itemSize) && EMBEDDING_DIMENSIONS.includes(bytes.length / itemSize);
       },
-      message: 'Embedding must be either 128 or 512 dimensions'
+      message: 'Embedding must be either 128 or 512 dimensions, as an array or packed binary matching embedding_version'
     }
   },
   embedding_version: {
@@ -131,9 +166,30 @@ FaceEmbeddingSchema.statics.cleanupOldEmbeddings = async function(userId, keepCo
   }
 };
 
+// Method to read the embedding as numbers, whichever form it is stored in
+FaceEmbeddingSchema.methods.getEmbeddingVector = function() {
+  const bytes = embeddingBytes(this.embedding);
+  if (!bytes) return this.embedding;
+
+  const itemSize = BINARY_EMBEDDING_VERSIONS[this.embedding_version];
+  if (!itemSize) {
+    throw new Error(`Unknown binary embedding version: ${this.embedding_version}`);
+  }
+
+  const vector = new Float32Array(bytes.length / itemSize);
+  for (let i = 0; i < vector.length; i++) {
+    vector[i] = itemSize === 4
+      ? bytes.readFloatLE(i * 4)
+      : halfToFloat(bytes.readUInt16LE(i * 2));
+  }
+  return vector;
+};
+
 // Method to calculate cosine similarity with another embedding
 FaceEmbeddingSchema.methods.calculateSimilarity = function(otherEmbedding) {
-  if (this.embedding.length !== otherEmbedding.length) {
+  const embedding = this.getEmbeddingVector();
+
+  if (embedding.length !== otherEmbedding.length) {
     throw new Error('Embeddings must have the same dimension');
   }
   
@@ -141,9 +197,9 @@ FaceEmbeddingSchema.methods.calculateSimilarity = function(otherEmbedding) {
   let normA = 0;
   let normB = 0;
   
-  for (let i = 0; i < this.embedding.length; i++) {
-    dotProduct += this.embedding[i] * otherEmbedding[i];
-    normA += this.embedding[i] * this.embedding[i];
+  for (let i = 0; i < embedding.length; i++) {
+    dotProduct += embedding[i] * otherEmbedding[i];
+    normA += embedding[i] * embedding[i];
     normB += otherEmbedding[i] * otherEmbedding[i];
   }
   
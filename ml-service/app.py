@@ -1,19 +1,40 @@
-from fastapi import FastAPI, HTTPException, File, UploadFile, Body
+from fastapi import FastAPI, HTTPException, File, UploadFile, Body, Form, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from starlette.websockets import WebSocketState
 from pydantic import BaseModel, Field
 from typing import Optional, List
 import uvicorn
+import asyncio
+import functools
+import importlib
+import logging
 import os
+import sys
+import time
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-# Import custom modules
-from models.face_encoder import FaceEncoder
-from models.face_matcher import FaceMatcher
-from utils.image_processor import ImageProcessor
+from utils.logging_config import configure_logging
+from utils.startup import StartupTracker
+
+# Leveled structured logging (LOG_LEVEL, LOG_FORMAT)
+configure_logging()
+logger = logging.getLogger(__name__)
+startup_tracker = StartupTracker()
+
+# Import custom modules (torch, OpenCV and the models are imported by load_models)
+from models.batch_scheduler import BatchScheduler
+from models.weights import FACENET_EMBEDDING_SIZE
 from utils.db_helper import DatabaseHelper
+from utils.executor import InferenceExecutor
+from utils.timing import StageStats, StageTimer
+from utils.ann_index import EmbeddingIndex
+from utils.result_cache import FaceResultCache, content_hash
+from utils.admission import AdmissionController, AdmissionRejected
+from utils import metrics
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -31,12 +52,58 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize components
-face_encoder = FaceEncoder()
+# Initialize components (model components are created by load_models)
+face_encoder = None
+batch_scheduler = None
+face_matcher = None
+image_processor = None
 threshold = float(os.getenv('FACE_SIMILARITY_THRESHOLD', '0.70'))
-face_matcher = FaceMatcher(threshold=threshold)
-image_processor = ImageProcessor()
-db_helper = DatabaseHelper()
+db_helper = DatabaseHelper(embedding_dim=FACENET_EMBEDDING_SIZE)
+inference_executor = InferenceExecutor(on_in_flight=metrics.EXECUTOR_IN_FLIGHT.set)
+stage_stats = StageStats(on_record=metrics.observe_stage)
+result_cache = FaceResultCache()
+admission = AdmissionController(on_wait=metrics.observe_queue_wait, on_load=metrics.observe_admission_load)
+identity_index = EmbeddingIndex(dim=FACENET_EMBEDDING_SIZE)
+identity_index_path = os.getenv('ANN_INDEX_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'cache', 'face_index.npz'))
+identity_index_state = {'ready': False, 'training': False}
+verify_batch_max_items = int(os.getenv('VERIFY_BATCH_MAX_ITEMS', 64))
+group_min_face_probability = float(os.getenv('GROUP_MIN_FACE_PROBABILITY', '0.90'))
+startup_mode = os.getenv('STARTUP_MODE', 'blocking').lower()
+warmup_iterations = int(os.getenv('WARMUP_ITERATIONS', 1))
+stream_max_frames = int(os.getenv('STREAM_MAX_FRAMES', 10))
+stream_timeout_seconds = float(os.getenv('STREAM_TIMEOUT_SECONDS', 15))
+identity_index_retry_seconds = float(os.getenv('IDENTITY_INDEX_RETRY_SECONDS', 5))
+identity_index_retry_max_seconds = float(os.getenv('IDENTITY_INDEX_RETRY_MAX_SECONDS', 300))
+
+# Served while the models are still loading; everything else answers 503
+STARTUP_EXEMPT_PATHS = ('/', '/live', '/ready', '/health', '/metrics', '/docs', '/redoc', '/openapi.json')
+HEAVY_MODULES = ('torch', 'torchvision', 'cv2', 'facenet_pytorch')
+
+@app.middleware("http")
+async def track_requests(request: Request, call_next):
+    """Count in-flight requests and time each one by route"""
+    start = time.perf_counter()
+    status = 500
+    metrics.IN_FLIGHT.inc()
+    try:
+        if not startup_tracker.ready and request.url.path not in STARTUP_EXEMPT_PATHS:
+            status = 503
+            return JSONResponse(
+                status_code=503,
+                content={"detail": f"Model is {startup_tracker.state.replace('_', ' ')}. Please retry shortly."},
+                headers={"Retry-After": "5"}
+            )
+        
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        metrics.IN_FLIGHT.dec()
+        route = request.scope.get('route')
+        metrics.REQUEST_SECONDS.labels(
+            endpoint=route.path if route is not None else 'unmatched',
+            status=str(status)
+        ).observe(time.perf_counter() - start)
 
 # Pydantic models
 class ExtractEmbeddingRequest(BaseModel):
@@ -45,11 +112,366 @@ class ExtractEmbeddingRequest(BaseModel):
 class VerifyFaceRequest(BaseModel):
     userId: str = Field(..., description="User ID")
     image: str = Field(..., description="Base64 encoded image")
+    include_scores: bool = Field(False, description="Score every stored pattern and return all_similarities")
+
+class IdentifyFaceRequest(BaseModel):
+    image: str = Field(..., description="Base64 encoded image")
+    top_k: int = Field(5, ge=1, le=50, description="Number of candidate users to return")
+
+class VerifyBatchItem(BaseModel):
+    userId: str = Field(..., description="User ID")
+    image: str = Field(..., description="Base64 encoded image")
+
+class VerifyBatchRequest(BaseModel):
+    items: Optional[List[VerifyBatchItem]] = Field(None, max_length=verify_batch_max_items, description="(userId, image) pairs, one face per image")
+    image: Optional[str] = Field(None, description="Base64 encoded group image")
+    userIds: Optional[List[str]] = Field(None, max_length=verify_batch_max_items, description="Users expected in the group image")
 
 class CompareEmbeddingsRequest(BaseModel):
     embedding1: List[float] = Field(..., description="First embedding vector")
     embedding2: List[float] = Field(..., description="Second embedding vector")
 
+async def train_identity_index():
+    """Retrain the ANN index in the worker pool and persist it"""
+    if identity_index_state['training']:
+        return
+    
+    identity_index_state['training'] = True
+    try:
+        await inference_executor.run(identity_index.train)
+        await inference_executor.run(identity_index.save, identity_index_path)
+        logger.info("Identification index trained", extra={'index': identity_index.get_stats()})
+    except Exception as e:
+        logger.error(f"Error training identification index: {str(e)}")
+    finally:
+        identity_index_state['training'] = False
+
+def on_embedding_change(user_id, embedding_id, document=None):
+    """Keep the identification index in sync with face_embeddings writes"""
+    identity_index.on_change(user_id, embedding_id, document)
+    
+    if identity_index_state['ready'] and identity_index.needs_training():
+        asyncio.get_running_loop().create_task(train_identity_index())
+
+async def sync_identity_index():
+    """
+    Load the persisted index and reconcile it with the active embeddings in MongoDB
+    
+    If MongoDB cannot be read, the loaded snapshot is kept as it is, the index
+    stays not ready (/identify-face answers 503) and the reconciliation is
+    retried with exponential backoff.
+    """
+    loaded = None
+    delay = identity_index_retry_seconds
+    
+    while not identity_index_state['ready']:
+        try:
+            if loaded is None:
+                loaded = await inference_executor.run(identity_index.load, identity_index_path)
+            
+            await reconcile_identity_index(loaded)
+            
+        except Exception as e:
+            logger.error(f"Error building identification index, retrying in {delay:.0f}s: {str(e)}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, identity_index_retry_max_seconds)
+
+async def reconcile_identity_index(loaded):
+    """Bring the index in line with the active embeddings in MongoDB and mark it ready"""
+    owners = await db_helper.get_active_embedding_owners()
+    
+    if owners is None:
+        raise RuntimeError("active embeddings could not be listed")
+    
+    indexed = identity_index.ids()
+    missing = [embedding_id for embedding_id in owners if embedding_id not in indexed]
+    documents = await db_helper.get_embeddings_by_ids(missing)
+    
+    if documents is None:
+        raise RuntimeError("missing embeddings could not be fetched")
+    
+    # Only a complete owners listing may drop vectors from the snapshot
+    for embedding_id in indexed - owners.keys():
+        identity_index.remove(embedding_id)
+    
+    if documents:
+        await inference_executor.run(
+            identity_index.add_many,
+            [str(doc['_id']) for doc in documents],
+            [doc['userId'] for doc in documents],
+            [doc['embedding'] for doc in documents]
+        )
+    
+    if identity_index.needs_training():
+        await inference_executor.run(identity_index.train)
+    
+    if documents or not loaded:
+        await inference_executor.run(identity_index.save, identity_index_path)
+    
+    identity_index_state['ready'] = True
+    logger.info(
+        f"Identification index ready ({'loaded from disk' if loaded else 'built'}, {len(documents)} added)",
+        extra={'index': identity_index.get_stats()}
+    )
+
+def load_models(prefork=False):
+    """
+    Import the ML stack, load the models and run the warm-up pass (blocking)
+    
+    Every heavy import and model load is timed on startup_tracker, and the
+    service only reports ready once the warm-up inference has run.
+    
+    Args:
+        prefork: bool, stop after loading the weights (gunicorn master, see
+                 preload_models); the worker's own call finishes the rest
+    """
+    global face_encoder, batch_scheduler, face_matcher, image_processor
+    
+    if startup_tracker.ready:
+        return
+    
+    if face_encoder is None:
+        startup_tracker.set_state('loading')
+        for module in HEAVY_MODULES:
+            if module in sys.modules:
+                continue
+            with startup_tracker.measure(f"import_{module}"):
+                importlib.import_module(module)
+        
+        with startup_tracker.measure('import_models'):
+            from models.face_encoder import FaceEncoder
+            from models.face_matcher import FaceMatcher
+            from utils.image_processor import ImageProcessor
+        
+        with startup_tracker.measure('face_encoder'):
+            encoder = FaceEncoder(defer_backend=True, on_detect=metrics.observe_face_detection)
+        
+        if not encoder.is_loaded():
+            raise RuntimeError("FaceNet model failed to load")
+        
+        image_processor = ImageProcessor(on_gate=metrics.observe_quality_gate)
+        face_matcher = FaceMatcher(threshold=threshold)
+        face_encoder = encoder
+    
+    if prefork:
+        return
+    
+    face_encoder.ensure_backend()
+    for component, elapsed_ms in face_encoder.load_timings.items():
+        startup_tracker.record(component[:-len('_ms')], elapsed_ms)
+    
+    if face_encoder.backend is None:
+        raise RuntimeError("FaceNet inference backend failed to load")
+    
+    scheduler = BatchScheduler(face_encoder, on_flush=metrics.observe_forward_pass, on_queue=metrics.QUEUE_DEPTH.inc)
+    
+    if warmup_iterations > 0:
+        startup_tracker.set_state('warming_up')
+        startup_tracker.record('warm_up', face_encoder.warm_up(sorted({1, scheduler.max_batch_size}), warmup_iterations))
+    
+    batch_scheduler = scheduler
+    batch_scheduler.start()
+    
+    startup_tracker.set_state('ready')
+    logger.info("ML service ready", extra={'startup': startup_tracker.get_stats()})
+
+def preload_models():
+    """
+    Load the model weights in the gunicorn master before it forks workers
+    
+    Workers inherit the weights and share their pages copy-on-write instead
+    of each loading a copy. Nothing here runs inference or starts threads,
+    which do not survive fork: each worker creates its inference backend,
+    warms up and starts its batch scheduler in its own startup.
+    """
+    import gc
+    
+    with startup_tracker.measure('import_torch'):
+        import torch
+    
+    # Keep the master from starting an OpenMP pool that forked workers would inherit
+    torch.set_num_threads(1)
+    load_models(prefork=True)
+    
+    # Objects alive now are never collected, so GC does not dirty their shared pages
+    gc.freeze()
+    logger.info("Model weights preloaded for pre-forked workers", extra={'startup': startup_tracker.get_stats()})
+
+def configure_worker(worker_count):
+    """
+    Divide per-host resources across pre-forked workers (gunicorn post_fork)
+    
+    - torch / OpenCV intra-op threads: TORCH_NUM_THREADS, else CPU cores / workers
+    - MongoDB connections: MONGODB_MAX_POOL_SIZE is the budget for all workers
+    
+    Args:
+        worker_count: int, number of worker processes
+    """
+    import cv2
+    import torch
+    
+    worker_count = max(1, worker_count)
+    threads = int(os.getenv('TORCH_NUM_THREADS', 0)) or max(1, (os.cpu_count() or 1) // worker_count)
+    torch.set_num_threads(threads)
+    cv2.setNumThreads(threads)
+    
+    db_helper.reconnect(max_pool_size=max(1, int(os.getenv('MONGODB_MAX_POOL_SIZE', 50)) // worker_count))
+    logger.info(
+        "Worker configured",
+        extra={'pid': os.getpid(), 'workers': worker_count, 'torch_threads': threads, 'mongo_pool_size': db_helper.max_pool_size}
+    )
+
+async def initialize_models():
+    """Load the models off the event loop, recording a failure instead of crashing"""
+    try:
+        await asyncio.to_thread(load_models)
+    except Exception as e:
+        startup_tracker.fail(e)
+        logger.exception(f"Error loading models: {str(e)}")
+
+@app.on_event("startup")
+async def startup():
+    db_helper.add_change_listener(on_embedding_change)
+    db_helper.start_change_watcher()
+    db_helper.start_migration()
+    asyncio.get_running_loop().create_task(db_helper.check_indexes())
+    asyncio.get_running_loop().create_task(sync_identity_index())
+    
+    if startup_mode == 'background':
+        # Bind the port now: /live answers immediately, /ready once warm
+        asyncio.get_running_loop().create_task(initialize_models())
+    else:
+        await initialize_models()
+
+@app.on_event("shutdown")
+async def shutdown():
+    if batch_scheduler is not None:
+        batch_scheduler.stop()
+    await db_helper.stop_change_watcher()
+    await db_helper.stop_migration()
+    if identity_index_state['ready']:
+        identity_index.save(identity_index_path)
+    inference_executor.shutdown(wait=False)
+
+def _detect_and_preprocess(image, timer, tracker=None):
+    """
+    Detect and align the face (runs in the worker pool)
+    
+    Times MTCNN as the 'detect' stage and crop/resize as 'preprocess'; the crop
+    is normalized later, straight into the batch buffer of its forward pass.
+    With a session tracker, frames whose box was propagated from the last
+    detection are timed as 'track' instead of 'detect'.
+    """
+    if tracker is None:
+        with timer.measure('detect'):
+            face_box, probability = face_encoder.detect(image)
+        tracked = False
+    else:
+        started = time.perf_counter()
+        face_box, probability, tracked = tracker.detect(image)
+        timer.record('track' if tracked else 'detect', (time.perf_counter() - started) * 1000.0)
+    
+    if face_box is None:
+        return None
+    
+    with timer.measure('preprocess'):
+        face = face_encoder.align_face(image, face_box)
+    
+    if face is None:
+        return None
+    
+    return {
+        'box': face_box,
+        'probability': probability,
+        'tracked': tracked,
+        'face': face
+    }
+
+def _check_and_correct(image, check_face_size=True):
+    """
+    Run the quality gate and apply the corrections it asks for (runs in the worker pool)
+    
+    Returns:
+        tuple: (image to detect on, quality gate result)
+    """
+    quality = image_processor.check_quality(image, check_face_size)
+    
+    if quality['passed'] and quality['corrections']:
+        image = image_processor.apply_corrections(image, quality)
+    
+    return image, quality
+
+async def quality_gate(image, endpoint, timer, check_face_size=True):
+    """
+    Reject blurry, badly lit or too distant frames before any CNN inference
+    
+    Returns:
+        numpy array: image to detect on (lighting/contrast corrected if the gate asked for it)
+    
+    Raises:
+        HTTPException: 400 with an actionable message when the frame is rejected
+    """
+    image, quality = await inference_executor.run(_check_and_correct, image, check_face_size, timer=timer, stage='quality')
+    
+    if not quality['passed']:
+        raise reject(endpoint, quality['reason'], 400, quality['message'])
+    
+    return image
+
+def _detect_all_faces(image, max_faces):
+    """Detect and align every face in a group image (the scheduler normalizes the crops into its batch buffer)"""
+    return face_encoder.detect_and_align_all(image, max_faces=max_faces, min_probability=group_min_face_probability)
+
+async def detect_and_embed(image, timer, tracker=None, decode_scale=1.0):
+    """
+    Detect the face in the worker pool and queue its embedding on the batch scheduler
+    
+    Args:
+        tracker: optional FaceTracker of a streaming session, to skip detection between frames
+        decode_scale: float, ImageProcessor.decode_scale of the image, kept with the (cached) result
+            so boxes can be reported in the uploaded image's coordinates
+    
+    Returns:
+        dict: {'box', 'probability', 'tracked', 'face', 'embedding', 'decode_scale'} or None if no face
+    """
+    result = await inference_executor.run(_detect_and_preprocess, image, timer, tracker)
+    
+    if result is None:
+        return None
+    
+    result['decode_scale'] = decode_scale
+    result['embedding'] = await timer.measure_async('embed', asyncio.wrap_future(batch_scheduler.submit(result['face'])))
+    return result
+
+async def embed_faces_batched(faces, timer):
+    """
+    Embed many aligned crops through the batch scheduler
+    
+    Forward passes stay within BATCH_MAX_SIZE however many faces a request
+    brings (a group photo may have 128), bounding activation memory.
+    
+    Returns:
+        list: embeddings in the order of faces
+    """
+    futures = [asyncio.wrap_future(batch_scheduler.submit(face)) for face in faces]
+    return await timer.measure_async('embed', asyncio.gather(*futures))
+
+async def decode_unless_cached(data, timer):
+    """
+    Look the image up in the result cache, decoding it in the worker pool only on a miss
+    
+    Returns:
+        tuple: (image_hash, cached result or None, decoded image or None)
+    """
+    image_hash = content_hash(data)
+    cached = result_cache.get(image_hash)
+    
+    if cached is not None:
+        return image_hash, cached, None
+    
+    image = await inference_executor.run(image_processor.decode_bytes, data, timer=timer, stage='decode')
+    return image_hash, None, image
+
 # Health check endpoint
 @app.get("/")
 async def root():
@@ -65,54 +487,157 @@ async def health_check():
     return {
         "success": True,
         "status": "healthy",
-        "model_loaded": face_encoder.is_loaded(),
-        "embedding_size": face_encoder.get_embedding_size()
+        "model_loaded": face_encoder is not None and face_encoder.is_loaded(),
+        "embedding_size": FACENET_EMBEDDING_SIZE,
+        "startup_state": startup_tracker.state
     }
 
-# Extract face embedding from image
-@app.post("/extract-embedding")
-async def extract_embedding(request: ExtractEmbeddingRequest):
+@app.get("/live")
+async def live():
     """
-    Extract face embedding from a base64 encoded image
+    Liveness probe: the process is up and its event loop responds (models may still be loading)
+    """
+    if startup_tracker.state == 'failed':
+        return JSONResponse(status_code=503, content={"success": False, "status": "failed", "error": startup_tracker.error})
+    
+    return {"success": True, "status": "alive"}
+
+@app.get("/ready")
+async def ready():
+    """
+    Readiness probe: models loaded and warmed up, with per-component import/load times
+    """
+    return JSONResponse(
+        status_code=200 if startup_tracker.ready else 503,
+        content={"success": startup_tracker.ready, "data": startup_tracker.get_stats()}
+    )
+
+RAW_IMAGE_CONTENT_TYPES = ('application/octet-stream', 'image/jpeg', 'image/png')
+
+async def read_upload(file):
+    """Read a multipart image upload into a single bytes buffer"""
+    data = await file.read()
+    
+    if not data:
+        raise HTTPException(status_code=400, detail="Empty image upload")
+    
+    return data
+
+async def read_raw_body(request):
+    """Read an application/octet-stream (or image/*) request body"""
+    content_type = request.headers.get('content-type', '').split(';')[0].strip().lower()
+    
+    if content_type not in RAW_IMAGE_CONTENT_TYPES:
+        raise HTTPException(status_code=415, detail=f"Unsupported content type '{content_type}', expected one of {', '.join(RAW_IMAGE_CONTENT_TYPES)}")
+    
+    data = await request.body()
+    
+    if not data:
+        raise HTTPException(status_code=400, detail="Empty request body")
+    
+    return data
+
+def reject(endpoint, outcome, status_code, detail, headers=None):
+    """Count a failed request outcome and build the HTTPException to raise"""
+    metrics.record_outcome(endpoint, outcome)
+    return HTTPException(status_code=status_code, detail=detail, headers=headers)
+
+def admission_controlled(endpoint):
+    """
+    Run an inference pipeline only once the admission controller grants a slot
+    
+    Requests that cannot be queued are answered at once with 503 and
+    Retry-After instead of piling up behind the ones already running.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            try:
+                await admission.acquire(endpoint)
+            except AdmissionRejected as e:
+                raise reject(
+                    endpoint, e.reason, 503, "Face recognition service is busy. Please retry shortly.",
+                    headers={"Retry-After": str(e.retry_after)}
+                )
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                admission.release()
+        return wrapper
+    return decorator
+
+def payload_bytes(payload, endpoint, timer):
+    """
+    Encoded image bytes of a request payload
+    
+    Args:
+        payload: base64 string (decoded here) or raw image bytes
+        endpoint: str, endpoint name for outcome metrics
+        timer: StageTimer, records the 'base64_decode' stage
+    """
+    if not isinstance(payload, str):
+        return payload
+    
+    with timer.measure('base64_decode'):
+        data = image_processor.base64_to_bytes(payload)
+    
+    if not data:
+        raise reject(endpoint, 'invalid_image', 400, "Invalid image format")
+    
+    return data
+
+@admission_controlled('extract_embedding')
+async def run_extract_embedding(payload):
+    """
+    Shared /extract-embedding pipeline for base64, multipart and raw uploads
+    
+    Args:
+        payload: base64 string or raw image bytes
     """
     try:
-        # Decode base64 image
-        image = image_processor.decode_base64(request.image)
-        
-        # Validate image
-        if not image_processor.is_valid_image(image):
-            raise HTTPException(status_code=400, detail="Invalid image format")
-        
-        # Detect face
-        face_detected = face_encoder.detect_face(image)
+        timer = StageTimer(stage_stats)
+        data = payload_bytes(payload, 'extract_embedding', timer)
         
-        if face_detected is None:
-            raise HTTPException(status_code=400, detail="No face detected in image")
+        # Repeated frames reuse the cached result; otherwise decode the image
+        image_hash, result, image = await decode_unless_cached(data, timer)
         
-        # Extract embedding
-        embedding = face_encoder.extract_embedding(image)
+        if result is None:
+            # Validate image
+            if not image_processor.is_valid_image(image):
+                raise reject('extract_embedding', 'invalid_image', 400, "Invalid image format")
+            
+            image = await quality_gate(image, 'extract_embedding', timer)
+            
+            # Detect face and extract embedding in a single MTCNN pass
+            result = await detect_and_embed(image, timer, decode_scale=image_processor.decode_scale(data, image))
+            
+            if result is None:
+                raise reject('extract_embedding', 'no_face', 400, "No face detected in image")
+            
+            result_cache.put(image_hash, result)
+            cached = False
+        else:
+            cached = True
         
-        if embedding is None:
-            raise HTTPException(status_code=400, detail="Failed to extract face embedding")
+        face_detected = result['box']
+        embedding = result['embedding']
         
-        # Calculate quality score
-        quality_score = face_encoder.calculate_quality_score(face_detected)
+        # Quality score from the detection probability (face size if the detector reports none)
+        quality_score = face_encoder.calculate_quality_score(face_detected, result['probability'])
         
-        # Get face metadata
+        # Get face metadata (in the uploaded image's coordinates, even when it was reduced while decoding)
+        face_box = face_box_dict(face_detected, result['decode_scale'])
         metadata = {
             "face_size": {
-                "width": int(face_detected[2] - face_detected[0]),
-                "height": int(face_detected[3] - face_detected[1])
+                "width": face_box['x2'] - face_box['x1'],
+                "height": face_box['y2'] - face_box['y1']
             },
             "detection_confidence": float(quality_score),
-            "face_box": {
-                "x1": int(face_detected[0]),
-                "y1": int(face_detected[1]),
-                "x2": int(face_detected[2]),
-                "y2": int(face_detected[3])
-            }
+            "face_box": face_box
         }
         
+        metrics.record_outcome('extract_embedding', 'success')
+        
         return {
             "success": True,
             "message": "Face embedding extracted successfully",
@@ -120,14 +645,141 @@ async def extract_embedding(request: ExtractEmbeddingRequest):
                 "embedding": embedding.tolist(),
                 "quality_score": float(quality_score),
                 "face_detected": True,
-                "metadata": metadata
+                "metadata": metadata,
+                "image_hash": image_hash,
+                "cached": cached,
+                "timings_ms": timer.as_dict()
             }
         }
         
     except HTTPException as e:
         raise e
     except Exception as e:
-        print(f"Error in extract_embedding: {str(e)}")
+        metrics.record_outcome('extract_embedding', 'error')
+        logger.exception(f"Error in extract_embedding: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+# Extract face embedding from image
+@app.post("/extract-embedding")
+async def extract_embedding(request: ExtractEmbeddingRequest):
+    """
+    Extract face embedding from a base64 encoded image
+    """
+    return await run_extract_embedding(request.image)
+
+@app.post("/extract-embedding/upload")
+async def extract_embedding_upload(file: UploadFile = File(..., description="Image file")):
+    """
+    Extract face embedding from a multipart image upload
+    """
+    return await run_extract_embedding(await read_upload(file))
+
+@app.post("/extract-embedding/raw")
+async def extract_embedding_raw(request: Request):
+    """
+    Extract face embedding from raw image bytes sent as application/octet-stream
+    """
+    return await run_extract_embedding(await read_raw_body(request))
+
+@admission_controlled('verify_face')
+async def run_verify_face(user_id, payload, include_scores=False):
+    """
+    Shared /verify-face pipeline for base64, multipart and raw uploads
+    
+    Args:
+        user_id: str, user to verify against
+        payload: base64 string or raw image bytes
+        include_scores: bool, score every pattern even when the centroid decides
+    """
+    try:
+        logger.debug("Face verification request", extra={'user_id': user_id})
+        timer = StageTimer(stage_stats)
+        data = payload_bytes(payload, 'verify_face', timer)
+        
+        # Fetch stored embeddings (cached) while the image is decoded in the worker pool
+        gallery, (image_hash, result, image) = await asyncio.gather(
+            timer.measure_async('db_fetch', db_helper.get_user_gallery(user_id)),
+            decode_unless_cached(data, timer)
+        )
+        
+        if len(gallery) == 0:
+            logger.info("No face embeddings found for user", extra={'user_id': user_id})
+            raise reject('verify_face', 'not_enrolled', 404, "No face embeddings found for this user. Please register your face first.")
+        
+        cached = result is not None
+        
+        if not cached:
+            if image is None:
+                raise reject('verify_face', 'invalid_image', 400, "Failed to decode image")
+            
+            # Validate image quality
+            if not image_processor.is_valid_image(image):
+                raise reject('verify_face', 'invalid_image', 400, "Invalid image format or quality")
+            
+            image = await quality_gate(image, 'verify_face', timer)
+            
+            # Extract embedding from captured image using CNN
+            result = await detect_and_embed(image, timer, decode_scale=image_processor.decode_scale(data, image))
+            
+            if result is None:
+                logger.info("No face detected in captured image", extra={'user_id': user_id})
+                raise reject('verify_face', 'no_face', 400, "No face detected in captured image. Please ensure your face is clearly visible.")
+            
+            result_cache.put(image_hash, result)
+        
+        captured_embedding = result['embedding']
+        threshold = float(os.getenv('SIMILARITY_THRESHOLD', '0.70'))
+        
+        # Reject on the user's centroid template when no pattern can match; otherwise score every pattern
+        with timer.measure('match'):
+            verdict = face_matcher.match_template(captured_embedding, gallery, threshold, full_scores=include_scores)
+        
+        similarities = verdict['similarities']
+        best_similarity = verdict['similarity']
+        avg_similarity = verdict['avg_similarity']
+        is_match = verdict['match']
+        best_match = gallery.embedding_ids[verdict['best_index']] if verdict['best_index'] is not None else None
+        
+        if similarities is not None and logger.isEnabledFor(logging.DEBUG):
+            for idx, similarity in enumerate(similarities):
+                logger.debug("Pattern %d: similarity=%.4f (quality: %.2f)", idx + 1, similarity, gallery.quality_scores[idx])
+        
+        metrics.record_outcome('verify_face', 'match' if is_match else 'no_match')
+        logger.info("Face verification completed", extra={
+            'user_id': user_id,
+            'match': is_match,
+            'similarity': round(best_similarity, 4),
+            'avg_similarity': round(avg_similarity, 4),
+            'threshold': threshold,
+            'patterns_compared': len(gallery),
+            'match_stage': verdict['stage'],
+            'cached': cached,
+            'timings_ms': timer.as_dict()
+        })
+        
+        return {
+            "success": True,
+            "message": "Face verification completed using CNN-based recognition",
+            "data": {
+                "match": is_match,
+                "similarity": float(best_similarity),
+                "avg_similarity": float(avg_similarity),
+                "threshold": threshold,
+                "matched_embedding_id": best_match if best_match and is_match else None,
+                "patterns_compared": len(gallery),
+                "all_similarities": [float(s) for s in similarities] if similarities is not None else None,
+                "centroid_similarity": verdict['centroid_similarity'],
+                "match_stage": verdict['stage'],
+                "cached": cached,
+                "timings_ms": timer.as_dict()
+            }
+        }
+        
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        metrics.record_outcome('verify_face', 'error')
+        logger.exception(f"Error in verify_face: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 # Verify face against stored embeddings
@@ -136,91 +788,528 @@ async def verify_face(request: VerifyFaceRequest):
     """
     Verify a face image against stored embeddings for a user using CNN-based FaceNet model
     """
-    try:
-        print(f"\n🔍 Face verification request for user: {request.userId}")
+    return await run_verify_face(request.userId, request.image, request.include_scores)
+
+@app.post("/verify-face/upload")
+async def verify_face_upload(
+    userId: str = Form(..., description="User ID"),
+    file: UploadFile = File(..., description="Image file"),
+    include_scores: bool = Form(False, description="Score every stored pattern and return all_similarities")
+):
+    """
+    Verify a multipart image upload against stored embeddings for a user
+    """
+    return await run_verify_face(userId, await read_upload(file), include_scores)
+
+@app.post("/verify-face/raw")
+async def verify_face_raw(request: Request, userId: str, include_scores: bool = False):
+    """
+    Verify raw image bytes (application/octet-stream) against stored embeddings;
+    the user is passed as the userId query parameter
+    """
+    return await run_verify_face(userId, await read_raw_body(request), include_scores)
+
+async def verify_stream_frame(data, gallery, threshold, tracker=None):
+    """
+    Verify one streamed frame against the session's gallery
+    
+    Args:
+        tracker: the session's FaceTracker, so most frames skip face detection
+    
+    Returns:
+        tuple: ('frame' message fields, match verdict or None if no face was matched)
+    """
+    timer = StageTimer(stage_stats)
+    image_hash, result, image = await decode_unless_cached(data, timer)
+    
+    if result is None:
+        if image is None or not image_processor.is_valid_image(image):
+            return {"status": "invalid_image", "message": "Invalid image format"}, None
         
-        # Get stored embeddings from database
-        stored_embeddings = await db_helper.get_user_embeddings(request.userId)
+        image, quality = await inference_executor.run(_check_and_correct, image, timer=timer, stage='quality')
         
-        if not stored_embeddings:
-            print(f"❌ No face embeddings found for user: {request.userId}")
-            raise HTTPException(status_code=404, detail="No face embeddings found for this user. Please register your face first.")
+        if not quality['passed']:
+            return {"status": quality['reason'], "message": quality['message'], "timings_ms": timer.as_dict()}, None
         
-        print(f"✅ Found {len(stored_embeddings)} stored face embedding(s) for user")
+        result = await detect_and_embed(image, timer, tracker, image_processor.decode_scale(data, image))
         
-        # Decode base64 image
-        image = image_processor.decode_base64(request.image)
+        if result is None:
+            return {"status": "no_face", "message": "No face detected. Please ensure your face is clearly visible.", "timings_ms": timer.as_dict()}, None
         
-        if image is None:
-            raise HTTPException(status_code=400, detail="Failed to decode image")
+        result_cache.put(image_hash, result)
+    
+    with timer.measure('match'):
+        verdict = face_matcher.match_template(result['embedding'], gallery, threshold)
+    
+    return {
+        "status": "match" if verdict['match'] else "no_match",
+        "similarity": verdict['similarity'],
+        "avg_similarity": verdict['avg_similarity'],
+        "match_stage": verdict['stage'],
+        "tracked": bool(result.get('tracked')),
+        "timings_ms": timer.as_dict()
+    }, verdict
+
+async def receive_stream_frames(websocket, session):
+    """
+    Keep only the newest frame sent by the client
+    
+    A frame still waiting when the next one arrives is replaced (and counted
+    as skipped), so a slow pipeline always works on the latest frame instead
+    of a growing backlog. The text message "stop" ends the session early.
+    """
+    try:
+        while True:
+            message = await websocket.receive()
+            
+            if message['type'] == 'websocket.disconnect':
+                session['disconnected'] = True
+                break
+            
+            if message.get('bytes'):
+                if session['frame'] is not None:
+                    session['skipped'] += 1
+                    metrics.STREAM_FRAMES.labels(result='skipped').inc()
+                session['frame'] = message['bytes']
+                session['received'] += 1
+                session['event'].set()
+            elif (message.get('text') or '').strip().lower() == 'stop':
+                break
+    finally:
+        session['done'] = True
+        session['event'].set()
+
+# Streaming verification: binary frames in, decision out as soon as one matches
+@app.websocket("/ws/verify-face")
+async def verify_face_stream(websocket: WebSocket, userId: str, max_frames: Optional[int] = None):
+    """
+    Verify a user from a stream of binary JPEG/PNG frames over a WebSocket
+    
+    The gallery is loaded once per session and frames are verified as they
+    arrive (skipping frames that pile up under load). Every processed frame is
+    answered with a 'frame' message carrying its similarity or the quality
+    gate's advice; the session ends with a 'result' message as soon as a frame
+    matches, or when the frame budget (max_frames, at most STREAM_MAX_FRAMES)
+    or STREAM_TIMEOUT_SECONDS runs out.
+    """
+    await websocket.accept()
+    
+    if not startup_tracker.ready:
+        await websocket.send_json({"type": "error", "reason": "not_ready", "message": "Model is still loading. Please retry shortly."})
+        await websocket.close(code=1013)
+        return
+    
+    started = time.perf_counter()
+    threshold = float(os.getenv('SIMILARITY_THRESHOLD', '0.70'))
+    frame_budget = max(1, min(max_frames or stream_max_frames, stream_max_frames))
+    
+    gallery = await db_helper.get_user_gallery(userId)
+    
+    if len(gallery) == 0:
+        metrics.record_outcome('verify_stream', 'not_enrolled')
+        await websocket.send_json({"type": "error", "reason": "not_enrolled", "message": "No face embeddings found for this user. Please register your face first."})
+        await websocket.close()
+        return
+    
+    from models.face_tracker import FaceTracker  # needs OpenCV, imported by load_models
+    
+    session = {'frame': None, 'received': 0, 'skipped': 0, 'done': False, 'disconnected': False, 'event': asyncio.Event()}
+    tracker = FaceTracker(face_encoder.detect)
+    receiver = asyncio.create_task(receive_stream_frames(websocket, session))
+    
+    processed = 0
+    best = None
+    reason = 'frame_budget'
+    
+    try:
+        deadline = started + stream_timeout_seconds
+        while processed < frame_budget:
+            try:
+                await asyncio.wait_for(session['event'].wait(), max(0.0, deadline - time.perf_counter()))
+            except asyncio.TimeoutError:
+                reason = 'timeout'
+                break
+            
+            session['event'].clear()
+            data, session['frame'] = session['frame'], None
+            
+            if data is None:
+                if session['done']:
+                    reason = 'client_stopped'
+                    break
+                continue
+            
+            # Shed frames, not sessions, when the service is overloaded
+            try:
+                await admission.acquire('verify_stream')
+            except AdmissionRejected as e:
+                metrics.STREAM_FRAMES.labels(result='busy').inc()
+                await websocket.send_json({"type": "frame", "status": "busy", "retry_after": e.retry_after})
+                continue
+            
+            try:
+                fields, verdict = await verify_stream_frame(data, gallery, threshold, tracker)
+            finally:
+                admission.release()
+            
+            processed += 1
+            metrics.STREAM_FRAMES.labels(result=fields['status']).inc()
+            await websocket.send_json({"type": "frame", "frame": processed, **fields})
+            
+            if verdict is not None and (best is None or verdict['similarity'] > best['similarity']):
+                best = verdict
+            
+            if verdict is not None and verdict['match']:
+                reason = 'match'
+                break
         
-        # Validate image quality
-        if not image_processor.is_valid_image(image):
-            raise HTTPException(status_code=400, detail="Invalid image format or quality")
+        is_match = reason == 'match'
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
         
-        # Extract embedding from captured image using CNN
-        print("🤖 Extracting face embedding using FaceNet CNN model...")
-        captured_embedding = face_encoder.extract_embedding(image)
+        metrics.record_outcome('verify_stream', 'match' if is_match else 'no_match')
+        metrics.observe_stream_decision('match' if is_match else 'no_match', elapsed_ms, processed)
         
-        if captured_embedding is None:
-            print("❌ No face detected in captured image")
-            raise HTTPException(status_code=400, detail="No face detected in captured image. Please ensure your face is clearly visible.")
+        result = {
+            "type": "result",
+            "match": is_match,
+            "reason": reason,
+            "similarity": best['similarity'] if best else 0.0,
+            "avg_similarity": best['avg_similarity'] if best else 0.0,
+            "threshold": threshold,
+            "patterns_compared": len(gallery),
+            "frames_received": session['received'],
+            "frames_processed": processed,
+            "frames_skipped": session['skipped'],
+            "tracker": tracker.get_stats(),
+            "elapsed_ms": round(elapsed_ms, 2)
+        }
+        
+        logger.info("Streaming face verification completed", extra={
+            'user_id': userId,
+            'match': is_match,
+            'reason': reason,
+            'similarity': round(result['similarity'], 4),
+            'frames_processed': processed,
+            'frames_skipped': session['skipped'],
+            'detections_saved': result['tracker']['detections_saved'],
+            'elapsed_ms': result['elapsed_ms']
+        })
         
-        print("✅ Face embedding extracted successfully")
+        if not session['disconnected']:
+            await websocket.send_json(result)
+            await websocket.close()
+    
+    except WebSocketDisconnect:
+        logger.info("Streaming verification client disconnected", extra={'user_id': userId, 'frames_processed': processed})
+    except Exception as e:
+        metrics.record_outcome('verify_stream', 'error')
+        logger.exception(f"Error in verify_face_stream: {str(e)}")
+        # The client may have gone away mid-frame; closing again would raise
+        if not session['disconnected'] and websocket.client_state == WebSocketState.CONNECTED:
+            await websocket.close(code=1011)
+    finally:
+        # Retrieve the receiver's outcome so its errors are not left unobserved
+        receiver.cancel()
+        await asyncio.gather(receiver, return_exceptions=True)
+
+# Identify a face against every enrolled user (1:N)
+@app.post("/identify-face")
+@admission_controlled('identify_face')
+async def identify_face(request: IdentifyFaceRequest):
+    """
+    Find the enrolled users most similar to the face in the image (kiosk-mode check-in)
+    """
+    try:
+        if not identity_index_state['ready']:
+            raise reject('identify_face', 'not_ready', 503, "Identification index is still loading. Please retry shortly.")
         
-        # Compare with all stored embeddings using cosine similarity
-        similarities = []
-        best_match = None
-        best_similarity = 0.0
+        timer = StageTimer(stage_stats)
         
-        print(f"📊 Comparing with {len(stored_embeddings)} stored patterns...")
+        data = payload_bytes(request.image, 'identify_face', timer)
+        image_hash, result, image = await decode_unless_cached(data, timer)
         
-        for idx, stored_emb in enumerate(stored_embeddings):
-            similarity = face_matcher.calculate_similarity(
-                captured_embedding,
-                stored_emb['embedding']
-            )
-            similarities.append(similarity)
+        if result is None:
+            if not image_processor.is_valid_image(image):
+                raise reject('identify_face', 'invalid_image', 400, "Invalid image format")
             
-            print(f"   Pattern {idx + 1}: Similarity = {similarity:.4f} (Quality: {stored_emb.get('quality_score', 0):.2f})")
+            image = await quality_gate(image, 'identify_face', timer)
             
-            if similarity > best_similarity:
-                best_similarity = similarity
-                best_match = stored_emb
-        
-        # Calculate average similarity across all patterns
-        avg_similarity = sum(similarities) / len(similarities) if similarities else 0.0
+            result = await detect_and_embed(image, timer, decode_scale=image_processor.decode_scale(data, image))
+            
+            if result is None:
+                raise reject('identify_face', 'no_face', 400, "No face detected in captured image. Please ensure your face is clearly visible.")
+            
+            result_cache.put(image_hash, result)
         
-        # Adaptive threshold: use best match but consider average
-        threshold = float(os.getenv('SIMILARITY_THRESHOLD', '0.70'))
+        with timer.measure('search'):
+            candidates = identity_index.search_users(result['embedding'], top_k=request.top_k)
         
-        # Match if best similarity meets threshold
-        is_match = best_similarity >= threshold
+        threshold = face_matcher.get_threshold()
+        best = candidates[0] if candidates else None
+        is_match = best is not None and best['similarity'] >= threshold
         
-        print(f"\n📈 Verification Results:")
-        print(f"   Best Similarity: {best_similarity:.4f}")
-        print(f"   Avg Similarity: {avg_similarity:.4f}")
-        print(f"   Threshold: {threshold}")
-        print(f"   Match: {'✅ YES' if is_match else '❌ NO'}")
+        metrics.record_outcome('identify_face', 'match' if is_match else 'no_match')
         
         return {
             "success": True,
-            "message": "Face verification completed using CNN-based recognition",
+            "message": "Face identification completed",
             "data": {
                 "match": is_match,
-                "similarity": float(best_similarity),
-                "avg_similarity": float(avg_similarity),
+                "userId": best['userId'] if is_match else None,
+                "similarity": float(best['similarity']) if best else 0.0,
                 "threshold": threshold,
-                "matched_embedding_id": str(best_match['_id']) if best_match and is_match else None,
-                "patterns_compared": len(stored_embeddings),
-                "all_similarities": [float(s) for s in similarities]
+                "candidates": [
+                    {
+                        "userId": candidate['userId'],
+                        "embedding_id": candidate['embedding_id'],
+                        "similarity": float(candidate['similarity'])
+                    }
+                    for candidate in candidates
+                ],
+                "timings_ms": timer.as_dict()
             }
         }
         
     except HTTPException as e:
         raise e
     except Exception as e:
-        print(f"Error in verify_face: {str(e)}")
+        metrics.record_outcome('identify_face', 'error')
+        logger.exception(f"Error in identify_face: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+def face_box_dict(face_box, scale=1.0):
+    """Serialize an (x1, y1, x2, y2) face box, scaled from decoded to uploaded image coordinates"""
+    return {
+        "x1": int(round(face_box[0] * scale)),
+        "y1": int(round(face_box[1] * scale)),
+        "x2": int(round(face_box[2] * scale)),
+        "y2": int(round(face_box[3] * scale))
+    }
+
+def decode_base64_with_scale(payload):
+    """Decode a base64 image (in the worker pool), returning (image, ImageProcessor.decode_scale)"""
+    data = image_processor.base64_to_bytes(payload)
+    image = image_processor.decode_bytes(data) if data else None
+    return image, image_processor.decode_scale(data, image)
+
+def detection_confidence(detection):
+    """
+    Detection confidence of a face, as /extract-embedding reports it
+    
+    Fast detectors without a probability (Haar) fall back to the face-size score.
+    """
+    return float(face_encoder.calculate_quality_score(detection['box'], detection['probability']))
+
+async def verify_pairs(items, timer, threshold):
+    """
+    Verify many (userId, image) pairs: one face per image, batched embedding
+    
+    Returns:
+        list: per-item verification results in request order
+    """
+    user_ids = list(dict.fromkeys(item.userId for item in items))
+    
+    # One gallery query for every user while all images decode in the worker pool
+    galleries, images = await asyncio.gather(
+        timer.measure_async('db_fetch', db_helper.get_user_galleries(user_ids)),
+        timer.measure_async('decode', asyncio.gather(*[
+            inference_executor.run(decode_base64_with_scale, item.image) for item in items
+        ]))
+    )
+    
+    results = [{"index": index, "userId": item.userId, "match": False} for index, item in enumerate(items)]
+    
+    decoded = []
+    decode_scales = {}
+    for result, (image, scale) in zip(results, images):
+        if len(galleries[result['userId']]) == 0:
+            result['error'] = "no_enrolled_face"
+        elif image is None or not image_processor.is_valid_image(image):
+            result['error'] = "invalid_image"
+        else:
+            decode_scales[result['index']] = scale
+            decoded.append((result, image))
+    
+    # Cheap quality gate on every image before any detection
+    gated = await timer.measure_async('quality', asyncio.gather(*[
+        inference_executor.run(_check_and_correct, image) for _, image in decoded
+    ]))
+    
+    pending = []
+    for (result, _), (image, quality) in zip(decoded, gated):
+        if quality['passed']:
+            pending.append((result, image))
+        else:
+            result['error'] = quality['reason']
+            result['message'] = quality['message']
+    
+    # Per-image timers feed the stage histograms; the request records the parallel wall time
+    detections = await timer.measure_async('detect_all', asyncio.gather(*[
+        inference_executor.run(_detect_and_preprocess, image, StageTimer(stage_stats)) for _, image in pending
+    ]))
+    
+    faces = []
+    for (result, _), detection in zip(pending, detections):
+        if detection is None:
+            result['error'] = "no_face_detected"
+        else:
+            faces.append((result, detection))
+    
+    if not faces:
+        return results
+    
+    embeddings = await embed_faces_batched([detection['face'] for _, detection in faces], timer)
+    
+    with timer.measure('match'):
+        columns = {user_id: column for column, user_id in enumerate(user_ids)}
+        scores, best_patterns = face_matcher.user_similarity_matrix(
+            embeddings, [galleries[user_id].matrix for user_id in user_ids]
+        )
+        
+        for row, (result, detection) in enumerate(faces):
+            column = columns[result['userId']]
+            similarity = float(scores[row, column])
+            is_match = similarity >= threshold
+            result.update({
+                "match": is_match,
+                "similarity": similarity,
+                "matched_embedding_id": galleries[result['userId']].embedding_ids[best_patterns[row, column]] if is_match else None,
+                "face_box": face_box_dict(detection['box'], decode_scales[result['index']]),
+                "detection_confidence": detection_confidence(detection)
+            })
+    
+    return results
+
+async def verify_group(image_payload, user_ids, timer, threshold):
+    """
+    Find the expected users among all faces of one group image
+    
+    Returns:
+        tuple: (per-user results, faces detected, boxes of faces left unassigned)
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    
+    galleries, (image, scale) = await asyncio.gather(
+        timer.measure_async('db_fetch', db_helper.get_user_galleries(user_ids)),
+        inference_executor.run(decode_base64_with_scale, image_payload, timer=timer, stage='decode')
+    )
+    
+    if image is None or not image_processor.is_valid_image(image):
+        raise reject('verify_batch', 'invalid_image', 400, "Invalid image format")
+    
+    # Faces in a group photo are small by design, so only blur and lighting are gated
+    image = await quality_gate(image, 'verify_batch', timer, check_face_size=False)
+    
+    detections = await inference_executor.run(
+        _detect_all_faces, image, verify_batch_max_items * 2, timer=timer, stage='detect'
+    )
+    
+    results = []
+    for user_id in user_ids:
+        result = {"userId": user_id, "match": False}
+        if len(galleries[user_id]) == 0:
+            result['error'] = "no_enrolled_face"
+        results.append(result)
+    
+    if not detections:
+        return results, 0, []
+    
+    embeddings = await embed_faces_batched([detection['face'] for detection in detections], timer)
+    
+    with timer.measure('match'):
+        scores, best_patterns = face_matcher.user_similarity_matrix(
+            embeddings, [galleries[user_id].matrix for user_id in user_ids]
+        )
+        assignments = face_matcher.assign(scores, threshold)
+    
+    assigned_faces = set()
+    for row, column, similarity in assignments:
+        user_id = user_ids[column]
+        detection = detections[row]
+        assigned_faces.add(row)
+        results[column].update({
+            "match": True,
+            "similarity": similarity,
+            "matched_embedding_id": galleries[user_id].embedding_ids[best_patterns[row, column]],
+            "face_box": face_box_dict(detection['box'], scale),
+            "detection_confidence": detection_confidence(detection)
+        })
+    
+    # Best (sub-threshold) score for users nobody was assigned to
+    for column, result in enumerate(results):
+        if not result['match'] and 'error' not in result:
+            result['similarity'] = float(scores[:, column].max())
+    
+    unassigned = [face_box_dict(detection['box'], scale) for row, detection in enumerate(detections) if row not in assigned_faces]
+    
+    return results, len(detections), unassigned
+
+# Per-item /verify-batch errors mapped to outcome metric labels
+BATCH_ERROR_OUTCOMES = {
+    'no_enrolled_face': 'not_enrolled',
+    'invalid_image': 'invalid_image',
+    'no_face_detected': 'no_face',
+    'too_dark': 'too_dark',
+    'too_bright': 'too_bright',
+    'face_too_small': 'face_too_small',
+    'too_blurry': 'too_blurry'
+}
+
+# Verify many users at once (burst of frames or one classroom photo)
+@app.post("/verify-batch")
+@admission_controlled('verify_batch')
+async def verify_batch(request: VerifyBatchRequest):
+    """
+    Verify many users in one call, either from (userId, image) pairs or from
+    one group image with the list of expected userIds
+    """
+    try:
+        pairs_mode = bool(request.items)
+        group_mode = bool(request.image)
+        
+        if pairs_mode == group_mode:
+            raise reject('verify_batch', 'invalid_request', 400, "Provide either 'items' or 'image' with 'userIds'")
+        
+        if group_mode and not request.userIds:
+            raise reject('verify_batch', 'invalid_request', 400, "'userIds' is required with a group image")
+        
+        timer = StageTimer(stage_stats)
+        threshold = face_matcher.get_threshold()
+        
+        data = {"mode": "pairs" if pairs_mode else "group", "threshold": threshold}
+        
+        if pairs_mode:
+            results = await verify_pairs(request.items, timer, threshold)
+        else:
+            results, faces_detected, unassigned = await verify_group(request.image, request.userIds, timer, threshold)
+            data["faces_detected"] = faces_detected
+            data["unassigned_faces"] = unassigned
+        
+        data["verified"] = sum(1 for result in results if result['match'])
+        data["results"] = results
+        data["timings_ms"] = timer.as_dict()
+        
+        for result in results:
+            metrics.record_outcome('verify_batch', BATCH_ERROR_OUTCOMES.get(result.get('error'), 'match' if result['match'] else 'no_match'))
+        
+        logger.info("Batch verification completed", extra={
+            'mode': data['mode'],
+            'verified': data['verified'],
+            'users': len(results),
+            'timings_ms': data['timings_ms']
+        })
+        
+        return {
+            "success": True,
+            "message": "Batch face verification completed",
+            "data": data
+        }
+        
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        metrics.record_outcome('verify_batch', 'error')
+        logger.exception(f"Error in verify_batch: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 # Compare two embeddings
@@ -250,9 +1339,54 @@ async def compare_embeddings(request: CompareEmbeddingsRequest):
         }
         
     except Exception as e:
-        print(f"Error in compare_embeddings: {str(e)}")
+        logger.exception(f"Error in compare_embeddings: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+# Inference statistics
+@app.get("/stats")
+async def stats():
+    """
+    Get batching scheduler, worker pool, admission, quality gate, face detection, per-stage timing, gallery, result cache and startup statistics
+    """
+    import torch
+    
+    return {
+        "success": True,
+        "data": {
+            "batch_scheduler": batch_scheduler.get_stats(),
+            "executor": inference_executor.get_stats(),
+            "stages": stage_stats.get_stats(),
+            "gallery_cache": db_helper.gallery_cache.get_stats(),
+            "result_cache": result_cache.get_stats(),
+            "admission": admission.get_stats(),
+            "quality_gate": image_processor.get_quality_stats(),
+            "face_detection": face_encoder.get_detection_stats(),
+            "embedding_watcher": db_helper.change_watcher.mode if db_helper.change_watcher else None,
+            "mongodb": {
+                "read_preference": db_helper.read_preference,
+                "user_status_index": db_helper.indexes_ok,
+                "max_pool_size": db_helper.max_pool_size
+            },
+            "embedding_storage": db_helper.storage_mode,
+            "embedding_migration": db_helper.migrator.get_stats() if db_helper.migrator else None,
+            "identity_index": dict(identity_index.get_stats(), ready=identity_index_state['ready']),
+            "startup": startup_tracker.get_stats(),
+            "process": {
+                "pid": os.getpid(),
+                "torch_threads": torch.get_num_threads()
+            }
+        }
+    }
+
+# Prometheus metrics
+@app.get("/metrics")
+async def prometheus_metrics():
+    """
+    Stage latency histograms, outcome counters and load gauges in the Prometheus text format
+    """
+    payload, content_type = metrics.render_metrics()
+    return Response(content=payload, media_type=content_type)
+
 # Get model information
 @app.get("/model-info")
 async def model_info():
@@ -264,7 +1398,8 @@ async def model_info():
         "data": {
             "model_type": os.getenv('MODEL_TYPE', 'facenet'),
             "embedding_size": face_encoder.get_embedding_size(),
-            "detection_model": os.getenv('FACE_DETECTION_MODEL', 'mtcnn'),
+            "inference_backend": face_encoder.get_backend_name(),
+            "detection_model": face_encoder.get_detection_model(),
             "similarity_threshold": float(os.getenv('SIMILARITY_THRESHOLD', 0.85)),
             "distance_metric": os.getenv('DISTANCE_METRIC', 'cosine')
         }
@@ -275,7 +1410,7 @@ if __name__ == "__main__":
     port = int(os.getenv("PORT", 8000))
     host = os.getenv("HOST", "0.0.0.0")
     
-    print(f"🚀 Starting Face Recognition ML Service on {host}:{port}")
+    logger.info(f"Starting Face Recognition ML Service on {host}:{port}")
     
     uvicorn.run(
         "app:app",
@@ -0,0 +1,111 @@
+"""
+Face detector benchmark
+
+Runs every FACE_DETECTION_MODEL option over a local image set (one face per
+image) and reports per image size:
+  - latency of each fast detector alone and of MTCNN alone
+  - recall (images with exactly one face found / any face found)
+  - for the cascades (fast detector with MTCNN fallback): end-to-end latency,
+    recall, how often the fast detector answered alone and why MTCNN ran
+  - box agreement with MTCNN (mean IoU)
+
+Detectors that cannot be created here (e.g. YuNet without its ONNX model in
+FACE_YUNET_MODEL / MODEL_CACHE_DIR) are reported as unavailable.
+
+Usage (from ml-service/):
+    python -m benchmarks.bench_detectors --images ./faces --output detectors.json
+    python -m benchmarks.bench_detectors --detectors haar --sizes 640x480,1280x720
+"""
+import argparse
+
+import numpy as np
+
+from benchmarks.bench_downscale import box_iou
+from benchmarks.common import load_images, parse_sizes, peak_rss_mb, summarize, time_calls, use_offline_weights, write_report
+
+
+def recall(found, images):
+    """Found faces per image: exactly one and at least one"""
+    return {
+        'single_face': round(sum(count == 1 for count in found) / len(images), 4) if images else None,
+        'any_face': round(sum(count >= 1 for count in found) / len(images), 4) if images else None
+    }
+
+
+def mean_iou(boxes, reference):
+    ious = [box_iou(box, ref) for box, ref in zip(boxes, reference) if box is not None and ref is not None]
+    return round(float(np.mean(ious)), 3) if ious else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', help='directory of face images, one face each (synthetic faces if omitted)')
+    parser.add_argument('--sizes', default='640x480,1280x720')
+    parser.add_argument('--count', type=int, default=4, help='synthetic images per size')
+    parser.add_argument('--detectors', default='haar,yunet', help='fast detectors to compare with MTCNN')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='write the JSON report here')
+    args = parser.parse_args()
+
+    # Detection only: random FaceNet weights, never run
+    use_offline_weights(False)
+
+    from models.face_detector import create_fast_detector
+    from models.face_encoder import FaceEncoder
+
+    encoder = FaceEncoder(defer_backend=True)
+    detectors = {name: create_fast_detector(name, encoder.model_cache_dir) for name in args.detectors.split(',') if name}
+
+    results = []
+    for (width, height), images in load_images(args.images, parse_sizes(args.sizes), args.count).items():
+        size = f"{width}x{height}"
+
+        # MTCNN alone is both the baseline and the reference boxes
+        encoder.fast_detector = None
+        mtcnn_faces = [encoder._detect_all(image) for image in images]
+        mtcnn_boxes = [faces[0][0] if faces else None for faces in mtcnn_faces]
+        results.append(dict(
+            size=size, detector='mtcnn', images=len(images),
+            recall=recall([len(faces) for faces in mtcnn_faces], images),
+            **summarize(time_calls(encoder.detect, images, args.repeat))
+        ))
+
+        for name, detector in detectors.items():
+            if detector is None:
+                results.append({'size': size, 'detector': name, 'available': False})
+                continue
+
+            # Fast detector alone
+            faces = [detector.detect_all(image) for image in images]
+            results.append(dict(
+                size=size, detector=name, images=len(images),
+                recall=recall([len(found) for found in faces], images),
+                mean_iou_vs_mtcnn=mean_iou([found[0][0] if found else None for found in faces], mtcnn_boxes),
+                **summarize(time_calls(detector.detect_all, images, args.repeat))
+            ))
+
+            # Cascade as served: fast detector, MTCNN fallback
+            encoder.fast_detector = detector
+            before = encoder.get_detection_stats()['results']
+            boxes = [encoder.detect(image)[0] for image in images]
+            after = encoder.get_detection_stats()['results']
+            fallbacks = {result: count - before.get(result, 0) for result, count in after.items() if count > before.get(result, 0)}
+            results.append(dict(
+                size=size, detector=f"{name}+mtcnn", images=len(images),
+                recall={'any_face': round(sum(box is not None for box in boxes) / len(images), 4) if images else None},
+                fast_path_rate=round(fallbacks.get('accepted', 0) / len(images), 4) if images else None,
+                results=fallbacks,
+                mean_iou_vs_mtcnn=mean_iou(boxes, mtcnn_boxes),
+                **summarize(time_calls(encoder.detect, images, args.repeat))
+            ))
+
+    write_report({
+        'benchmark': 'detectors',
+        'min_scores': {name: detector.min_score for name, detector in detectors.items() if detector is not None},
+        'results': results,
+        'peak_rss_mb': peak_rss_mb()
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Downscale-before-detect benchmark
+
+Compares full-resolution decode + MTCNN against reduced-resolution JPEG
+decoding (ImageProcessor.decode_bytes) + detection on a DETECTION_MAX_SIZE
+copy, and reports the latency saving per input size.
+
+Usage (from ml-service/):
+    python -m benchmarks.bench_downscale --sizes 1280x720,1920x1080,4000x3000
+    python -m benchmarks.bench_downscale --images ./faces --output downscale.json
+"""
+import argparse
+
+import cv2
+import numpy as np
+
+from benchmarks.common import encode_jpeg, load_images, parse_sizes, peak_rss_mb, summarize, time_calls, write_report
+
+
+def box_iou(a, b):
+    """Intersection over union of two (x1, y1, x2, y2) boxes"""
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, ix2 - ix1) * max(0, iy2 - iy1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', help='directory of face images (synthetic faces if omitted)')
+    parser.add_argument('--sizes', default='640x480,1280x720,1920x1080,4000x3000')
+    parser.add_argument('--count', type=int, default=4, help='synthetic images per size')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='write the JSON report here')
+    args = parser.parse_args()
+
+    from facenet_pytorch import MTCNN
+    from utils.image_processor import ImageProcessor
+
+    image_processor = ImageProcessor()
+    detector = MTCNN(keep_all=False, device='cpu')
+
+    def detect_full(image):
+        boxes, _ = detector.detect(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+        return None if boxes is None else boxes[0]
+
+    def detect_downscaled(image):
+        small, scale = image_processor.prepare_detection_image(image)
+        boxes, _ = detector.detect(cv2.cvtColor(small, cv2.COLOR_BGR2RGB))
+        return None if boxes is None else boxes[0] * scale
+
+    def decode_full(data):
+        return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+    results = []
+    for (width, height), images in load_images(args.images, parse_sizes(args.sizes), args.count).items():
+        payloads = [encode_jpeg(image) for image in images]
+        full_images = [decode_full(data) for data in payloads]
+        reduced_images = [image_processor.decode_bytes(data) for data in payloads]
+
+        baseline = time_calls(lambda data: detect_full(decode_full(data)), payloads, args.repeat)
+        optimized = time_calls(lambda data: detect_downscaled(image_processor.decode_bytes(data)), payloads, args.repeat)
+
+        # Detection agreement between the two paths (in original coordinates)
+        ious = []
+        detected_full = detected_downscaled = 0
+        for full_image, reduced_image in zip(full_images, reduced_images):
+            full_box = detect_full(full_image)
+            reduced_box = detect_downscaled(reduced_image)
+            detected_full += full_box is not None
+            detected_downscaled += reduced_box is not None
+            if full_box is not None and reduced_box is not None:
+                ratio = full_image.shape[1] / reduced_image.shape[1]
+                ious.append(box_iou(full_box, reduced_box * ratio))
+
+        baseline_summary = summarize(baseline)
+        optimized_summary = summarize(optimized)
+        results.append({
+            'size': f"{width}x{height}",
+            'decoded_size': f"{reduced_images[0].shape[1]}x{reduced_images[0].shape[0]}",
+            'decode_full': summarize(time_calls(decode_full, payloads, args.repeat)),
+            'decode_reduced': summarize(time_calls(image_processor.decode_bytes, payloads, args.repeat)),
+            'detect_full': summarize(time_calls(detect_full, full_images, args.repeat)),
+            'detect_downscaled': summarize(time_calls(detect_downscaled, reduced_images, args.repeat)),
+            'decode_and_detect_full': baseline_summary,
+            'decode_and_detect_downscaled': optimized_summary,
+            'p50_saving_ms': round(baseline_summary['p50_ms'] - optimized_summary['p50_ms'], 3),
+            'p50_speedup': round(baseline_summary['p50_ms'] / optimized_summary['p50_ms'], 2) if optimized_summary['p50_ms'] else None,
+            'faces_detected_full': detected_full,
+            'faces_detected_downscaled': detected_downscaled,
+            'mean_box_iou': round(float(np.mean(ious)), 3) if ious else None
+        })
+
+    write_report({
+        'benchmark': 'downscale_before_detect',
+        'max_image_size': image_processor.max_image_size,
+        'detection_max_size': image_processor.detection_max_size,
+        'results': results,
+        'peak_rss_mb': peak_rss_mb()
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
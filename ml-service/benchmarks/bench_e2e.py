@@ -0,0 +1,202 @@
+"""
+End-to-end benchmark of the FastAPI app, in process and offline
+
+Drives the real app through an in-process ASGI client (httpx.ASGITransport)
+with FakeDatabaseHelper standing in for MongoDB, so the full request path
+(decode, detection, batching, gallery lookup, matching, serialization) is
+measured without a server, a database or network access. Enrolled users get
+embeddings of the synthetic probe faces; filler users pad the gallery.
+
+Reports per-endpoint latency and throughput at each concurrency level, the
+app's own /stats stage breakdown and peak RSS. Compare two reports with
+benchmarks.compare.
+
+Usage (from ml-service/):
+    python -m benchmarks.bench_e2e --output e2e.json
+    python -m benchmarks.bench_e2e --concurrency 1,8,32 --requests 64 --filler-users 5000
+"""
+import argparse
+import asyncio
+import base64
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.common import (
+    encode_jpeg, load_images, parse_sizes, peak_rss_mb, run_metadata,
+    summarize, use_offline_weights, write_report
+)
+
+ENDPOINTS = ('extract', 'verify', 'verify_raw', 'identify', 'verify_batch')
+
+
+def parse_ints(value):
+    return [int(item) for item in value.split(',') if item]
+
+
+def configure_app_environment(pretrained, index_dir):
+    """Env for an isolated, quiet app instance (set before importing app)"""
+    use_offline_weights(pretrained)
+    os.environ['ANN_INDEX_PATH'] = os.path.join(index_dir, 'face_index.npz')
+    # Repeated probes would otherwise be served from the result cache
+    os.environ.setdefault('RESULT_CACHE_MAX_ENTRIES', '0')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+
+def seed_database(service, images, filler_users, seed):
+    """
+    Enroll one user per probe image plus random filler users
+
+    Returns:
+        tuple: (FakeDatabaseHelper, enrolled user IDs aligned with images)
+    """
+    from benchmarks.fake_db import FakeDatabaseHelper
+
+    db_helper = FakeDatabaseHelper()
+    enrolled = []
+    for index, image in enumerate(images):
+        embedding = service.face_encoder.extract_embedding(image)
+        if embedding is None:
+            raise RuntimeError(f"No face detected in probe image {index}")
+        user_id = f"bench_user_{index}"
+        db_helper.seed(user_id, embedding)
+        enrolled.append(user_id)
+
+    rng = np.random.default_rng(seed)
+    for index in range(filler_users):
+        vector = rng.standard_normal(service.face_encoder.get_embedding_size()).astype(np.float32)
+        db_helper.seed(f"filler_user_{index}", vector / np.linalg.norm(vector))
+
+    return db_helper, enrolled
+
+
+def build_requests(endpoint, payloads, raw_payloads, user_ids):
+    """(url, httpx request kwargs) per probe for one endpoint"""
+    requests = []
+    for index, (payload, raw, user_id) in enumerate(zip(payloads, raw_payloads, user_ids)):
+        if endpoint == 'extract':
+            requests.append(('/extract-embedding', {'json': {'image': payload}}))
+        elif endpoint == 'verify':
+            requests.append(('/verify-face', {'json': {'userId': user_id, 'image': payload}}))
+        elif endpoint == 'verify_raw':
+            requests.append((f"/verify-face/raw?userId={user_id}", {'content': raw, 'headers': {'content-type': 'image/jpeg'}}))
+        elif endpoint == 'identify':
+            requests.append(('/identify-face', {'json': {'image': payload, 'top_k': 5}}))
+        elif endpoint == 'verify_batch':
+            items = [{'userId': user_ids[(index + k) % len(user_ids)], 'image': payloads[(index + k) % len(payloads)]} for k in range(4)]
+            requests.append(('/verify-batch', {'json': {'items': items}}))
+    return requests
+
+
+async def run_level(client, requests, total, concurrency):
+    """
+    Send `total` requests (cycling through `requests`) with `concurrency` in flight
+
+    Returns:
+        tuple: (latencies in ms, wall-clock seconds, status code counts)
+    """
+    latencies = []
+    statuses = {}
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index
+        while next_index < total:
+            url, kwargs = requests[next_index % len(requests)]
+            next_index += 1
+            start = time.perf_counter()
+            response = await client.post(url, **kwargs)
+            latencies.append((time.perf_counter() - start) * 1000.0)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - start, statuses
+
+
+async def run_benchmark(service, args, payloads, raw_payloads, enrolled):
+    import httpx
+
+    endpoints = [endpoint for endpoint in args.endpoints.split(',') if endpoint]
+    results = {}
+
+    await service.startup()
+    try:
+        transport = httpx.ASGITransport(app=service.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+            if 'identify' in endpoints:
+                deadline = time.monotonic() + args.index_timeout
+                while not service.identity_index_state['ready'] and time.monotonic() < deadline:
+                    await asyncio.sleep(0.05)
+
+            for endpoint in endpoints:
+                requests = build_requests(endpoint, payloads, raw_payloads, enrolled)
+
+                # Warm-up pass (lazy model paths, gallery cache fill)
+                await run_level(client, requests, len(requests), 1)
+
+                results[endpoint] = []
+                for concurrency in parse_ints(args.concurrency):
+                    total = max(args.requests, concurrency)
+                    latencies, wall_seconds, statuses = await run_level(client, requests, total, concurrency)
+                    entry = dict(name=f"c{concurrency}", concurrency=concurrency, **summarize(latencies))
+                    entry['requests_per_s'] = round(len(latencies) / wall_seconds, 2) if wall_seconds > 0 else None
+                    entry['status_codes'] = {str(code): count for code, count in sorted(statuses.items())}
+                    results[endpoint].append(entry)
+
+            stats = (await client.get('/stats')).json()['data']
+    finally:
+        await service.shutdown()
+
+    return results, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', help='directory of face images (synthetic faces if omitted)')
+    parser.add_argument('--size', default='640x480', help='probe image size')
+    parser.add_argument('--count', type=int, default=8, help='synthetic probe images (one enrolled user each)')
+    parser.add_argument('--filler-users', type=int, default=1000, help='extra enrolled users with random embeddings')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS), help=f"subset of {','.join(ENDPOINTS)}")
+    parser.add_argument('--concurrency', default='1,4,16')
+    parser.add_argument('--requests', type=int, default=32, help='requests per endpoint and concurrency level')
+    parser.add_argument('--index-timeout', type=float, default=60.0, help='seconds to wait for the identification index')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--pretrained', action='store_true', help='load the real VGGFace2 weights (needs them cached or network)')
+    parser.add_argument('--output', help='write the JSON report here')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        configure_app_environment(args.pretrained, index_dir)
+
+        import app as service
+        service.load_models()
+
+        size = parse_sizes(args.size)[0]
+        images = load_images(args.images, [size], args.count)[size]
+        raw_payloads = [encode_jpeg(image) for image in images]
+        payloads = [base64.b64encode(raw).decode() for raw in raw_payloads]
+
+        service.db_helper, enrolled = seed_database(service, images, args.filler_users, args.seed)
+
+        results, stats = asyncio.run(run_benchmark(service, args, payloads, raw_payloads, enrolled))
+
+    write_report({
+        'benchmark': 'e2e',
+        'metadata': run_metadata(),
+        'config': {
+            'size': args.size,
+            'probes': len(images),
+            'enrolled_users': len(enrolled) + args.filler_users,
+            'requests': args.requests
+        },
+        'results': results,
+        'stages': stats.get('stages'),
+        'peak_rss_mb': peak_rss_mb()
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
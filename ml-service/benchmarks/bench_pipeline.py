@@ -0,0 +1,173 @@
+"""
+Offline component benchmark for the ML pipeline
+
+Times each stage on local (or synthetic) face images, without network or
+MongoDB, and reports count, mean, p50/p95/p99, throughput and peak RSS as JSON:
+  - ImageProcessor.decode_base64 and the check_quality gate at each image size
+  - FaceEncoder.detect_face and FaceEncoder.extract_embedding at each image size
+  - FaceEncoder.embed_batch at each batch size
+  - FaceMatcher methods (including two-stage match_template) at each gallery size
+
+FaceNet uses random weights unless --pretrained is given (latency is the same).
+Compare two reports with benchmarks.compare.
+
+Usage (from ml-service/):
+    python -m benchmarks.bench_pipeline --output pipeline.json
+    python -m benchmarks.bench_pipeline --components matcher --galleries 10,1000,100000
+    python -m benchmarks.bench_pipeline --images ./faces --sizes 640x480,1920x1080
+"""
+import argparse
+import base64
+
+import numpy as np
+
+from benchmarks.common import (
+    encode_jpeg, load_images, parse_sizes, peak_rss_mb, run_metadata,
+    summarize, time_calls, use_offline_weights, write_report
+)
+from utils.gallery_cache import UserGallery
+
+COMPONENTS = ('decode', 'quality', 'detect', 'extract', 'batch', 'matcher')
+
+
+def parse_ints(value):
+    return [int(item) for item in value.split(',') if item]
+
+
+def bench_images(encoder, image_processor, images_by_size, components, repeat):
+    """decode_base64, check_quality, detect_face and extract_embedding per image size"""
+    results = {'decode_base64': [], 'check_quality': [], 'detect_face': [], 'extract_embedding': []}
+
+    for (width, height), images in images_by_size.items():
+        size = f"{width}x{height}"
+        payloads = [base64.b64encode(encode_jpeg(image)).decode() for image in images]
+        decoded = [image_processor.decode_base64(payload) for payload in payloads]
+
+        if 'decode' in components:
+            results['decode_base64'].append(dict(size=size, **summarize(time_calls(image_processor.decode_base64, payloads, repeat))))
+
+        if 'quality' in components:
+            passed = sum(image_processor.check_quality(image)['passed'] for image in decoded)
+            results['check_quality'].append(dict(
+                size=size, passed=passed, images=len(decoded),
+                **summarize(time_calls(image_processor.check_quality, decoded, repeat))
+            ))
+
+        if 'detect' in components:
+            detected = sum(encoder.detect_face(image) is not None for image in decoded)
+            results['detect_face'].append(dict(
+                size=size, faces_detected=detected, images=len(decoded),
+                **summarize(time_calls(encoder.detect_face, decoded, repeat))
+            ))
+
+        if 'extract' in components:
+            results['extract_embedding'].append(dict(size=size, **summarize(time_calls(encoder.extract_embedding, decoded, repeat))))
+
+    return {name: entries for name, entries in results.items() if entries}
+
+
+def bench_batches(encoder, batch_sizes, repeat, seed):
+    """One FaceNet forward pass per batch size"""
+    rng = np.random.default_rng(seed)
+    results = []
+
+    for batch_size in batch_sizes:
+        faces = rng.integers(0, 256, size=(batch_size, 160, 160, 3), dtype=np.uint8)
+        tensors = [encoder.preprocess_face(face) for face in faces]
+        samples = time_calls(encoder.embed_batch, [tensors], repeat=max(repeat, 3))
+        results.append(dict(name=f"batch_{batch_size}", batch_size=batch_size, **summarize(samples, items_per_call=batch_size)))
+
+    return results
+
+
+def bench_matcher(matcher, gallery_sizes, repeat, seed, dim=512, queries=32, users=32):
+    """FaceMatcher scoring against galleries of increasing size"""
+    rng = np.random.default_rng(seed)
+    results = []
+    calls = max(repeat, 3) * 10
+
+    for gallery_size in gallery_sizes:
+        gallery = rng.standard_normal((gallery_size, dim)).astype(np.float32)
+        query = rng.standard_normal(dim).astype(np.float32)
+        query_batch = rng.standard_normal((queries, dim)).astype(np.float32)
+
+        cases = {
+            'similarity_matrix': (lambda _: matcher.similarity_matrix(query, gallery)),
+            'similarity_matrix_batch': (lambda _: matcher.similarity_matrix(query_batch, gallery)),
+            'find_best_match': (lambda _: matcher.find_best_match(query, gallery)),
+            'find_all_matches': (lambda _: matcher.find_all_matches(query, gallery))
+        }
+
+        # Single-user verification: centroid template first, every pattern only near the threshold
+        template = UserGallery('benchmark', [str(row) for row in range(gallery_size)], gallery, np.zeros(gallery_size))
+        cases['match_template'] = (lambda _: matcher.match_template(query, template))
+        cases['match_template_full'] = (lambda _: matcher.match_template(query, template, full_scores=True))
+
+        # Group verification: split the gallery across users, then assign faces to users
+        per_user = max(1, gallery_size // users)
+        user_galleries = [gallery[start:start + per_user] for start in range(0, per_user * users, per_user)]
+        scores, _ = matcher.user_similarity_matrix(query_batch, user_galleries)
+        cases['user_similarity_matrix'] = (lambda _: matcher.user_similarity_matrix(query_batch, user_galleries))
+        cases['assign'] = (lambda _: matcher.assign(scores, matcher.get_threshold()))
+
+        # Pairwise distances grow quadratically; only for small galleries
+        if gallery_size <= 2000:
+            cases['calculate_distance_matrix'] = (lambda _: matcher.calculate_distance_matrix(gallery))
+
+        for method, func in cases.items():
+            items = queries if method in ('similarity_matrix_batch', 'user_similarity_matrix') else 1
+            results.append(dict(
+                name=f"{method}_g{gallery_size}", method=method, gallery_size=gallery_size,
+                **summarize(time_calls(func, range(calls), repeat=1), items_per_call=items)
+            ))
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', help='directory of face images (synthetic faces if omitted)')
+    parser.add_argument('--sizes', default='320x240,640x480,1280x720,1920x1080')
+    parser.add_argument('--count', type=int, default=4, help='synthetic images per size')
+    parser.add_argument('--batch-sizes', default='1,4,8,16,32')
+    parser.add_argument('--galleries', default='5,100,1000,10000')
+    parser.add_argument('--components', default=','.join(COMPONENTS), help=f"subset of {','.join(COMPONENTS)}")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--pretrained', action='store_true', help='load the real VGGFace2 weights (needs them cached or network)')
+    parser.add_argument('--output', help='write the JSON report here')
+    args = parser.parse_args()
+
+    components = set(args.components.split(','))
+    use_offline_weights(args.pretrained)
+
+    from models.face_matcher import FaceMatcher
+    from utils.image_processor import ImageProcessor
+
+    image_processor = ImageProcessor()
+    results = {}
+
+    if components & {'decode', 'quality', 'detect', 'extract', 'batch'}:
+        from models.face_encoder import FaceEncoder
+        encoder = FaceEncoder()
+
+        if components & {'decode', 'quality', 'detect', 'extract'}:
+            images_by_size = load_images(args.images, parse_sizes(args.sizes), args.count)
+            results.update(bench_images(encoder, image_processor, images_by_size, components, args.repeat))
+
+        if 'batch' in components:
+            results['embed_batch'] = bench_batches(encoder, parse_ints(args.batch_sizes), args.repeat, args.seed)
+
+    if 'matcher' in components:
+        results['matcher'] = bench_matcher(FaceMatcher(), parse_ints(args.galleries), args.repeat, args.seed)
+
+    write_report({
+        'benchmark': 'pipeline',
+        'metadata': run_metadata(),
+        'results': results,
+        'peak_rss_mb': peak_rss_mb()
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""
+Detection-skipping tracker benchmark
+
+Builds short "live camera" sequences by panning a crop window over each face
+image (sway plus hand jitter), then runs them through FaceEncoder.detect on
+every frame and through FaceTracker, and reports per frame size and interval:
+  - detection calls made and saved by the tracker, and lost tracks
+  - per-frame latency of both paths
+  - accuracy impact: IoU of the tracked boxes against full detection on the
+    same frame, and cosine similarity of the embeddings of the two crops
+
+FaceNet uses random weights unless --pretrained is given, so embedding
+similarities are only meaningful with --pretrained.
+
+Usage (from ml-service/):
+    python -m benchmarks.bench_tracker --output tracker.json
+    python -m benchmarks.bench_tracker --images ./faces --frames 60 --intervals 3,5,10 --pretrained
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.bench_downscale import box_iou
+from benchmarks.common import load_images, parse_sizes, peak_rss_mb, summarize, time_calls, use_offline_weights, write_report
+
+
+def parse_ints(value):
+    return [int(item) for item in value.split(',') if item]
+
+
+def camera_sequence(image, width, height, frames, seed=0, sway=0.08, jitter=0.01):
+    """
+    Crop a moving window out of a larger image, like a face swaying in front of a webcam
+
+    Args:
+        image: numpy array, BGR source at least width x height
+        width: int, frame width
+        height: int, frame height
+        frames: int, sequence length
+        seed: int, random seed for the jitter
+        sway: float, peak horizontal/vertical drift as a fraction of the frame size
+        jitter: float, per-frame random shake as a fraction of the frame size
+
+    Returns:
+        list: BGR frames of width x height
+    """
+    rng = np.random.default_rng(seed)
+    slack_x = image.shape[1] - width
+    slack_y = image.shape[0] - height
+    sequence = []
+
+    for index in range(frames):
+        phase = 2 * np.pi * index / max(1, frames)
+        dx = sway * width * np.sin(phase) + rng.normal(0, jitter * width)
+        dy = sway * height * np.sin(2 * phase) / 2 + rng.normal(0, jitter * height)
+        x = int(np.clip(slack_x / 2 + dx, 0, slack_x))
+        y = int(np.clip(slack_y / 2 + dy, 0, slack_y))
+        sequence.append(np.ascontiguousarray(image[y:y + height, x:x + width]))
+
+    return sequence
+
+
+def embed_box(encoder, image, box):
+    """L2-normalized FaceNet embedding of one face box"""
+    face = encoder.align_face(image, box)
+    if face is None:
+        return None
+    embedding = np.asarray(encoder.embed_batch([encoder.preprocess_face(face)]))[0]
+    return embedding / (np.linalg.norm(embedding) + 1e-10)
+
+
+def run_tracker(tracker, sequence):
+    """Feed one sequence to a fresh tracker, returning (box, tracked) per frame"""
+    tracker.reset()
+    return [tracker.detect(frame)[::2] for frame in sequence]
+
+
+def time_tracker(tracker, sequences, repeat=1):
+    """Per-frame FaceTracker.detect latencies in milliseconds (after one untimed pass)"""
+    for sequence in sequences:
+        run_tracker(tracker, sequence)
+
+    samples = []
+    for _ in range(repeat):
+        for sequence in sequences:
+            tracker.reset()
+            for frame in sequence:
+                start = time.perf_counter()
+                tracker.detect(frame)
+                samples.append((time.perf_counter() - start) * 1000.0)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', help='directory of face images (synthetic faces if omitted)')
+    parser.add_argument('--sizes', default='640x480,1280x720')
+    parser.add_argument('--count', type=int, default=4, help='synthetic images (sequences) per size')
+    parser.add_argument('--frames', type=int, default=30, help='frames per sequence')
+    parser.add_argument('--intervals', default='3,5,10', help='TRACKER_DETECT_INTERVAL values to compare')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--pretrained', action='store_true', help='load the real VGGFace2 weights (needs them cached or network)')
+    parser.add_argument('--output', help='write the JSON report here')
+    args = parser.parse_args()
+
+    use_offline_weights(args.pretrained)
+
+    from models.face_encoder import FaceEncoder
+    from models.face_tracker import FaceTracker
+
+    encoder = FaceEncoder()
+    sizes = parse_sizes(args.sizes)
+
+    # Sources 25% larger than the frames leave room for the camera to pan
+    sources = load_images(args.images, [(width * 5 // 4, height * 5 // 4) for width, height in sizes], args.count)
+
+    results = []
+    for (width, height), images in zip(sizes, sources.values()):
+        sequences = [camera_sequence(image, width, height, args.frames, seed=args.seed + index) for index, image in enumerate(images)]
+        frames = [frame for sequence in sequences for frame in sequence]
+
+        # Reference: full detection on every frame
+        reference = [encoder.detect(frame)[0] for frame in frames]
+        reference_embeddings = [embed_box(encoder, frame, box) if box is not None else None for frame, box in zip(frames, reference)]
+        detect_summary = summarize(time_calls(encoder.detect, frames, args.repeat))
+
+        for interval in parse_ints(args.intervals):
+            tracker = FaceTracker(encoder.detect, detect_interval=interval)
+            outputs = [output for sequence in sequences for output in run_tracker(tracker, sequence)]
+
+            ious, similarities = [], []
+            missed = 0
+            for frame, (box, tracked), reference_box, reference_embedding in zip(frames, outputs, reference, reference_embeddings):
+                if not tracked or reference_box is None:
+                    missed += box is None and reference_box is not None
+                    continue
+                ious.append(box_iou(box, reference_box))
+                embedding = embed_box(encoder, frame, box)
+                if embedding is not None and reference_embedding is not None:
+                    similarities.append(float(np.dot(embedding, reference_embedding)))
+
+            stats = tracker.get_stats()
+            tracker_summary = summarize(time_tracker(FaceTracker(encoder.detect, detect_interval=interval), sequences, args.repeat))
+
+            results.append({
+                'size': f"{width}x{height}",
+                'detect_interval': interval,
+                'frames': len(frames),
+                'faces_detected_every_frame': sum(box is not None for box in reference),
+                'detection_calls': stats['detections'],
+                'detection_calls_saved': stats['tracked'],
+                'detections_saved': stats['detections_saved'],
+                'lost_tracks': stats['lost'],
+                'missed_faces': missed,
+                'detect_every_frame': detect_summary,
+                'tracker_per_frame': tracker_summary,
+                'mean_speedup': round(detect_summary['mean_ms'] / tracker_summary['mean_ms'], 2) if tracker_summary['mean_ms'] else None,
+                'mean_box_iou': round(float(np.mean(ious)), 3) if ious else None,
+                'min_box_iou': round(float(np.min(ious)), 3) if ious else None,
+                'mean_embedding_similarity': round(float(np.mean(similarities)), 4) if similarities else None,
+                'min_embedding_similarity': round(float(np.min(similarities)), 4) if similarities else None
+            })
+
+    write_report({
+        'benchmark': 'tracker',
+        'frames_per_sequence': args.frames,
+        'min_confidence': FaceTracker(encoder.detect).min_confidence,
+        'results': results,
+        'peak_rss_mb': peak_rss_mb()
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
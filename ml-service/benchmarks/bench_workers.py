@@ -0,0 +1,168 @@
+"""
+Pre-fork scaling benchmark
+
+Starts the service under gunicorn (gunicorn.conf.py) with 1, 2, 4, ... workers
+and drives /extract-embedding over real HTTP with a fixed number of requests
+in flight per worker. Reports throughput, latency and speedup per worker
+count, plus the memory of the master and workers: RSS counts shared weight
+pages once per process, PSS splits them between the processes sharing them,
+so total PSS well below total RSS shows the copy-on-write sharing at work.
+
+Needs no MongoDB (extraction does not read the database) and uses random
+FaceNet weights unless --pretrained is given.
+
+Usage (from ml-service/):
+    python -m benchmarks.bench_workers --workers 1,2,4 --output workers.json
+"""
+import argparse
+import asyncio
+import base64
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_e2e import parse_ints, run_level
+from benchmarks.common import SERVICE_ROOT, encode_jpeg, load_images, parse_sizes, run_metadata, summarize, write_report
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def process_memory_mb(pid):
+    """
+    RSS and PSS of one process from /proc (Linux)
+
+    Returns:
+        dict: {'rss_mb', 'pss_mb'} (None values if unavailable)
+    """
+    memory = {'rss_mb': None, 'pss_mb': None}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, value = line.split(':', 1)
+                if key in ('Rss', 'Pss'):
+                    memory[f"{key.lower()}_mb"] = round(int(value.split()[0]) / 1024, 1)
+    except (OSError, ValueError):
+        pass
+    return memory
+
+
+def worker_pids(master_pid):
+    try:
+        with open(f"/proc/{master_pid}/task/{master_pid}/children") as f:
+            return [int(pid) for pid in f.read().split()]
+    except OSError:
+        return []
+
+
+def start_server(workers, port, args, log):
+    env = dict(
+        os.environ,
+        WEB_CONCURRENCY=str(workers),
+        PORT=str(port),
+        HOST='127.0.0.1',
+        RESULT_CACHE_MAX_ENTRIES='0',
+        LOG_LEVEL=os.getenv('LOG_LEVEL', 'WARNING'),
+        MONGODB_SERVER_SELECTION_TIMEOUT_MS='500',
+        ANN_INDEX_PATH=os.path.join(args.tmp_dir, f"face_index_{port}.npz")
+    )
+    if not args.pretrained:
+        env['FACENET_PRETRAINED'] = 'none'
+
+    return subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+        cwd=SERVICE_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+
+
+async def wait_until_ready(client, workers, timeout):
+    """Wait until every worker has answered /stats (which is only served once ready)"""
+    pids = set()
+    deadline = time.monotonic() + timeout
+    while len(pids) < workers and time.monotonic() < deadline:
+        try:
+            # A new connection per poll, so the probes reach every worker
+            response = await client.get('/stats', headers={'Connection': 'close'})
+            if response.status_code == 200:
+                pids.add(response.json()['data']['process']['pid'])
+                continue
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    return len(pids) >= workers
+
+
+async def measure(workers, port, requests, args):
+    import httpx
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None) as client:
+        if not await wait_until_ready(client, workers, args.ready_timeout):
+            raise RuntimeError(f"{workers} worker(s) not ready after {args.ready_timeout}s")
+
+        concurrency = args.concurrency_per_worker * workers
+        await run_level(client, requests, concurrency, concurrency)
+        return await run_level(client, requests, args.requests * workers, concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', default='1,2,4', help='worker counts to compare')
+    parser.add_argument('--images', help='directory of face images (synthetic faces if omitted)')
+    parser.add_argument('--size', default='640x480')
+    parser.add_argument('--count', type=int, default=8, help='synthetic probe images')
+    parser.add_argument('--requests', type=int, default=32, help='requests per worker')
+    parser.add_argument('--concurrency-per-worker', type=int, default=4)
+    parser.add_argument('--ready-timeout', type=float, default=180.0)
+    parser.add_argument('--pretrained', action='store_true', help='load the real VGGFace2 weights (needs them cached or network)')
+    parser.add_argument('--output', help='write the JSON report here')
+    args = parser.parse_args()
+
+    size = parse_sizes(args.size)[0]
+    payloads = [base64.b64encode(encode_jpeg(image)).decode() for image in load_images(args.images, [size], args.count)[size]]
+    requests = [('/extract-embedding', {'json': {'image': payload}}) for payload in payloads]
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        args.tmp_dir = tmp_dir
+        for workers in parse_ints(args.workers):
+            port = free_port()
+            with open(os.path.join(tmp_dir, f"gunicorn_{workers}.log"), 'w') as log:
+                server = start_server(workers, port, args, log)
+                try:
+                    latencies, wall_seconds, statuses = asyncio.run(measure(workers, port, requests, args))
+                    pids = worker_pids(server.pid)
+                    memory = {'master': process_memory_mb(server.pid), 'workers': [process_memory_mb(pid) for pid in pids]}
+                finally:
+                    server.terminate()
+                    server.wait(timeout=60)
+
+            processes = [memory['master']] + memory['workers']
+            entry = dict(name=f"w{workers}", workers=workers, **summarize(latencies))
+            entry['requests_per_s'] = round(len(latencies) / wall_seconds, 2) if wall_seconds > 0 else None
+            entry['status_codes'] = {str(code): count for code, count in sorted(statuses.items())}
+            entry['memory'] = memory
+            if all(process['rss_mb'] is not None for process in processes):
+                entry['total_rss_mb'] = round(sum(process['rss_mb'] for process in processes), 1)
+                entry['total_pss_mb'] = round(sum(process['pss_mb'] for process in processes), 1)
+            results.append(entry)
+
+    baseline = results[0]['requests_per_s'] if results else None
+    for entry in results:
+        entry['speedup'] = round(entry['requests_per_s'] / baseline, 2) if baseline and entry['requests_per_s'] else None
+
+    write_report({
+        'benchmark': 'workers',
+        'metadata': run_metadata(),
+        'config': {'size': args.size, 'concurrency_per_worker': args.concurrency_per_worker, 'requests_per_worker': args.requests},
+        'results': {'extract_embedding': results}
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+import glob
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+
+# Make ml-service modules importable when a benchmark is run as a script
+SERVICE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVICE_ROOT not in sys.path:
+    sys.path.insert(0, SERVICE_ROOT)
+
+
+def parse_sizes(value):
+    """Parse '640x480,1920x1080' into [(640, 480), (1920, 1080)]"""
+    sizes = []
+    for item in value.split(','):
+        width, height = item.lower().split('x')
+        sizes.append((int(width), int(height)))
+    return sizes
+
+
+def synthetic_face_image(width, height, seed=0):
+    """
+    Draw a simple frontal face on a textured background
+
+    Args:
+        width: int, image width
+        height: int, image height
+        seed: int, random seed for the background texture
+
+    Returns:
+        numpy array: BGR image
+    """
+    rng = np.random.default_rng(seed)
+    background = rng.integers(40, 200, size=(max(1, height // 8), max(1, width // 8), 3), dtype=np.uint8)
+    image = cv2.resize(background, (width, height), interpolation=cv2.INTER_LINEAR)
+
+    # Face roughly a third of the short side, centred
+    cx, cy = width // 2, height // 2
+    face_w = max(8, min(width, height) // 3)
+    face_h = int(face_w * 1.3)
+    cv2.ellipse(image, (cx, cy), (face_w // 2, face_h // 2), 0, 0, 360, (150, 180, 225), -1)
+
+    eye_dx, eye_y = face_w // 5, cy - face_h // 8
+    eye_r = max(2, face_w // 14)
+    for ex in (cx - eye_dx, cx + eye_dx):
+        cv2.circle(image, (ex, eye_y), eye_r, (255, 255, 255), -1)
+        cv2.circle(image, (ex, eye_y), max(1, eye_r // 2), (40, 30, 20), -1)
+
+    cv2.line(image, (cx, cy - face_h // 16), (cx, cy + face_h // 10), (110, 140, 190), max(1, face_w // 40))
+    cv2.ellipse(image, (cx, cy + face_h // 5), (face_w // 6, face_h // 20), 0, 0, 180, (60, 60, 150), max(1, face_w // 30))
+
+    return image
+
+
+def load_images(directory=None, sizes=((640, 480),), count=8):
+    """
+    Load face images from a directory or generate synthetic ones
+
+    Args:
+        directory: str, folder with .jpg/.jpeg/.png files (optional)
+        sizes: iterable of (width, height) to resize or generate at
+        count: int, synthetic images per size when no directory is given
+
+    Returns:
+        dict: {(width, height): [BGR images]}
+    """
+    sources = []
+    if directory:
+        for pattern in ('*.jpg', '*.jpeg', '*.png'):
+            sources.extend(sorted(glob.glob(os.path.join(directory, pattern))))
+        sources = [cv2.imread(path, cv2.IMREAD_COLOR) for path in sources]
+        sources = [image for image in sources if image is not None]
+
+    images = {}
+    for width, height in sizes:
+        if sources:
+            images[(width, height)] = [cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA) for image in sources]
+        else:
+            images[(width, height)] = [synthetic_face_image(width, height, seed) for seed in range(count)]
+
+    return images
+
+
+def encode_jpeg(image, quality=90):
+    """Encode a BGR image to JPEG bytes"""
+    ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("JPEG encoding failed")
+    return buffer.tobytes()
+
+
+def time_calls(func, inputs, repeat=1, warmup=1):
+    """
+    Time func over every input
+
+    Args:
+        func: callable taking one input
+        inputs: list of inputs
+        repeat: int, passes over the inputs
+        warmup: int, untimed passes before measuring
+
+    Returns:
+        list: per-call latencies in milliseconds
+    """
+    for _ in range(warmup):
+        for item in inputs:
+            func(item)
+
+    samples = []
+    for _ in range(repeat):
+        for item in inputs:
+            start = time.perf_counter()
+            func(item)
+            samples.append((time.perf_counter() - start) * 1000.0)
+    return samples
+
+
+def summarize(samples_ms, items_per_call=1):
+    """
+    Summarize latencies
+
+    Args:
+        samples_ms: list of latencies in milliseconds
+        items_per_call: int, items processed per call (for throughput)
+
+    Returns:
+        dict: count, mean, p50/p95/p99 and throughput per second
+    """
+    if not samples_ms:
+        return {'count': 0}
+
+    samples = np.asarray(samples_ms, dtype=np.float64)
+    total_seconds = samples.sum() / 1000.0
+    return {
+        'count': int(samples.size),
+        'mean_ms': round(float(samples.mean()), 3),
+        'p50_ms': round(float(np.percentile(samples, 50)), 3),
+        'p95_ms': round(float(np.percentile(samples, 95)), 3),
+        'p99_ms': round(float(np.percentile(samples, 99)), 3),
+        'throughput_per_s': round(samples.size * items_per_call / total_seconds, 2) if total_seconds > 0 else None
+    }
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux and bytes on macOS
+    if sys.platform == 'darwin':
+        return round(peak / (1024 * 1024), 1)
+    return round(peak / 1024, 1)
+
+
+def use_offline_weights(pretrained=False):
+    """
+    Build FaceNet with random weights unless real ones are requested
+
+    Latency does not depend on the weight values, so benchmarks default to
+    FACENET_PRETRAINED=none and need no network access.
+    """
+    if not pretrained:
+        os.environ['FACENET_PRETRAINED'] = 'none'
+
+
+def run_metadata():
+    """
+    Describe the code and machine a report was produced on
+
+    Returns:
+        dict: commit, versions, thread count and the env knobs that change performance
+    """
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=SERVICE_ROOT,
+            capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        commit = None
+
+    import torch
+
+    knobs = (
+        'FACENET_PRETRAINED', 'FACE_INFERENCE_BACKEND', 'FACE_QUANTIZATION', 'BATCH_MAX_SIZE',
+        'BATCH_MAX_WAIT_MS', 'ML_WORKER_THREADS', 'MAX_IMAGE_SIZE', 'DETECTION_MAX_SIZE', 'EMBEDDING_STORAGE'
+    )
+    return {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'torch': torch.__version__,
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'torch_threads': torch.get_num_threads(),
+        'env': {knob: os.environ[knob] for knob in knobs if knob in os.environ}
+    }
+
+
+def flatten_latencies(report, prefix=''):
+    """
+    Collect every summarize() block of a report keyed by its JSON path
+
+    Returns:
+        dict: {'results.decode_base64.640x480': {'p50_ms', ...}, ...}
+    """
+    found = {}
+    if isinstance(report, dict):
+        if 'p50_ms' in report:
+            found[prefix] = report
+        for key, value in report.items():
+            found.update(flatten_latencies(value, f"{prefix}.{key}" if prefix else str(key)))
+    elif isinstance(report, list):
+        for index, value in enumerate(report):
+            label = value.get('name', value.get('size', index)) if isinstance(value, dict) else index
+            found.update(flatten_latencies(value, f"{prefix}.{label}" if prefix else str(label)))
+    return found
+
+
+def write_report(report, output=None):
+    """Print a JSON report and optionally save it to a file"""
+    text = json.dumps(report, indent=2)
+    print(text)
+    if output:
+        with open(output, 'w') as f:
+            f.write(text + '\n')
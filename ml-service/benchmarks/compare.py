@@ -0,0 +1,84 @@
+"""
+Compare two benchmark reports
+
+Matches every latency summary present in both reports by its JSON path and
+prints the p50/p95/p99 change, so runs from two commits (or two env settings)
+can be compared. Exits with status 1 if any p50 regressed by more than
+--fail-above percent.
+
+Usage (from ml-service/):
+    python -m benchmarks.compare baseline.json candidate.json
+    python -m benchmarks.compare baseline.json candidate.json --fail-above 10 --output diff.json
+"""
+import argparse
+import json
+import sys
+
+from benchmarks.common import flatten_latencies
+
+METRICS = ('p50_ms', 'p95_ms', 'p99_ms')
+
+
+def percent_change(before, after):
+    if not before:
+        return None
+    return round((after - before) / before * 100.0, 1)
+
+
+def compare_reports(baseline, candidate):
+    """
+    Latency deltas for every summary present in both reports
+
+    Returns:
+        dict: {path: {'p50_ms': [before, after, change %], ...}}
+    """
+    before = flatten_latencies(baseline)
+    after = flatten_latencies(candidate)
+
+    rows = {}
+    for path in before:
+        if path not in after:
+            continue
+        rows[path] = {
+            metric: [before[path][metric], after[path][metric], percent_change(before[path][metric], after[path][metric])]
+            for metric in METRICS if metric in before[path] and metric in after[path]
+        }
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('baseline', help='report from the reference run')
+    parser.add_argument('candidate', help='report from the run being evaluated')
+    parser.add_argument('--fail-above', type=float, help='exit 1 if any p50 is this many percent slower')
+    parser.add_argument('--output', help='write the JSON diff here')
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    rows = compare_reports(baseline, candidate)
+
+    print(f"{'summary':<60} {'p50 before':>11} {'p50 after':>11} {'change':>8}")
+    for path, row in rows.items():
+        before, after, change = row['p50_ms']
+        print(f"{path:<60} {before:>11.3f} {after:>11.3f} {'n/a' if change is None else f'{change:+.1f}%':>8}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'baseline': baseline.get('metadata'),
+                'candidate': candidate.get('metadata'),
+                'changes': rows
+            }, f, indent=2)
+
+    regressions = [path for path, row in rows.items() if args.fail_above is not None and (row['p50_ms'][2] or 0) > args.fail_above]
+    if regressions:
+        print(f"p50 regressed by more than {args.fail_above}%: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
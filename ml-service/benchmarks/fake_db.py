@@ -0,0 +1,135 @@
+"""
+In-memory stand-in for MongoDB used by the end-to-end benchmark
+
+FakeCollection implements the small part of the Motor collection API that
+DatabaseHelper uses (find with equality/$in/$ne filters and projections,
+insert_one, count_documents, index_information), so the real DatabaseHelper
+query and gallery-building code runs without a server.
+"""
+import copy
+
+from bson import ObjectId
+
+from utils.db_helper import DatabaseHelper, USER_STATUS_INDEX
+
+
+def _matches(document, query):
+    """Evaluate an equality / $in / $ne / $type filter against one document"""
+    for field, condition in query.items():
+        value = document.get(field)
+        if isinstance(condition, dict):
+            for operator, operand in condition.items():
+                if operator == '$in' and value not in operand:
+                    return False
+                if operator == '$ne' and value == operand:
+                    return False
+                if operator == '$gt' and not (value is not None and value > operand):
+                    return False
+                if operator == '$type' and operand == 'array' and not isinstance(value, list):
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+
+def _project(document, projection):
+    """Apply an inclusion projection"""
+    if not projection:
+        return copy.copy(document)
+    return {field: document[field] for field, include in projection.items() if include and field in document}
+
+
+class FakeCursor:
+    """Async cursor over a list of documents"""
+
+    def __init__(self, documents):
+        self._documents = documents
+
+    def sort(self, field, direction=1):
+        self._documents.sort(key=lambda document: document.get(field), reverse=direction < 0)
+        return self
+
+    def limit(self, count):
+        self._documents = self._documents[:count]
+        return self
+
+    async def to_list(self, length=None):
+        return self._documents if length is None else self._documents[:length]
+
+    def __aiter__(self):
+        self._iterator = iter(self._documents)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeCollection:
+    """Minimal async face_embeddings collection"""
+
+    def __init__(self):
+        self.documents = []
+
+    def with_options(self, **kwargs):
+        return self
+
+    def find(self, query=None, projection=None):
+        query = query or {}
+        return FakeCursor([_project(document, projection) for document in self.documents if _matches(document, query)])
+
+    async def insert_one(self, document):
+        document.setdefault('_id', ObjectId())
+        self.documents.append(copy.copy(document))
+
+        class Result:
+            inserted_id = document['_id']
+
+        return Result()
+
+    async def count_documents(self, query):
+        return sum(1 for document in self.documents if _matches(document, query))
+
+    async def index_information(self):
+        return {
+            '_id_': {'key': [('_id', 1)]},
+            'userId_1_status_1': {'key': list(USER_STATUS_INDEX)}
+        }
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.face_embeddings = FakeCollection()
+
+
+class FakeDatabaseHelper(DatabaseHelper):
+    """DatabaseHelper backed by FakeCollection (no change watcher or migrator)"""
+
+    def _connect(self):
+        self.client = None
+        self.db = FakeDatabase()
+        self.embeddings_read = self.db.face_embeddings
+
+    def start_change_watcher(self):
+        pass
+
+    def start_migration(self):
+        pass
+
+    def seed(self, user_id, embedding, quality_score=0.95):
+        """Insert an active embedding synchronously (before the event loop starts)"""
+        from utils.embedding_storage import encode_embedding
+
+        stored, version = encode_embedding(embedding, self.storage_mode)
+        document = {
+            '_id': ObjectId(),
+            'userId': user_id,
+            'embedding': stored,
+            'embedding_version': version,
+            'quality_score': quality_score,
+            'status': 'active'
+        }
+        self.db.face_embeddings.documents.append(document)
+        return str(document['_id'])
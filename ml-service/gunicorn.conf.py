@@ -0,0 +1,48 @@
+"""
+Gunicorn configuration for pre-fork multi-worker serving
+
+    gunicorn -c gunicorn.conf.py app:app
+
+- The master imports the app and loads the model weights once (preload_app,
+  app.preload_models), then forks WEB_CONCURRENCY uvicorn workers that share
+  the weight pages copy-on-write instead of each loading a copy
+- Each worker gets CPU cores / workers torch and OpenCV threads (override with
+  TORCH_NUM_THREADS) and an equal share of MONGODB_MAX_POOL_SIZE
+- Each worker creates its own inference backend (ONNX Runtime sessions and
+  INT8 models are per process), warms up and reports /ready on its own
+- PROMETHEUS_MULTIPROC_DIR (a writable directory) makes /metrics aggregate
+  every worker
+"""
+import os
+import shutil
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', 1))
+worker_class = 'uvicorn.workers.UvicornWorker'
+preload_app = True
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+# Multi-process metrics start from an empty directory (before the app is imported)
+_metrics_dir = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+if _metrics_dir:
+    shutil.rmtree(_metrics_dir, ignore_errors=True)
+    os.makedirs(_metrics_dir, exist_ok=True)
+
+
+def on_starting(server):
+    """Master: load the weights once, before any worker is forked"""
+    import app
+    app.preload_models()
+
+
+def post_fork(server, worker):
+    """Worker: take this process's share of threads and MongoDB connections"""
+    import app
+    app.configure_worker(server.num_workers)
+
+
+def child_exit(server, worker):
+    from utils import metrics
+    metrics.mark_process_dead(worker.pid)
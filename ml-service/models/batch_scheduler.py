@@ -0,0 +1,198 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class BatchScheduler:
+    """
+    Dynamic micro-batching scheduler in front of FaceEncoder
+    - Queues aligned face crops submitted by concurrent requests and normalizes
+      them straight into the flush thread's batch buffer (FaceEncoder.embed_faces),
+      so no per-face input tensor is allocated
+    - Flushes them as one batched FaceNet forward pass when the batch is full
+      or the oldest queued face has waited max_wait_ms
+    - Tracks queue depth and batch-size statistics; on_flush(batch_size, forward_ms)
+      is called after every forward pass and on_queue(delta) whenever faces
+      enter (+1) or leave (-batch_size) the queue (e.g. to export metrics)
+    """
+
+    def __init__(self, encoder, max_batch_size=None, max_wait_ms=None, on_flush=None, on_queue=None):
+        self.encoder = encoder
+        self.on_flush = on_flush
+        self.on_queue = on_queue
+        self.max_batch_size = max_batch_size if max_batch_size is not None else int(os.getenv('BATCH_MAX_SIZE', 16))
+        self.max_wait_ms = max_wait_ms if max_wait_ms is not None else float(os.getenv('BATCH_MAX_WAIT_MS', 5))
+
+        if self.max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._running = False
+        self._lock = threading.Lock()
+
+        # Statistics
+        self._batches = 0
+        self._items = 0
+        self._full_flushes = 0
+        self._timeout_flushes = 0
+        self._largest_batch = 0
+        self._batch_size_counts = {}
+        self._total_forward_ms = 0.0
+
+    def start(self):
+        """Start the background flush thread"""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name='face-batch-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Stop the flush thread after draining queued faces"""
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def submit(self, face):
+        """
+        Queue an aligned face for the next batch
+
+        Args:
+            face: numpy array, 160x160 RGB crop from FaceEncoder.align_face
+
+        Returns:
+            concurrent.futures.Future: resolves to a 512-D numpy embedding
+        """
+        if not self._running:
+            self.start()
+
+        future = Future()
+        # Counted before the put so the scheduler thread never reports it leaving first
+        if self.on_queue is not None:
+            self.on_queue(1)
+        self._queue.put((face, future))
+        return future
+
+    def embed(self, face, timeout=None):
+        """
+        Embed an aligned face crop through the scheduler (blocking)
+
+        Args:
+            face: numpy array, 160x160 RGB crop from FaceEncoder.align_face
+            timeout: float, seconds to wait for the result
+
+        Returns:
+            numpy array: face embedding vector (512-D)
+        """
+        return self.submit(face).result(timeout=timeout)
+
+    def _collect(self, first):
+        """Gather up to max_batch_size items, waiting at most max_wait_ms after the first"""
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait_ms / 1000.0
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Stop sentinel - flush what we have, then exit
+                self._queue.put(None)
+                break
+            batch.append(item)
+
+        return batch
+
+    def _run(self):
+        """Flush loop executed on the scheduler thread"""
+        while True:
+            first = self._queue.get()
+            if first is None:
+                if not self._running:
+                    return
+                continue
+
+            batch = self._collect(first)
+            if self.on_queue is not None:
+                self.on_queue(-len(batch))
+            self._flush(batch)
+
+    def _flush(self, batch):
+        """Run one batched forward pass and resolve the waiting futures"""
+        futures = [future for _, future in batch]
+
+        # Skip faces whose caller already gave up
+        live = [(face, future) for face, future in batch if future.set_running_or_notify_cancel()]
+        if not live:
+            return
+
+        start = time.perf_counter()
+        try:
+            embeddings = self.encoder.embed_faces([face for face, _ in live])
+            for (_, future), embedding in zip(live, embeddings):
+                future.set_result(embedding)
+        except Exception as e:
+            logger.error(f"Error in batched embedding extraction: {str(e)}")
+            for _, future in live:
+                if not future.done():
+                    future.set_exception(e)
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+
+        size = len(live)
+        with self._lock:
+            self._batches += 1
+            self._items += size
+            self._total_forward_ms += elapsed_ms
+            self._largest_batch = max(self._largest_batch, size)
+            self._batch_size_counts[size] = self._batch_size_counts.get(size, 0) + 1
+            if len(futures) >= self.max_batch_size:
+                self._full_flushes += 1
+            else:
+                self._timeout_flushes += 1
+
+        if self.on_flush is not None:
+            self.on_flush(size, elapsed_ms)
+
+    def get_queue_depth(self):
+        """Number of faces waiting for the next batch"""
+        return self._queue.qsize()
+
+    def get_stats(self):
+        """
+        Get scheduler statistics
+
+        Returns:
+            dict: queue depth, batch counts and batch-size distribution
+        """
+        with self._lock:
+            return {
+                'running': self._running,
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait_ms,
+                'queue_depth': self.get_queue_depth(),
+                'batches': self._batches,
+                'faces_embedded': self._items,
+                'avg_batch_size': (self._items / self._batches) if self._batches else 0.0,
+                'largest_batch': self._largest_batch,
+                'full_flushes': self._full_flushes,
+                'timeout_flushes': self._timeout_flushes,
+                'avg_forward_ms': (self._total_forward_ms / self._batches) if self._batches else 0.0,
+                'batch_size_histogram': {str(k): v for k, v in sorted(self._batch_size_counts.items())}
+            }
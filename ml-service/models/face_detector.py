@@ -0,0 +1,218 @@
+import logging
+import os
+import threading
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# FACE_DETECTION_MODEL values; 'mtcnn' runs MTCNN alone, the others put a fast OpenCV detector in front of it
+DETECTION_MODELS = ('mtcnn', 'haar', 'yunet')
+
+DEFAULT_YUNET_MODEL = 'face_detection_yunet_2023mar.onnx'
+
+# Haar boxes are square and stop at the mouth; MTCNN boxes are narrower and reach the chin.
+# Reshape them (as fractions of the Haar box side) so crops match what enrolment stored.
+HAAR_BOX_WIDTH = 0.88
+HAAR_BOX_HEIGHT = 1.12
+
+# Smallest face (px) the default Haar cascade can detect
+HAAR_WINDOW = 24
+
+
+class HaarFaceDetector:
+    """
+    OpenCV Haar (or LBP) cascade face detector
+    - Ships with opencv-python (cv2.data.haarcascades); FACE_CASCADE_PATH may
+      point to another cascade XML, e.g. an LBP one
+    - Runs on a grayscale copy downscaled to FAST_DETECTION_SIZE and skips
+      faces smaller than FAST_DETECTION_MIN_FACE_SIZE (original pixels), which
+      keeps the expensive fine scales out of the scan
+    - The score is the cascade's final stage weight (roughly 0-10); it is not
+      a probability, so no detection confidence is reported for its faces
+    """
+
+    name = 'haar'
+    reports_probability = False
+
+    def __init__(self, cascade_path=None, detection_size=None, min_score=None, min_face_size=None):
+        """
+        Args:
+            cascade_path: str, cascade XML file (default FACE_CASCADE_PATH or the bundled frontal face cascade)
+            detection_size: int, longest side of the detection image
+            min_score: float, lowest stage weight accepted without MTCNN fallback
+            min_face_size: int, smallest face side searched for, in original image pixels
+        """
+        default_path = os.path.join(getattr(cv2, 'data', None) and cv2.data.haarcascades or '', 'haarcascade_frontalface_default.xml')
+        self.cascade_path = cascade_path or os.getenv('FACE_CASCADE_PATH', default_path)
+        self.detection_size = detection_size if detection_size is not None else int(os.getenv('FAST_DETECTION_SIZE', 240))
+        self.min_score = min_score if min_score is not None else float(os.getenv('FAST_DETECTION_MIN_SCORE', 2.5))
+        self.min_face_size = min_face_size if min_face_size is not None else int(os.getenv('FAST_DETECTION_MIN_FACE_SIZE', 80))
+        self._local = threading.local()
+
+        if not hasattr(cv2, 'CascadeClassifier') or not os.path.exists(self.cascade_path):
+            raise RuntimeError(f"face cascade unavailable ({self.cascade_path})")
+
+    def _cascade(self):
+        """Cascade for the calling thread (CascadeClassifier is not thread-safe)"""
+        cascade = getattr(self._local, 'cascade', None)
+        if cascade is None:
+            cascade = cv2.CascadeClassifier(self.cascade_path)
+            self._local.cascade = cascade
+        return cascade
+
+    def detect_all(self, image):
+        """
+        Detect every face
+
+        Args:
+            image: numpy array (BGR format)
+
+        Returns:
+            list: [((x1, y1, x2, y2), score), ...] in original image coordinates, best first
+        """
+        small, scale = _downscale(image, self.detection_size)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        min_side = max(HAAR_WINDOW, int(self.min_face_size / scale))
+        boxes, _, weights = self._cascade().detectMultiScale3(
+            gray, scaleFactor=1.1, minNeighbors=5, minSize=(min_side, min_side), outputRejectLevels=True
+        )
+
+        height, width = image.shape[:2]
+        faces = []
+        for (x, y, w, h), weight in zip(boxes, np.ravel(weights)):
+            side = w * scale
+            cx = (x + w / 2.0) * scale
+            box_width = side * HAAR_BOX_WIDTH
+            x1 = max(0, int(cx - box_width / 2))
+            x2 = min(width, int(cx + box_width / 2))
+            y1 = max(0, int(y * scale))
+            y2 = min(height, int(y * scale + side * HAAR_BOX_HEIGHT))
+            if x2 > x1 and y2 > y1:
+                faces.append(((x1, y1, x2, y2), float(weight)))
+
+        faces.sort(key=lambda face: -face[1])
+        return faces
+
+
+class YuNetFaceDetector:
+    """
+    OpenCV YuNet CNN face detector (cv2.FaceDetectorYN, OpenCV >= 4.8)
+    - The ONNX model (about 230 KB) is not bundled with opencv-python; it is
+      read from FACE_YUNET_MODEL, by default MODEL_CACHE_DIR/face_detection_yunet_2023mar.onnx,
+      and never downloaded
+    - Runs on a copy downscaled to FAST_DETECTION_SIZE
+    - The score is a face probability (0-1)
+    """
+
+    name = 'yunet'
+    reports_probability = True
+
+    def __init__(self, model_path=None, detection_size=None, min_score=None, cache_dir=None):
+        """
+        Args:
+            model_path: str, YuNet ONNX file
+            detection_size: int, longest side of the detection image
+            min_score: float, lowest face probability accepted without MTCNN fallback
+            cache_dir: str, directory holding the default model file
+        """
+        default_path = os.path.join(cache_dir or '', DEFAULT_YUNET_MODEL)
+        self.model_path = model_path or os.getenv('FACE_YUNET_MODEL', default_path)
+        self.detection_size = detection_size if detection_size is not None else int(os.getenv('FAST_DETECTION_SIZE', 240))
+        self.min_score = min_score if min_score is not None else float(os.getenv('FAST_DETECTION_MIN_SCORE', 0.85))
+        self._local = threading.local()
+
+        if not hasattr(cv2, 'FaceDetectorYN'):
+            raise RuntimeError(f"cv2.FaceDetectorYN needs OpenCV >= 4.8 (found {cv2.__version__})")
+        if not os.path.exists(self.model_path):
+            raise RuntimeError(f"YuNet model not found ({self.model_path})")
+
+    def _detector(self, size):
+        """YuNet instance for the calling thread, sized for the input image"""
+        detector = getattr(self._local, 'detector', None)
+        if detector is None:
+            # Low internal threshold: weak faces must still count as "several faces" or "low confidence"
+            detector = cv2.FaceDetectorYN.create(self.model_path, '', size, 0.5, 0.3, 50)
+            self._local.detector = detector
+            self._local.size = None
+        if self._local.size != size:
+            detector.setInputSize(size)
+            self._local.size = size
+        return detector
+
+    def detect_all(self, image):
+        """
+        Detect every face
+
+        Args:
+            image: numpy array (BGR format)
+
+        Returns:
+            list: [((x1, y1, x2, y2), score), ...] in original image coordinates, best first
+        """
+        small, scale = _downscale(image, self.detection_size)
+        _, detections = self._detector((small.shape[1], small.shape[0])).detect(small)
+
+        if detections is None:
+            return []
+
+        height, width = image.shape[:2]
+        faces = []
+        for row in detections:
+            x, y, w, h = row[:4] * scale
+            x1, y1 = max(0, int(x)), max(0, int(y))
+            x2, y2 = min(width, int(x + w)), min(height, int(y + h))
+            if x2 > x1 and y2 > y1:
+                faces.append(((x1, y1, x2, y2), float(row[-1])))
+
+        faces.sort(key=lambda face: -face[1])
+        return faces
+
+
+def _downscale(image, max_size):
+    """
+    Downscale an image so its longest side is at most max_size
+
+    Returns:
+        tuple: (image, scale) where original = small * scale
+    """
+    height, width = image.shape[:2]
+    longest_side = max(height, width)
+
+    if max_size <= 0 or longest_side <= max_size:
+        return image, 1.0
+
+    scale = longest_side / float(max_size)
+    small = cv2.resize(image, (max(1, int(round(width / scale))), max(1, int(round(height / scale)))), interpolation=cv2.INTER_AREA)
+    return small, scale
+
+
+def create_fast_detector(name, cache_dir=None):
+    """
+    Build the first-stage detector selected by FACE_DETECTION_MODEL
+
+    Args:
+        name: str, one of DETECTION_MODELS
+        cache_dir: str, model cache directory (YuNet model location)
+
+    Returns:
+        detector with detect_all(image), or None to run MTCNN alone
+    """
+    name = (name or 'mtcnn').lower()
+
+    if name == 'mtcnn':
+        return None
+
+    if name not in DETECTION_MODELS:
+        logger.warning(f"Unknown face detection model '{name}', using MTCNN")
+        return None
+
+    try:
+        detector = HaarFaceDetector() if name == 'haar' else YuNetFaceDetector(cache_dir=cache_dir)
+        logger.info(f"Face detection: {name} with MTCNN fallback (min score {detector.min_score})")
+        return detector
+
+    except Exception as e:
+        logger.warning(f"Could not initialise {name} face detector ({str(e)}), using MTCNN")
+        return None
@@ -1,10 +1,23 @@
 import cv2
 import numpy as np
-from facenet_pytorch import MTCNN, InceptionResnetV1
+from facenet_pytorch import MTCNN
+import logging
 import os
+import threading
+import time
 import torch
-from PIL import Image
-import torchvision.transforms as transforms
+
+from models.face_detector import create_fast_detector
+from models.inference_backend import TorchBackend, create_backend
+from models.quantization import load_quantized_model
+from models.weights import DEFAULT_MODEL_CACHE_DIR, FACENET_EMBEDDING_SIZE, load_facenet
+from utils.image_processor import ImageProcessor
+
+logger = logging.getLogger(__name__)
+
+# FaceNet input side; crops are normalized as ToTensor + Normalize(0.5, 0.5) would: x / 127.5 - 1
+FACE_INPUT_SIZE = 160
+PIXEL_SCALE = 1.0 / 127.5
 
 class FaceEncoder:
     """
@@ -12,35 +25,258 @@ class FaceEncoder:
     - Uses MTCNN for face detection
     - Uses FaceNet (CNN-based) for generating 512-dimensional face embeddings
     - Pre-trained on VGGFace2 dataset for high accuracy
+    - MTCNN.detect returns every face; single-face calls keep the most
+      confident one, group calls (detect_and_align_all) keep them all
+    - Detection runs on a copy downscaled to DETECTION_MAX_SIZE (group
+      detection to GROUP_DETECTION_MAX_SIZE); the face is cropped from the
+      full-resolution image for embedding
+    - Preprocessing is OpenCV/numpy only: the detection image is converted to
+      RGB into a per-thread buffer, the face crop is resized straight to
+      160x160, and tensors are normalized in place into preallocated float32
+      memory (per-thread batch buffers for the forward pass)
+    - FACE_DETECTION_MODEL=haar|yunet puts a fast OpenCV detector in front of
+      MTCNN for single-face detection; MTCNN runs only when it finds no face,
+      several faces or a score below FAST_DETECTION_MIN_SCORE
+    - FACE_INFERENCE_BACKEND selects eager torch, TorchScript or ONNX Runtime
+      for the embedding forward pass; exported models are cached in MODEL_CACHE_DIR
+    - FACE_QUANTIZATION=dynamic|static switches to an INT8 model on CPU
+    - FaceNet weights are read from MODEL_CACHE_DIR (downloaded once if missing);
+      load_timings records how long each part took to load
     """
     
-    def __init__(self):
+    def __init__(self, defer_backend=False, on_detect=None):
+        """
+        Args:
+            defer_backend: bool, load the weights only and leave the inference
+                           backend to ensure_backend() (e.g. after a pre-fork)
+            on_detect: callable(detector, result), called after every fast detector
+                       attempt with 'accepted' or the reason MTCNN had to run
+        """
         self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        self.load_timings = {}
+        start = time.perf_counter()
         self.detector = MTCNN(keep_all=False, device=self.device)
+        self.load_timings['mtcnn_ms'] = round((time.perf_counter() - start) * 1000.0, 1)
+        self.image_processor = ImageProcessor()
+        self.model_cache_dir = os.getenv('MODEL_CACHE_DIR', DEFAULT_MODEL_CACHE_DIR)
+        self.fast_detector = create_fast_detector(os.getenv('FACE_DETECTION_MODEL', 'mtcnn'), self.model_cache_dir)
+        self.on_detect = on_detect
+        self._detect_lock = threading.Lock()
+        self._detect_results = {}
+        self._local = threading.local()
+        self.batch_buffer_max_size = int(os.getenv('BATCH_BUFFER_MAX_SIZE', 32))
         self.model = None
-        self.embedding_size = 512
+        self.backend = None
+        self.backend_name = os.getenv('FACE_INFERENCE_BACKEND', 'torch')
+        self.quantization = os.getenv('FACE_QUANTIZATION', 'none').lower()
+        self.embedding_size = FACENET_EMBEDDING_SIZE
         self._load_model()
+        if not defer_backend:
+            self.ensure_backend()
         
     def _load_model(self):
         """Load FaceNet CNN model (InceptionResnetV1)"""
         try:
-            # Load pre-trained FaceNet CNN model trained on VGGFace2
-            self.model = InceptionResnetV1(pretrained='vggface2').eval().to(self.device)
-            print("✅ FaceNet CNN model loaded successfully (InceptionResnetV1 - VGGFace2)")
-            print(f"   Device: {self.device.upper()}")
-            print(f"   Embedding size: {self.embedding_size}D")
+            # Pre-trained on VGGFace2 by default; FACENET_PRETRAINED=none builds
+            # random weights for offline benchmarks
+            pretrained = os.getenv('FACENET_PRETRAINED', 'vggface2')
+            start = time.perf_counter()
+            self.model = load_facenet(pretrained, self.model_cache_dir, self.device)
+            self.load_timings['facenet_weights_ms'] = round((time.perf_counter() - start) * 1000.0, 1)
+            logger.info(
+                "FaceNet CNN model loaded successfully (InceptionResnetV1 - VGGFace2)",
+                extra={'device': self.device, 'embedding_size': self.embedding_size, 'weights': pretrained}
+            )
         except Exception as e:
-            print(f"❌ Error loading FaceNet model: {str(e)}")
+            logger.error(f"Error loading FaceNet model: {str(e)}")
             self.model = None
     
+    def ensure_backend(self):
+        """
+        Create the inference backend if it does not exist yet
+        
+        ONNX Runtime sessions and quantized models own threads and memory
+        that do not survive fork, so pre-forked workers create them here.
+        """
+        if self.backend is not None or self.model is None:
+            return
+        
+        try:
+            start = time.perf_counter()
+            self.backend = self._create_backend()
+            self.load_timings['inference_backend_ms'] = round((time.perf_counter() - start) * 1000.0, 1)
+        except Exception as e:
+            logger.error(f"Error creating inference backend: {str(e)}")
+            self.backend = None
+    
+    def _create_backend(self):
+        """Pick the INT8 model when quantization is enabled, else the configured backend"""
+        if self.quantization != 'none':
+            if self.device != 'cpu':
+                logger.warning(f"FACE_QUANTIZATION={self.quantization} is CPU-only, ignoring it on {self.device}")
+            else:
+                try:
+                    quantized = load_quantized_model(self.quantization, self.model, self.model_cache_dir)
+                    logger.info(f"Using INT8 {self.quantization}-quantized FaceNet model")
+                    return TorchBackend(quantized, self.device, name=f"int8_{self.quantization}")
+                except Exception as e:
+                    logger.warning(f"Could not load {self.quantization} INT8 model ({str(e)}), using FP32")
+        
+        return create_backend(self.backend_name, self.model, self.device, self.model_cache_dir)
+    
     def is_loaded(self):
         """Check if model is loaded"""
         return self.model is not None
     
+    def get_backend_name(self):
+        """Get the active inference backend"""
+        return self.backend.name if self.backend is not None else None
+    
     def get_embedding_size(self):
         """Get embedding vector size"""
         return self.embedding_size
     
+    def get_detection_model(self):
+        """Get the active face detector chain, e.g. 'haar+mtcnn'"""
+        return f"{self.fast_detector.name}+mtcnn" if self.fast_detector is not None else 'mtcnn'
+    
+    def get_detection_stats(self):
+        """
+        Get fast detector statistics
+        
+        Returns:
+            dict: detector chain, attempts by result and the share answered without MTCNN
+        """
+        with self._detect_lock:
+            results = dict(self._detect_results)
+        attempts = sum(results.values())
+        
+        return {
+            'model': self.get_detection_model(),
+            'results': results,
+            'fast_path_rate': round(results.get('accepted', 0) / attempts, 4) if attempts else 0.0
+        }
+    
+    def _fast_detect(self, image):
+        """
+        Try the fast detector alone
+        
+        Returns:
+            tuple: ((x1, y1, x2, y2), probability) when it found exactly one
+                   confident face, else None (MTCNN decides)
+        """
+        try:
+            faces = self.fast_detector.detect_all(image)
+        except Exception as e:
+            logger.warning(f"{self.fast_detector.name} face detection failed ({str(e)}), using MTCNN")
+            faces = None
+        
+        if faces is None:
+            result = 'error'
+        elif not faces:
+            result = 'no_face'
+        elif len(faces) > 1:
+            result = 'multiple_faces'
+        elif faces[0][1] < self.fast_detector.min_score:
+            result = 'low_confidence'
+        else:
+            result = 'accepted'
+        
+        with self._detect_lock:
+            self._detect_results[result] = self._detect_results.get(result, 0) + 1
+        if self.on_detect is not None:
+            self.on_detect(self.fast_detector.name, result)
+        
+        if result != 'accepted':
+            return None
+        
+        face_box, score = faces[0]
+        return face_box, score if self.fast_detector.reports_probability else None
+    
+    def _detect_all(self, image, max_size=None):
+        """
+        Run MTCNN once on a downscaled copy and return every detected face
+
+        Args:
+            image: numpy array (BGR format from OpenCV)
+            max_size: int, longest side of the detection image (default DETECTION_MAX_SIZE, 0 = full size)
+
+        Returns:
+            list: [((x1, y1, x2, y2), probability), ...] in original image
+                  coordinates, most confident first (empty if no face)
+        """
+        # Detect on a bounded-size image; scale maps boxes back to the original
+        detection_image, scale = self.image_processor.prepare_detection_image(image, max_size)
+
+        # Convert BGR to RGB into this thread's reusable frame buffer (MTCNN copies its input)
+        rgb_image = cv2.cvtColor(detection_image, cv2.COLOR_BGR2RGB, dst=self._buffer('rgb', detection_image.shape, np.uint8))
+
+        # Detect faces - returns boxes, probs
+        boxes, probs = self.detector.detect(rgb_image)
+
+        if boxes is None or len(boxes) == 0:
+            return []
+
+        height, width = image.shape[:2]
+        faces = []
+        for idx in np.argsort(-probs):
+            # Convert to integer coordinates within the original image
+            x1, y1, x2, y2 = [int(coord) for coord in boxes[idx] * scale]
+            x1, x2 = max(0, x1), min(width, x2)
+            y1, y2 = max(0, y1), min(height, y2)
+
+            if x2 > x1 and y2 > y1:
+                faces.append(((x1, y1, x2, y2), float(probs[idx])))
+
+        return faces
+
+    def _detect(self, image):
+        """
+        Return the most confident face from the fast detector, or from MTCNN
+        run once on a downscaled copy when the fast detector is unsure
+
+        Args:
+            image: numpy array (BGR format from OpenCV)
+
+        Returns:
+            tuple: ((x1, y1, x2, y2), probability) in original image
+                   coordinates, or (None, None); probability is None for
+                   fast detectors that do not report one
+        """
+        if self.fast_detector is not None:
+            detected = self._fast_detect(image)
+            if detected is not None:
+                return detected
+
+        faces = self._detect_all(image)
+
+        if not faces:
+            logger.debug("No face detected by MTCNN")
+            return None, None
+
+        # Get first face with highest confidence
+        (x1, y1, x2, y2), probability = faces[0]
+
+        logger.debug("Face detected: box=(%d, %d, %d, %d), confidence=%.3f", x1, y1, x2, y2, probability)
+        return (x1, y1, x2, y2), probability
+
+    def detect(self, image):
+        """
+        Detect the most confident face and its detection probability
+        
+        Args:
+            image: numpy array (BGR format from OpenCV)
+            
+        Returns:
+            tuple: ((x1, y1, x2, y2), probability) or (None, None)
+        """
+        try:
+            return self._detect(image)
+            
+        except Exception as e:
+            logger.exception(f"Error in face detection: {str(e)}")
+            return None, None
+    
     def detect_face(self, image):
         """
         Detect face in image using MTCNN
@@ -51,111 +287,309 @@ class FaceEncoder:
         Returns:
             tuple: (x1, y1, x2, y2) face bounding box or None
         """
+        face_box, _ = self.detect(image)
+        return face_box
+    
+    def align_face(self, image, face_box):
+        """
+        Crop the detected face with padding and resize it to the FaceNet input size
+
+        Args:
+            image: numpy array (BGR format)
+            face_box: tuple (x1, y1, x2, y2)
+
+        Returns:
+            numpy array: 160x160 RGB face crop or None
+        """
+        # Extract face region with padding
+        x1, y1, x2, y2 = face_box
+        # Add 10% padding around face
+        padding = int((x2 - x1) * 0.1)
+        x1 = max(0, x1 - padding)
+        y1 = max(0, y1 - padding)
+        x2 = min(image.shape[1], x2 + padding)
+        y2 = min(image.shape[0], y2 + padding)
+
+        face_img = image[y1:y2, x1:x2]
+
+        if face_img.size == 0:
+            logger.warning("Empty face region")
+            return None
+
+        # Resize the crop view straight to 160x160 (FaceNet input size); area
+        # averaging when shrinking stays within a grey level of PIL's bilinear
+        shrinking = face_img.shape[0] > FACE_INPUT_SIZE and face_img.shape[1] > FACE_INPUT_SIZE
+        face = cv2.resize(face_img, (FACE_INPUT_SIZE, FACE_INPUT_SIZE), interpolation=cv2.INTER_AREA if shrinking else cv2.INTER_LINEAR)
+
+        # Convert to RGB in place (only the small crop)
+        return cv2.cvtColor(face, cv2.COLOR_BGR2RGB, dst=face)
+
+    def preprocess_face(self, face, out=None):
+        """
+        Convert an aligned face crop to a normalized FaceNet input tensor
+
+        Args:
+            face: numpy array, 160x160 RGB crop from align_face
+            out: torch.Tensor, 3x160x160 float32 CPU tensor to write into
+                 (e.g. a row of a batch buffer); a new one if omitted, for
+                 callers that keep the tensor (embed_faces needs none)
+
+        Returns:
+            torch.Tensor: 3x160x160 float tensor
+        """
+        if out is None:
+            out = torch.from_numpy(np.empty((3, FACE_INPUT_SIZE, FACE_INPUT_SIZE), dtype=np.float32))
+
+        # HWC uint8 -> CHW float32 in [-1, 1], written in place without temporaries
+        values = out.numpy()
+        np.multiply(face.transpose(2, 0, 1), PIXEL_SCALE, out=values, dtype=np.float32)
+        np.subtract(values, 1.0, out=values)
+
+        return out
+
+    def _buffer(self, name, shape, dtype):
+        """Reusable per-thread array, reallocated only when the shape changes"""
+        buffer = getattr(self._local, name, None)
+        if buffer is None or buffer.shape != shape:
+            buffer = np.empty(shape, dtype=dtype)
+            setattr(self._local, name, buffer)
+        return buffer
+
+    def _batch_buffer(self, batch_size):
+        """
+        Per-thread float32 batch tensor for batch_size faces
+
+        Grows to the largest batch seen and is reused by later forward passes
+        on the same thread, so batching does not allocate a new input tensor.
+        Batches above BATCH_BUFFER_MAX_SIZE (large group photos) get a tensor
+        of their own that is not kept, so one big request does not pin
+        ~300 KB per face on every worker thread.
+        """
+        buffer = getattr(self._local, 'batch', None)
+        if buffer is not None and buffer.shape[0] >= batch_size:
+            return buffer[:batch_size]
+
+        buffer = torch.from_numpy(np.empty((batch_size, 3, FACE_INPUT_SIZE, FACE_INPUT_SIZE), dtype=np.float32))
+        if batch_size <= self.batch_buffer_max_size:
+            self._local.batch = buffer
+        return buffer
+
+    def embed_batch(self, face_tensors):
+        """
+        Run one batched FaceNet forward pass
+
+        Args:
+            face_tensors: list of 3x160x160 tensors from preprocess_face
+
+        Returns:
+            numpy array: (N, 512) face embeddings
+        """
+        if self.backend is None:
+            raise Exception("Model not loaded")
+
+        batch = torch.stack(face_tensors, out=self._batch_buffer(len(face_tensors)))
+
+        # Extract embeddings with the configured backend
+        return self.backend(batch)
+
+    def embed_face(self, face):
+        """
+        Run FaceNet on an aligned face crop
+
+        Args:
+            face: numpy array, 160x160 RGB crop from align_face
+
+        Returns:
+            numpy array: face embedding vector (512-D)
+        """
+        return self.embed_faces([face])[0]
+
+    def embed_faces(self, faces):
+        """
+        Run one batched FaceNet forward pass on aligned face crops
+
+        The crops are normalized straight into the thread's batch buffer, so
+        no per-face tensors are allocated.
+
+        Args:
+            faces: list of 160x160 RGB crops from align_face
+
+        Returns:
+            numpy array: (N, 512) face embeddings
+        """
+        if self.backend is None:
+            raise Exception("Model not loaded")
+
+        batch = self._batch_buffer(len(faces))
+        for row, face in zip(batch, faces):
+            self.preprocess_face(face, out=row)
+
+        return self.backend(batch)
+
+    def detect_and_align(self, image):
+        """
+        Detect the most confident face and return its aligned crop
+
+        Args:
+            image: numpy array (BGR format)
+
+        Returns:
+            dict: {'box', 'probability', 'face'} or None if no face
+        """
         try:
-            # Convert BGR to RGB
-            rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            # Convert to PIL Image
-            pil_image = Image.fromarray(rgb_image)
-            
-            # Detect faces - returns boxes, probs
-            boxes, probs = self.detector.detect(pil_image)
-            
-            if boxes is None or len(boxes) == 0:
-                print("No face detected by MTCNN")
+            face_box, probability = self._detect(image)
+
+            if face_box is None:
                 return None
-            
-            # Get first face with highest confidence
-            best_idx = np.argmax(probs)
-            box = boxes[best_idx]
-            
-            # Convert to integer coordinates
-            x1, y1, x2, y2 = [int(coord) for coord in box]
-            
-            print(f"✅ Face detected: box=({x1}, {y1}, {x2}, {y2}), confidence={probs[best_idx]:.3f}")
-            return (x1, y1, x2, y2)
-            
+
+            face = self.align_face(image, face_box)
+
+            if face is None:
+                return None
+
+            return {
+                'box': face_box,
+                'probability': probability,
+                'face': face
+            }
+
         except Exception as e:
-            print(f"❌ Error in face detection: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.error(f"Error in face detection: {str(e)}")
             return None
-    
-    def extract_embedding(self, image):
+
+    def detect_and_align_all(self, image, max_faces=None, min_probability=0.0, max_size=None):
         """
-        Extract face embedding from image
+        Detect every face in a group image and return their aligned crops
+
+        Args:
+            image: numpy array (BGR format)
+            max_faces: int, keep at most this many faces (most confident first)
+            min_probability: float, drop detections below this MTCNN probability
+            max_size: int, longest side of the detection image (default GROUP_DETECTION_MAX_SIZE)
+
+        Returns:
+            list: [{'box', 'probability', 'face'}, ...] (empty if no face)
+        """
+        try:
+            results = []
+            if max_size is None:
+                max_size = self.image_processor.group_detection_max_size
+            
+            for face_box, probability in self._detect_all(image, max_size):
+                if probability < min_probability:
+                    continue
+
+                face = self.align_face(image, face_box)
+                if face is None:
+                    continue
+
+                results.append({
+                    'box': face_box,
+                    'probability': probability,
+                    'face': face
+                })
+
+                if max_faces is not None and len(results) >= max_faces:
+                    break
+
+            return results
+
+        except Exception as e:
+            logger.error(f"Error in face detection: {str(e)}")
+            return []
+
+    def detect_and_embed(self, image):
+        """
+        Detect the face and extract its embedding with a single MTCNN pass
         
         Args:
             image: numpy array (BGR format)
             
         Returns:
-            numpy array: face embedding vector (512-D) or None
+            dict: {'box', 'probability', 'face', 'embedding'} or None if no face
         """
         try:
             if self.model is None:
                 raise Exception("Model not loaded")
             
-            # Detect face
-            face_box = self.detect_face(image)
+            result = self.detect_and_align(image)
             
-            if face_box is None:
+            if result is None:
                 return None
             
-            # Extract face region with padding
-            x1, y1, x2, y2 = face_box
-            # Add 10% padding around face
-            padding = int((x2 - x1) * 0.1)
-            x1 = max(0, x1 - padding)
-            y1 = max(0, y1 - padding)
-            x2 = min(image.shape[1], x2 + padding)
-            y2 = min(image.shape[0], y2 + padding)
-            
-            face_img = image[y1:y2, x1:x2]
-            
-            if face_img.size == 0:
-                print("❌ Empty face region")
-                return None
-            
-            # Convert to RGB
-            face_rgb = cv2.cvtColor(face_img, cv2.COLOR_BGR2RGB)
-            
-            # Convert to PIL Image
-            face_pil = Image.fromarray(face_rgb)
-            
-            # Resize to 160x160 (FaceNet input size)
-            face_resized = face_pil.resize((160, 160), Image.BILINEAR)
-            
-            # Transform to tensor
-            transform = transforms.Compose([
-                transforms.ToTensor(),
-                transforms.Normalize(mean=[0.5, 0.5, 0.5], std=[0.5, 0.5, 0.5])
-            ])
-            
-            face_tensor = transform(face_resized).unsqueeze(0).to(self.device)
-            
-            # Extract embedding
-            with torch.no_grad():
-                embedding = self.model(face_tensor)
-            
-            # Convert to numpy array
-            embedding_np = embedding.cpu().numpy().flatten()
-            
-            return embedding_np
+            result['embedding'] = self.embed_face(result['face'])
+            return result
             
         except Exception as e:
-            print(f"Error in embedding extraction: {str(e)}")
+            logger.error(f"Error in face detection and embedding: {str(e)}")
             return None
     
-    def calculate_quality_score(self, face_box):
+    def extract_embedding(self, image):
+        """
+        Extract face embedding from image
+        
+        Args:
+            image: numpy array (BGR format)
+            
+        Returns:
+            numpy array: face embedding vector (512-D) or None
+        """
+        result = self.detect_and_embed(image)
+        
+        if result is None:
+            return None
+        
+        return result['embedding']
+    
+    def warm_up(self, batch_sizes=(1,), iterations=1):
+        """
+        Run synthetic detection and forward passes before serving traffic
+        
+        The first calls pay for lazy kernel selection, allocator growth and
+        (for TorchScript/ONNX) graph optimization; doing them here keeps that
+        cost out of the first real requests.
+        
+        Args:
+            batch_sizes: iterable of int, forward-pass batch sizes to exercise
+            iterations: int, passes over every shape
+            
+        Returns:
+            float: warm-up time in milliseconds
+        """
+        start = time.perf_counter()
+        rng = np.random.default_rng(0)
+        image = rng.integers(0, 256, size=(480, 640, 3), dtype=np.uint8)
+        face = rng.integers(0, 256, size=(160, 160, 3), dtype=np.uint8)
+        
+        for _ in range(iterations):
+            # Both detectors, bypassing the fast-path statistics
+            if self.fast_detector is not None:
+                self.fast_detector.detect_all(image)
+            self._detect_all(image)
+            if self.backend is not None:
+                for batch_size in batch_sizes:
+                    self.embed_faces([face] * batch_size)
+        
+        elapsed_ms = round((time.perf_counter() - start) * 1000.0, 1)
+        self.load_timings['warm_up_ms'] = elapsed_ms
+        return elapsed_ms
+    
+    def calculate_quality_score(self, face_box, detection_probability=None):
         """
         Calculate face quality score based on face size and detection confidence
         
         Args:
             face_box: tuple (x1, y1, x2, y2)
+            detection_probability: float, MTCNN face probability if available
             
         Returns:
             float: quality score (0-1)
         """
         try:
+            # Prefer the real detector confidence over the size heuristic
+            if detection_probability is not None:
+                return float(min(max(detection_probability, 0.0), 1.0))
+            
             x1, y1, x2, y2 = face_box
             face_width = x2 - x1
             face_height = y2 - y1
@@ -177,7 +611,7 @@ class FaceEncoder:
                 return min(score, 1.0)
                 
         except Exception as e:
-            print(f"Error calculating quality score: {str(e)}")
+            logger.error(f"Error calculating quality score: {str(e)}")
             return 0.5
     
     def extract_multiple_embeddings(self, images):
@@ -190,8 +624,26 @@ class FaceEncoder:
         Returns:
             list: embeddings or None for failed extractions
         """
-        embeddings = []
-        for image in images:
-            embedding = self.extract_embedding(image)
-            embeddings.append(embedding)
+        embeddings = [None] * len(images)
+        
+        # Detect faces one image at a time, then embed all crops in one forward pass
+        indices = []
+        faces = []
+        for i, image in enumerate(images):
+            result = self.detect_and_align(image)
+            if result is not None:
+                indices.append(i)
+                faces.append(result['face'])
+        
+        if not faces:
+            return embeddings
+        
+        try:
+            batch_embeddings = self.embed_faces(faces)
+        except Exception as e:
+            logger.error(f"Error in batch embedding extraction: {str(e)}")
+            return embeddings
+        
+        for i, embedding in zip(indices, batch_embeddings):
+            embeddings[i] = embedding
         return embeddings
@@ -1,15 +1,249 @@
+import logging
 import numpy as np
-from scipy.spatial.distance import cosine, euclidean
 import os
 
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+logger = logging.getLogger(__name__)
+
 class FaceMatcher:
     """
     Face matching and similarity calculation
+    - All scoring goes through similarity_matrix, which compares queries
+      against a gallery with one normalized matrix product
+    - Single-user verification (match_template) scores the user's precomputed
+      centroid first and skips the patterns only when no pattern can match
     """
     
-    def __init__(self, threshold=None):
+    def __init__(self, threshold=None, ambiguous_margin=None):
         self.distance_metric = os.getenv('DISTANCE_METRIC', 'cosine')
         self.threshold = threshold if threshold is not None else float(os.getenv('FACE_SIMILARITY_THRESHOLD', 0.70))
+        # Least slack kept between the best-pattern bound and the threshold before rejecting on the centroid
+        self.ambiguous_margin = ambiguous_margin if ambiguous_margin is not None else float(os.getenv('TEMPLATE_AMBIGUOUS_MARGIN', 0.05))
+    
+    @staticmethod
+    def _as_matrix(embeddings):
+        """Convert one embedding or a list of embeddings to a 2-D float32 array"""
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix.reshape(1, -1)
+        return matrix
+    
+    @staticmethod
+    def normalize(embeddings):
+        """
+        L2-normalize embeddings row-wise
+        
+        Args:
+            embeddings: numpy array (D,) or (N, D)
+            
+        Returns:
+            numpy array: float32 unit-length rows (zero rows stay zero)
+        """
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
+    
+    def similarity_matrix(self, queries, gallery):
+        """
+        Score queries against a gallery of embeddings in one matrix product
+        
+        Args:
+            queries: numpy array (D,) for one query or (Q, D) for many
+            gallery: numpy array (N, D) of stored embeddings
+            
+        Returns:
+            numpy array: (N,) similarities for a single query or (Q, N) matrix,
+                         0-1 scale, higher is more similar
+        """
+        single_query = np.ndim(queries) == 1
+        query_matrix = self._as_matrix(queries)
+        gallery_matrix = self._as_matrix(gallery)
+        
+        if gallery_matrix.size == 0:
+            scores = np.zeros((query_matrix.shape[0], 0), dtype=np.float32)
+            return scores[0] if single_query else scores
+        
+        # Ensure same dimensions
+        if query_matrix.shape[1] != gallery_matrix.shape[1]:
+            raise ValueError(f"Embedding dimensions don't match: {query_matrix.shape[1]} vs {gallery_matrix.shape[1]}")
+        
+        if self.distance_metric == 'euclidean':
+            # ||a - b||^2 = ||a||^2 + ||b||^2 - 2 a.b
+            query_sq = np.einsum('ij,ij->i', query_matrix, query_matrix)[:, None]
+            gallery_sq = np.einsum('ij,ij->i', gallery_matrix, gallery_matrix)[None, :]
+            squared = query_sq + gallery_sq - 2.0 * (query_matrix @ gallery_matrix.T)
+            distances = np.sqrt(np.maximum(squared, 0.0))
+            # Normalize to 0-1 range (assuming max distance is 4.0 for 512-D embeddings)
+            scores = np.maximum(0.0, 1.0 - distances / 4.0)
+        else:
+            # Cosine similarity (default): dot product of unit vectors
+            scores = self.normalize(query_matrix) @ self.normalize(gallery_matrix).T
+        
+        return scores[0] if single_query else scores
+    
+    def match_template(self, query, gallery, threshold=None, full_scores=False):
+        """
+        Two-stage verification of one query against a user's template
+        
+        Stage 1 takes two dot products with the precomputed template: the
+        centroid score c and the mean similarity to all patterns
+        (q . pattern_sum / N). No pattern scores more than c + radius (the
+        gallery's largest pattern-to-centroid distance), so when that bound is
+        below the threshold by at least ambiguous_margin the query is rejected
+        without touching the patterns, however spread out the gallery is.
+        Otherwise (and when full_scores is requested, or for a non-cosine
+        metric) stage 2 scores every pattern and the best one decides.
+        
+        Args:
+            query: numpy array (D,), query embedding
+            gallery: UserGallery with normalized, pattern_sum, centroid and radius
+            threshold: float, match threshold (default self.threshold)
+            full_scores: bool, always score every pattern
+            
+        Returns:
+            dict: {'match', 'similarity', 'avg_similarity', 'centroid_similarity',
+                   'stage', 'best_index', 'similarities'}; similarity is the best
+                   pattern score, except after a stage 1 reject where it is the
+                   bound on it (below the threshold); best_index and similarities
+                   are None in stage 1
+        """
+        threshold = self.threshold if threshold is None else threshold
+        
+        if self.distance_metric != 'cosine':
+            similarities = self.similarity_matrix(query, gallery.matrix)
+            best_index = int(similarities.argmax())
+            return {
+                'match': bool(similarities[best_index] >= threshold),
+                'similarity': float(similarities[best_index]),
+                'avg_similarity': float(similarities.mean()),
+                'centroid_similarity': None,
+                'stage': 'patterns',
+                'best_index': best_index,
+                'similarities': similarities
+            }
+        
+        unit_query = self.normalize(np.asarray(query, dtype=np.float32).ravel())
+        
+        # Stage 1: the template only
+        centroid_similarity = float(unit_query @ gallery.centroid)
+        avg_similarity = float(unit_query @ gallery.pattern_sum) / len(gallery)
+        
+        best_bound = min(1.0, centroid_similarity + gallery.radius)
+        
+        if not full_scores and best_bound < threshold - self.ambiguous_margin:
+            return {
+                'match': False,
+                'similarity': best_bound,
+                'avg_similarity': avg_similarity,
+                'centroid_similarity': centroid_similarity,
+                'stage': 'centroid',
+                'best_index': None,
+                'similarities': None
+            }
+        
+        # Stage 2: every pattern (rows are already unit length)
+        similarities = gallery.normalized @ unit_query
+        best_index = int(similarities.argmax())
+        
+        return {
+            'match': bool(similarities[best_index] >= threshold),
+            'similarity': float(similarities[best_index]),
+            'avg_similarity': avg_similarity,
+            'centroid_similarity': centroid_similarity,
+            'stage': 'patterns',
+            'best_index': best_index,
+            'similarities': similarities
+        }
+    
+    def user_similarity_matrix(self, queries, galleries):
+        """
+        Score queries against several users' galleries in one matrix product
+        
+        Args:
+            queries: numpy array (Q, D) of query embeddings
+            galleries: list of (N_u, D) gallery matrices, one per user
+            
+        Returns:
+            tuple: (scores, best_patterns)
+                scores: (Q, U) best similarity of each query to each user
+                        (-inf for users without stored embeddings)
+                best_patterns: (Q, U) row index of that best pattern in the user's gallery
+        """
+        query_matrix = self._as_matrix(queries)
+        counts = np.array([len(gallery) for gallery in galleries], dtype=np.int64)
+        scores = np.full((query_matrix.shape[0], len(galleries)), -np.inf, dtype=np.float32)
+        best_patterns = np.full(scores.shape, -1, dtype=np.int64)
+        
+        filled = np.nonzero(counts)[0]
+        if query_matrix.shape[0] == 0 or filled.size == 0:
+            return scores, best_patterns
+        
+        stacked = np.concatenate([galleries[u] for u in filled])
+        similarities = self.similarity_matrix(query_matrix, stacked)
+        
+        # Per-user maximum over that user's block of columns
+        offsets = np.concatenate(([0], np.cumsum(counts[filled])[:-1]))
+        scores[:, filled] = np.maximum.reduceat(similarities, offsets, axis=1)
+        for user, offset in zip(filled, offsets):
+            block = similarities[:, offset:offset + counts[user]]
+            best_patterns[:, user] = block.argmax(axis=1)
+        
+        return scores, best_patterns
+    
+    @staticmethod
+    def assign(scores, threshold=None):
+        """
+        One-to-one assignment of queries to users maximizing total similarity
+        
+        Uses the Hungarian algorithm from scipy when it is installed and a
+        greedy highest-score-first assignment otherwise.
+        
+        Args:
+            scores: numpy array (Q, U) from user_similarity_matrix
+            threshold: float, drop assigned pairs scoring below this
+            
+        Returns:
+            list: [(query_index, user_index, similarity), ...] sorted by user index
+        """
+        scores = np.asarray(scores, dtype=np.float64)
+        if scores.size == 0:
+            return []
+        
+        # Pairs below the threshold (and users without a gallery) are only used
+        # as a last resort, so as many queries as possible reach the threshold
+        allowed = np.isfinite(scores)
+        if threshold is not None:
+            allowed &= scores >= threshold
+        finite = np.where(allowed, scores, -1e9)
+        
+        if linear_sum_assignment is not None:
+            rows, columns = linear_sum_assignment(finite, maximize=True)
+            pairs = list(zip(rows.tolist(), columns.tolist()))
+        else:
+            pairs = []
+            used_rows, used_columns = set(), set()
+            for flat in np.argsort(-finite, axis=None, kind='stable'):
+                row, column = divmod(int(flat), finite.shape[1])
+                if row in used_rows or column in used_columns:
+                    continue
+                pairs.append((row, column))
+                used_rows.add(row)
+                used_columns.add(column)
+                if len(pairs) == min(finite.shape):
+                    break
+        
+        assignments = []
+        for row, column in pairs:
+            similarity = scores[row, column]
+            if not np.isfinite(similarity) or (threshold is not None and similarity < threshold):
+                continue
+            assignments.append((int(row), int(column), float(similarity)))
+        
+        return sorted(assignments, key=lambda item: item[1])
     
     def calculate_similarity(self, embedding1, embedding2):
         """
@@ -23,35 +257,14 @@ class FaceMatcher:
             float: similarity score (0-1, higher is more similar)
         """
         try:
-            # Convert to numpy arrays if needed
-            if not isinstance(embedding1, np.ndarray):
-                embedding1 = np.array(embedding1)
-            if not isinstance(embedding2, np.ndarray):
-                embedding2 = np.array(embedding2)
-            
             # Ensure same dimensions
             if len(embedding1) != len(embedding2):
                 raise ValueError(f"Embedding dimensions don't match: {len(embedding1)} vs {len(embedding2)}")
             
-            # Calculate similarity based on chosen metric
-            if self.distance_metric == 'cosine':
-                # Cosine similarity (1 - cosine distance)
-                distance = cosine(embedding1, embedding2)
-                similarity = 1 - distance
-            elif self.distance_metric == 'euclidean':
-                # Convert Euclidean distance to similarity
-                distance = euclidean(embedding1, embedding2)
-                # Normalize to 0-1 range (assuming max distance is 4.0 for 512-D embeddings)
-                similarity = max(0, 1 - (distance / 4.0))
-            else:
-                # Default to cosine
-                distance = cosine(embedding1, embedding2)
-                similarity = 1 - distance
-            
-            return float(similarity)
+            return float(self.similarity_matrix(embedding1, self._as_matrix(embedding2))[0])
             
         except Exception as e:
-            print(f"Error calculating similarity: {str(e)}")
+            logger.error(f"Error calculating similarity: {str(e)}")
             return 0.0
     
     def is_match(self, embedding1, embedding2, threshold=None):
@@ -83,15 +296,16 @@ class FaceMatcher:
         Returns:
             tuple: (best_match_index, similarity_score)
         """
-        best_index = -1
-        best_similarity = 0.0
+        if len(candidate_embeddings) == 0:
+            return -1, 0.0
         
-        for i, candidate in enumerate(candidate_embeddings):
-            similarity = self.calculate_similarity(query_embedding, candidate)
-            
-            if similarity > best_similarity:
-                best_similarity = similarity
-                best_index = i
+        similarities = self.similarity_matrix(query_embedding, candidate_embeddings)
+        best_index = int(np.argmax(similarities))
+        best_similarity = float(similarities[best_index])
+        
+        # Only positive similarities count as a match candidate
+        if best_similarity <= 0.0:
+            return -1, 0.0
         
         return best_index, best_similarity
     
@@ -110,18 +324,16 @@ class FaceMatcher:
         if threshold is None:
             threshold = self.threshold
         
-        matches = []
+        if len(candidate_embeddings) == 0:
+            return []
         
-        for i, candidate in enumerate(candidate_embeddings):
-            similarity = self.calculate_similarity(query_embedding, candidate)
-            
-            if similarity >= threshold:
-                matches.append((i, similarity))
+        similarities = self.similarity_matrix(query_embedding, candidate_embeddings)
+        indices = np.nonzero(similarities >= threshold)[0]
         
         # Sort by similarity (descending)
-        matches.sort(key=lambda x: x[1], reverse=True)
+        order = indices[np.argsort(-similarities[indices], kind='stable')]
         
-        return matches
+        return [(int(i), float(similarities[i])) for i in order]
     
     def calculate_distance_matrix(self, embeddings):
         """
@@ -133,15 +345,12 @@ class FaceMatcher:
         Returns:
             numpy array: distance matrix
         """
-        n = len(embeddings)
-        distance_matrix = np.zeros((n, n))
+        if len(embeddings) == 0:
+            return np.zeros((0, 0))
         
-        for i in range(n):
-            for j in range(i + 1, n):
-                similarity = self.calculate_similarity(embeddings[i], embeddings[j])
-                distance = 1 - similarity
-                distance_matrix[i, j] = distance
-                distance_matrix[j, i] = distance
+        matrix = self._as_matrix(embeddings)
+        distance_matrix = 1.0 - self.similarity_matrix(matrix, matrix).astype(np.float64)
+        np.fill_diagonal(distance_matrix, 0.0)
         
         return distance_matrix
     
@@ -0,0 +1,155 @@
+import logging
+import os
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+
+class FaceTracker:
+    """
+    Detection-skipping face tracker for consecutive frames of one person
+    - Runs the full detector on the first frame and then every
+      TRACKER_DETECT_INTERVAL frames
+    - In between, the last box is propagated by template matching: the face
+      captured at the last detection (grayscale, downscaled to
+      TRACKER_TEMPLATE_SIZE px wide) is located by normalized cross-correlation
+      in a window around the previous box
+    - A match score below TRACKER_MIN_CONFIDENCE, a frame of a different size
+      or reset() forces a detection on the current frame
+    - One instance per session; frames must be fed in order from one thread
+    """
+
+    def __init__(self, detector, detect_interval=None, min_confidence=None, template_size=None, search_margin=None):
+        """
+        Args:
+            detector: callable(image) -> (box, probability), e.g. FaceEncoder.detect
+            detect_interval: int, frames per full detection (1 disables tracking)
+            min_confidence: float, lowest template match score accepted as tracked
+            template_size: int, template width in pixels
+            search_margin: float, search window margin on each side, as a fraction of the face size
+        """
+        self.detector = detector
+        self.detect_interval = detect_interval if detect_interval is not None else int(os.getenv('TRACKER_DETECT_INTERVAL', 5))
+        self.min_confidence = min_confidence if min_confidence is not None else float(os.getenv('TRACKER_MIN_CONFIDENCE', 0.7))
+        self.template_size = template_size if template_size is not None else int(os.getenv('TRACKER_TEMPLATE_SIZE', 48))
+        self.search_margin = search_margin if search_margin is not None else float(os.getenv('TRACKER_SEARCH_MARGIN', 0.5))
+
+        self._box = None
+        self._probability = None
+        self._template = None
+        self._scale = 1.0
+        self._frame_shape = None
+        self._since_detection = 0
+        self.last_confidence = None
+
+        # Metrics
+        self._frames = 0
+        self._detections = 0
+        self._tracked = 0
+        self._lost = 0
+
+    def reset(self):
+        """Forget the tracked face so the next frame runs full detection"""
+        self._box = None
+        self._template = None
+        self._frame_shape = None
+        self.last_confidence = None
+
+    def detect(self, image):
+        """
+        Face box for the next frame, tracked when possible and detected otherwise
+
+        Args:
+            image: numpy array (BGR format)
+
+        Returns:
+            tuple: ((x1, y1, x2, y2), probability, tracked) or (None, None, False);
+                   tracked boxes carry the probability of the last detection
+                   (None when the detector reports none, e.g. Haar)
+        """
+        self._frames += 1
+
+        if self._box is not None and image.shape == self._frame_shape and self._since_detection + 1 < self.detect_interval:
+            box, confidence = self._track(image)
+            self.last_confidence = confidence
+
+            if box is not None and confidence >= self.min_confidence:
+                self._box = box
+                self._since_detection += 1
+                self._tracked += 1
+                return box, self._probability, True
+
+            self._lost += 1
+            logger.debug("Face track lost (confidence %.3f), running detection", confidence)
+
+        return self._detect(image)
+
+    def _detect(self, image):
+        """Run the full detector and capture the template for the following frames"""
+        self._detections += 1
+        box, probability = self.detector(image)
+
+        if box is None:
+            self.reset()
+            return None, None, False
+
+        x1, y1, x2, y2 = box
+        self._scale = self.template_size / float(max(1, x2 - x1))
+        self._template = self._gray_patch(image, box)
+        self._box = box
+        self._probability = probability
+        self._frame_shape = image.shape
+        self._since_detection = 0
+        self.last_confidence = 1.0
+
+        return box, probability, False
+
+    def _gray_patch(self, image, region):
+        """Crop a region, downscale it by the template scale and convert it to grayscale"""
+        x1, y1, x2, y2 = region
+        width = max(1, int(round((x2 - x1) * self._scale)))
+        height = max(1, int(round((y2 - y1) * self._scale)))
+        small = cv2.resize(image[y1:y2, x1:x2], (width, height), interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def _track(self, image):
+        """
+        Locate the template in a window around the previous box
+
+        Returns:
+            tuple: (box with the previous size at the new position, match score)
+        """
+        x1, y1, x2, y2 = self._box
+        height, width = image.shape[:2]
+        margin_x = int((x2 - x1) * self.search_margin)
+        margin_y = int((y2 - y1) * self.search_margin)
+        window = (max(0, x1 - margin_x), max(0, y1 - margin_y), min(width, x2 + margin_x), min(height, y2 + margin_y))
+
+        search = self._gray_patch(image, window)
+        if search.shape[0] < self._template.shape[0] or search.shape[1] < self._template.shape[1]:
+            return None, 0.0
+
+        scores = cv2.matchTemplate(search, self._template, cv2.TM_CCOEFF_NORMED)
+        _, confidence, _, (dx, dy) = cv2.minMaxLoc(scores)
+
+        new_x1 = min(max(0, window[0] + int(round(dx / self._scale))), width - 1)
+        new_y1 = min(max(0, window[1] + int(round(dy / self._scale))), height - 1)
+        box = (new_x1, new_y1, min(width, new_x1 + (x2 - x1)), min(height, new_y1 + (y2 - y1)))
+
+        return box, float(confidence)
+
+    def get_stats(self):
+        """
+        Get tracker statistics
+
+        Returns:
+            dict: frames, full detections, tracked frames, lost tracks and the share of detections saved
+        """
+        return {
+            'frames': self._frames,
+            'detections': self._detections,
+            'tracked': self._tracked,
+            'lost': self._lost,
+            'detections_saved': round(self._tracked / self._frames, 4) if self._frames else 0.0
+        }
@@ -0,0 +1,253 @@
+import hashlib
+import inspect
+import logging
+import os
+import tempfile
+
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+
+def write_atomic(path, write):
+    """
+    Write a cache file through a unique temp file in its directory, then rename it into place
+
+    Pre-fork workers export the same artefact at the same time; each writes its
+    own temp file and the last rename wins, so no reader sees a partial file.
+
+    Args:
+        path: str, destination file
+        write: callable(tmp_path) writing the complete file
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix=f"{os.path.basename(path)}.", suffix='.tmp')
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class TorchBackend:
+    """
+    Eager PyTorch execution of the FaceNet model (or a quantized copy of it)
+    """
+
+    def __init__(self, model, device, name='torch'):
+        self.model = model
+        self.device = device
+        self.name = name
+
+    def __call__(self, batch):
+        """
+        Run one forward pass
+
+        Args:
+            batch: torch.Tensor (N, 3, 160, 160)
+
+        Returns:
+            numpy array: (N, 512) embeddings
+        """
+        with torch.no_grad():
+            return self.model(batch.to(self.device)).cpu().numpy()
+
+
+class TorchScriptBackend:
+    """
+    Traced and frozen TorchScript module
+    - Removes Python overhead from the forward pass and folds constants/batch norm
+    - The frozen module is cached on disk and reloaded on the next start
+      (an unreadable cache file is exported again)
+    """
+
+    name = 'torchscript'
+
+    def __init__(self, model, device, cache_path):
+        self.device = device
+        self.cache_path = cache_path
+
+        self.module = None
+        if os.path.exists(cache_path):
+            try:
+                self.module = torch.jit.load(cache_path, map_location=device)
+                logger.info(f"Loaded TorchScript FaceNet from cache: {cache_path}")
+            except Exception as e:
+                logger.warning(f"Unreadable TorchScript cache {cache_path} ({str(e)}), exporting again")
+
+        if self.module is None:
+            example = torch.zeros(1, 3, 160, 160, device=device)
+            with torch.no_grad():
+                traced = torch.jit.trace(model, example)
+            self.module = torch.jit.freeze(traced.eval())
+            # Another worker may finish the same export first; its file is simply replaced
+            write_atomic(cache_path, lambda tmp_path: torch.jit.save(self.module, tmp_path))
+            logger.info(f"Exported TorchScript FaceNet to cache: {cache_path}")
+
+        self.module = torch.jit.optimize_for_inference(self.module)
+
+    def __call__(self, batch):
+        with torch.no_grad():
+            return self.module(batch.to(self.device)).cpu().numpy()
+
+
+class OnnxBackend:
+    """
+    ONNX Runtime execution with full graph optimizations
+    - The model is exported once to ONNX (dynamic batch axis) and cached on disk
+    - Graph optimizations are applied when the session is created, since the
+      optimized graph is specific to the CPU it was built on
+    - An unreadable cache file is exported again
+    """
+
+    name = 'onnx'
+
+    def __init__(self, model, device, cache_path, num_threads=None):
+        self.session = None
+        if os.path.exists(cache_path):
+            try:
+                self.session = self._session(device, cache_path, num_threads)
+            except Exception as e:
+                logger.warning(f"Unreadable ONNX cache {cache_path} ({str(e)}), exporting again")
+
+        if self.session is None:
+            self._export(model, device, cache_path)
+            logger.info(f"Exported ONNX FaceNet to cache: {cache_path}")
+            self.session = self._session(device, cache_path, num_threads)
+
+        self.input_name = self.session.get_inputs()[0].name
+
+    @staticmethod
+    def _session(device, cache_path, num_threads):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+
+        providers = ['CPUExecutionProvider']
+        if device == 'cuda' and 'CUDAExecutionProvider' in ort.get_available_providers():
+            providers.insert(0, 'CUDAExecutionProvider')
+
+        return ort.InferenceSession(cache_path, sess_options=options, providers=providers)
+
+    @staticmethod
+    def _export(model, device, cache_path):
+        example = torch.zeros(1, 3, 160, 160, device=device)
+        kwargs = {}
+        # Newer torch defaults to the dynamo exporter; keep the TorchScript-based one
+        if 'dynamo' in inspect.signature(torch.onnx.export).parameters:
+            kwargs['dynamo'] = False
+
+        def write(tmp_path):
+            with torch.no_grad():
+                torch.onnx.export(
+                    model,
+                    example,
+                    tmp_path,
+                    input_names=['faces'],
+                    output_names=['embeddings'],
+                    dynamic_axes={'faces': {0: 'batch'}, 'embeddings': {0: 'batch'}},
+                    opset_version=17,
+                    **kwargs
+                )
+
+        write_atomic(cache_path, write)
+
+    def __call__(self, batch):
+        faces = np.ascontiguousarray(batch.cpu().numpy(), dtype=np.float32)
+        return self.session.run(None, {self.input_name: faces})[0]
+
+
+BACKENDS = ('torch', 'torchscript', 'onnx')
+
+
+def verify_backend(backend, reference, batch_size=4, tolerance=1e-3, seed=0):
+    """
+    Check that a backend reproduces the eager model's embeddings
+
+    Args:
+        backend: backend under test
+        reference: TorchBackend wrapping the eager model
+        batch_size: int, random faces to compare
+        tolerance: float, maximum allowed absolute difference
+        seed: int, random seed
+
+    Returns:
+        tuple: (ok, max_abs_diff, min_cosine_similarity)
+    """
+    generator = torch.Generator().manual_seed(seed)
+    batch = torch.rand(batch_size, 3, 160, 160, generator=generator) * 2 - 1
+
+    expected = reference(batch)
+    actual = backend(batch)
+
+    max_abs_diff = float(np.max(np.abs(expected - actual)))
+    cosine = np.sum(expected * actual, axis=1) / (
+        np.linalg.norm(expected, axis=1) * np.linalg.norm(actual, axis=1) + 1e-12
+    )
+    min_cosine = float(np.min(cosine))
+
+    return max_abs_diff <= tolerance, max_abs_diff, min_cosine
+
+
+def weights_fingerprint(model):
+    """Short hash of the model parameters, so cached exports never outlive their weights"""
+    digest = hashlib.sha1()
+    for name, tensor in model.state_dict().items():
+        digest.update(name.encode())
+        digest.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+    return digest.hexdigest()[:12]
+
+
+def create_backend(name, model, device, cache_dir, cache_tag='facenet_vggface2'):
+    """
+    Build the requested inference backend, falling back to eager torch
+
+    Args:
+        name: str, one of BACKENDS
+        model: eager InceptionResnetV1 in eval mode
+        device: str, 'cpu' or 'cuda'
+        cache_dir: str, directory for exported artefacts
+        cache_tag: str, prefix identifying the weights in cache file names
+
+    Returns:
+        backend: callable mapping a (N, 3, 160, 160) tensor to (N, 512) embeddings
+    """
+    reference = TorchBackend(model, device)
+    name = (name or 'torch').lower()
+
+    if name == 'torch':
+        return reference
+
+    if name not in BACKENDS:
+        logger.warning(f"Unknown inference backend '{name}', using eager torch")
+        return reference
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        version_tag = f"{weights_fingerprint(model)}_torch{torch.__version__.split('+')[0]}_{device}"
+
+        if name == 'torchscript':
+            backend = TorchScriptBackend(model, device, os.path.join(cache_dir, f"{cache_tag}_{version_tag}.ts.pt"))
+        else:
+            backend = OnnxBackend(model, device, os.path.join(cache_dir, f"{cache_tag}_{version_tag}.onnx"),
+                                  num_threads=torch.get_num_threads())
+
+        ok, max_abs_diff, min_cosine = verify_backend(backend, reference)
+        if not ok:
+            logger.warning(f"{name} backend disagrees with eager torch (max diff {max_abs_diff:.2e}, min cosine {min_cosine:.6f}), using eager torch")
+            return reference
+
+        logger.info(f"Inference backend: {name} (max diff vs eager {max_abs_diff:.2e}, min cosine {min_cosine:.6f})")
+        return backend
+
+    except Exception as e:
+        logger.warning(f"Could not initialise {name} backend ({str(e)}), using eager torch")
+        return reference
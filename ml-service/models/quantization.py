@@ -0,0 +1,116 @@
+import copy
+import os
+
+import torch
+
+from models.inference_backend import weights_fingerprint, write_atomic
+
+QUANTIZATION_MODES = ('none', 'dynamic', 'static')
+
+
+def _select_engine():
+    """Use the x86 quantized engine when available (fbgemm otherwise)"""
+    engines = torch.backends.quantized.supported_engines
+    for engine in ('x86', 'fbgemm', 'qnnpack'):
+        if engine in engines:
+            torch.backends.quantized.engine = engine
+            return engine
+    raise RuntimeError("No quantized engine available in this torch build")
+
+
+def static_model_path(cache_dir, model, cache_tag='facenet_vggface2'):
+    """Location of the calibrated static INT8 TorchScript module for these weights"""
+    return os.path.join(cache_dir, f"{cache_tag}_{weights_fingerprint(model)}_int8_static.ts.pt")
+
+
+def quantize_dynamic(model):
+    """
+    Post-training dynamic INT8 quantization
+    - Quantizes Linear weights ahead of time and activations on the fly
+    - Needs no calibration data, but leaves the convolutions in FP32
+
+    Args:
+        model: eager InceptionResnetV1 in eval mode (CPU)
+
+    Returns:
+        torch.nn.Module: quantized copy of the model
+    """
+    _select_engine()
+    return torch.ao.quantization.quantize_dynamic(copy.deepcopy(model), {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def quantize_static(model, calibration_batches):
+    """
+    Post-training static INT8 quantization (FX graph mode)
+    - Conv/BN/ReLU are fused and every layer runs in INT8
+    - Activation ranges come from observing the calibration batches
+
+    Args:
+        model: eager InceptionResnetV1 in eval mode (CPU)
+        calibration_batches: iterable of (N, 3, 160, 160) normalized face tensors
+
+    Returns:
+        torch.jit.ScriptModule: frozen INT8 module
+    """
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    engine = _select_engine()
+    example = torch.zeros(1, 3, 160, 160)
+
+    prepared = prepare_fx(copy.deepcopy(model).eval(), get_default_qconfig_mapping(engine), (example,))
+
+    batches = 0
+    with torch.no_grad():
+        for batch in calibration_batches:
+            prepared(batch)
+            batches += 1
+
+    if batches == 0:
+        raise ValueError("Static quantization needs at least one calibration batch")
+
+    quantized = convert_fx(prepared)
+
+    with torch.no_grad():
+        traced = torch.jit.trace(quantized, example)
+    return torch.jit.freeze(traced.eval())
+
+
+def save_static_model(module, path):
+    """Persist a calibrated static INT8 module"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    write_atomic(path, lambda tmp_path: torch.jit.save(module, tmp_path))
+
+
+def load_quantized_model(mode, model, cache_dir):
+    """
+    Build the quantized model for FACE_QUANTIZATION
+
+    Args:
+        mode: str, one of QUANTIZATION_MODES
+        model: eager InceptionResnetV1 in eval mode (CPU)
+        cache_dir: str, directory holding the calibrated static model
+
+    Returns:
+        torch.nn.Module: quantized model, or None for mode 'none'
+    """
+    mode = (mode or 'none').lower()
+
+    if mode == 'none':
+        return None
+
+    if mode == 'dynamic':
+        return quantize_dynamic(model)
+
+    if mode == 'static':
+        path = static_model_path(cache_dir, model)
+        if not os.path.exists(path):
+            raise FileNotFoundError(
+                f"No calibrated INT8 model at {path}. Run scripts/calibrate_quantization.py first."
+            )
+        _select_engine()
+        return torch.jit.load(path, map_location='cpu')
+
+    raise ValueError(f"Unknown quantization mode '{mode}', expected one of {', '.join(QUANTIZATION_MODES)}")
@@ -0,0 +1,105 @@
+import hashlib
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache')
+
+FACENET_EMBEDDING_SIZE = 512
+
+# Released facenet-pytorch checkpoints (the classifier head is dropped on load)
+FACENET_CHECKPOINTS = {
+    'vggface2': 'https://github.com/timesler/facenet-pytorch/releases/download/v2.2.9/20180402-114759-vggface2.pt',
+    'casia-webface': 'https://github.com/timesler/facenet-pytorch/releases/download/v2.2.9/20180408-102900-casia-webface.pt'
+}
+
+
+def weights_path(pretrained, cache_dir):
+    """
+    Local path of a FaceNet checkpoint
+
+    FACENET_WEIGHTS_PATH pins an explicit file; otherwise the checkpoint lives
+    in the model cache directory under its release file name.
+    """
+    if pretrained not in FACENET_CHECKPOINTS:
+        raise ValueError(f"Unknown FaceNet weights '{pretrained}', expected one of {', '.join(FACENET_CHECKPOINTS)}")
+    return os.getenv('FACENET_WEIGHTS_PATH') or os.path.join(cache_dir, os.path.basename(FACENET_CHECKPOINTS[pretrained]))
+
+
+def file_sha256(path):
+    """SHA-256 hex digest of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def fetch_weights(pretrained, cache_dir):
+    """
+    Make sure the checkpoint is in the local cache, downloading it once if needed
+
+    - FACENET_OFFLINE=true never downloads (a missing file is an error)
+    - FACENET_WEIGHTS_SHA256 pins the expected checksum of the file
+
+    Args:
+        pretrained: str, 'vggface2' or 'casia-webface'
+        cache_dir: str, model cache directory
+
+    Returns:
+        str: path of the verified local checkpoint
+    """
+    path = weights_path(pretrained, cache_dir)
+
+    if not os.path.exists(path):
+        if os.getenv('FACENET_OFFLINE', 'false').lower() == 'true':
+            raise FileNotFoundError(f"FaceNet weights not found at {path} (FACENET_OFFLINE=true)")
+
+        from torch.hub import download_url_to_file
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        logger.info(f"Downloading {pretrained} FaceNet weights to {path}")
+        # Download next to the target and rename, so a partial file is never used
+        partial = f"{path}.partial"
+        download_url_to_file(FACENET_CHECKPOINTS[pretrained], partial, progress=False)
+        os.replace(partial, path)
+
+    expected = os.getenv('FACENET_WEIGHTS_SHA256')
+    if expected:
+        actual = file_sha256(path)
+        if actual != expected.lower():
+            raise ValueError(f"FaceNet weights checksum mismatch for {path}: expected {expected}, got {actual}")
+
+    return path
+
+
+def load_facenet(pretrained, cache_dir, device):
+    """
+    Build InceptionResnetV1 from the local weights cache
+
+    Args:
+        pretrained: str, 'vggface2', 'casia-webface' or 'none' (seeded random weights)
+        cache_dir: str, model cache directory
+        device: str, torch device
+
+    Returns:
+        torch.nn.Module: FaceNet in eval mode on the device
+    """
+    import torch
+    from facenet_pytorch import InceptionResnetV1
+
+    if pretrained.lower() == 'none':
+        # Fixed seed keeps embeddings (and cached exports) identical across runs
+        torch.manual_seed(0)
+        model = InceptionResnetV1(pretrained=None, classify=False)
+        logger.warning("FaceNet loaded with random weights (FACENET_PRETRAINED=none), embeddings are not meaningful")
+        return model.eval().to(device)
+
+    path = fetch_weights(pretrained, cache_dir)
+    state_dict = torch.load(path, map_location='cpu', weights_only=True)
+    state_dict = {name: tensor for name, tensor in state_dict.items() if not name.startswith('logits.')}
+
+    model = InceptionResnetV1(pretrained=None, classify=False)
+    model.load_state_dict(state_dict)
+    return model.eval().to(device)
@@ -0,0 +1,210 @@
+"""
+Calibrate the static INT8 FaceNet model and report its drift against FP32
+
+Reads locally stored face crops (optionally grouped as <faces>/<person>/*.jpg),
+calibrates FX static quantization on part of them, and compares FP32,
+dynamic INT8 and static INT8 embeddings on the rest:
+  - cosine similarity between FP32 and INT8 embeddings of the same face
+  - drift of pairwise similarities and decision flips at FACE_SIMILARITY_THRESHOLD
+  - genuine/impostor accuracy at the threshold when identities are known
+  - batch latency and serialized model size
+
+The calibrated model is saved to MODEL_CACHE_DIR, where FaceEncoder picks it
+up with FACE_QUANTIZATION=static.
+
+Usage (from ml-service/):
+    python scripts/calibrate_quantization.py --faces ./faces --output int8_report.json
+"""
+import argparse
+import io
+import os
+import random
+import sys
+
+SERVICE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVICE_ROOT not in sys.path:
+    sys.path.insert(0, SERVICE_ROOT)
+
+# The reference model must be the plain FP32 one
+os.environ['FACE_QUANTIZATION'] = 'none'
+os.environ['FACE_INFERENCE_BACKEND'] = 'torch'
+
+import cv2
+import numpy as np
+import torch
+
+from benchmarks.common import peak_rss_mb, summarize, time_calls, write_report
+from models.face_encoder import FaceEncoder
+from models.quantization import quantize_dynamic, quantize_static, save_static_model, static_model_path
+
+
+def find_faces(directory):
+    """List (path, identity) pairs; identity is the sub-directory name or None"""
+    faces = []
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            if name.lower().endswith(('.jpg', '.jpeg', '.png')):
+                identity = os.path.relpath(root, directory)
+                faces.append((os.path.join(root, name), None if identity == '.' else identity))
+    return faces
+
+
+def load_face_tensors(encoder, faces, detect):
+    """Turn face images into normalized FaceNet input tensors"""
+    tensors = []
+    identities = []
+    for path, identity in faces:
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        if image is None:
+            continue
+
+        if detect:
+            result = encoder.detect_and_align(image)
+            if result is None:
+                continue
+            face = result['face']
+        else:
+            face = cv2.cvtColor(cv2.resize(image, (160, 160), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2RGB)
+
+        tensors.append(encoder.preprocess_face(face))
+        identities.append(identity)
+    return tensors, identities
+
+
+def embed(model, tensors, batch_size):
+    """Embed all tensors with a model, returning L2-normalized (N, 512) embeddings"""
+    outputs = []
+    with torch.no_grad():
+        for start in range(0, len(tensors), batch_size):
+            outputs.append(model(torch.stack(tensors[start:start + batch_size])).numpy())
+    embeddings = np.concatenate(outputs)
+    return embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+
+
+def serialized_size_mb(model):
+    """Size of the model weights when saved"""
+    buffer = io.BytesIO()
+    if isinstance(model, torch.jit.ScriptModule):
+        torch.jit.save(model, buffer)
+    else:
+        torch.save(model.state_dict(), buffer)
+    return round(buffer.tell() / (1024 * 1024), 2)
+
+
+def compare(reference, candidate, threshold):
+    """Drift of a quantized model's embeddings and decisions against FP32"""
+    same_face = np.sum(reference * candidate, axis=1)
+
+    upper = np.triu_indices(len(reference), k=1)
+    reference_pairs = (reference @ reference.T)[upper]
+    candidate_pairs = (candidate @ candidate.T)[upper]
+    drift = np.abs(candidate_pairs - reference_pairs)
+    flips = int(np.sum((reference_pairs >= threshold) != (candidate_pairs >= threshold)))
+
+    report = {
+        'embedding_cosine_vs_fp32': {
+            'mean': round(float(same_face.mean()), 6),
+            'min': round(float(same_face.min()), 6),
+            'p5': round(float(np.percentile(same_face, 5)), 6)
+        },
+        'pair_similarity_drift': {
+            'mean_abs': round(float(drift.mean()), 6) if drift.size else None,
+            'p99_abs': round(float(np.percentile(drift, 99)), 6) if drift.size else None,
+            'max_abs': round(float(drift.max()), 6) if drift.size else None
+        },
+        'decision_flips_at_threshold': flips,
+        'decision_flip_rate': round(flips / drift.size, 6) if drift.size else None
+    }
+    return report
+
+
+def accuracy(embeddings, identities, threshold):
+    """Genuine accept / impostor reject rates at the threshold"""
+    if any(identity is None for identity in identities):
+        return None
+
+    upper = np.triu_indices(len(embeddings), k=1)
+    similarities = (embeddings @ embeddings.T)[upper]
+    labels = np.array(identities)
+    genuine = (labels[:, None] == labels[None, :])[upper]
+
+    return {
+        'genuine_pairs': int(genuine.sum()),
+        'impostor_pairs': int((~genuine).sum()),
+        'genuine_accept_rate': round(float(np.mean(similarities[genuine] >= threshold)), 4) if genuine.any() else None,
+        'impostor_reject_rate': round(float(np.mean(similarities[~genuine] < threshold)), 4) if (~genuine).any() else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--faces', required=True, help='directory of face crops (or frames with --detect)')
+    parser.add_argument('--detect', action='store_true', help='run MTCNN on full frames instead of using crops as-is')
+    parser.add_argument('--calibration-fraction', type=float, default=0.5)
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--threshold', type=float, default=float(os.getenv('FACE_SIMILARITY_THRESHOLD', '0.70')))
+    parser.add_argument('--no-save', action='store_true', help='do not write the calibrated model to the cache')
+    parser.add_argument('--output', help='write the JSON report here')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    encoder = FaceEncoder()
+    if encoder.model is None or encoder.device != 'cpu':
+        raise SystemExit("INT8 calibration needs the FaceNet model loaded on CPU")
+    model = encoder.model
+
+    faces = find_faces(args.faces)
+    random.Random(args.seed).shuffle(faces)
+    tensors, identities = load_face_tensors(encoder, faces, args.detect)
+    if len(tensors) < 4:
+        raise SystemExit(f"Need at least 4 usable faces, found {len(tensors)}")
+
+    split = max(1, min(len(tensors) - 2, int(len(tensors) * args.calibration_fraction)))
+    calibration, evaluation = tensors[:split], tensors[split:]
+    evaluation_identities = identities[split:]
+
+    calibration_batches = [torch.stack(calibration[i:i + args.batch_size]) for i in range(0, len(calibration), args.batch_size)]
+    models = {
+        'fp32': model,
+        'int8_dynamic': quantize_dynamic(model),
+        'int8_static': quantize_static(model, calibration_batches)
+    }
+
+    benchmark_batch = torch.stack((evaluation * args.batch_size)[:args.batch_size])
+    reference = embed(model, evaluation, args.batch_size)
+
+    results = {}
+    for name, candidate in models.items():
+        embeddings = reference if name == 'fp32' else embed(candidate, evaluation, args.batch_size)
+
+        with torch.no_grad():
+            latency = summarize(time_calls(candidate, [benchmark_batch], repeat=5), items_per_call=args.batch_size)
+
+        entry = {
+            'batch_latency': latency,
+            'model_size_mb': serialized_size_mb(candidate),
+            'accuracy_at_threshold': accuracy(embeddings, evaluation_identities, args.threshold)
+        }
+        if name != 'fp32':
+            entry.update(compare(reference, embeddings, args.threshold))
+        results[name] = entry
+
+    saved_path = None
+    if not args.no_save:
+        saved_path = static_model_path(encoder.model_cache_dir, model)
+        save_static_model(models['int8_static'], saved_path)
+
+    write_report({
+        'threshold': args.threshold,
+        'faces': len(tensors),
+        'calibration_faces': len(calibration),
+        'evaluation_faces': len(evaluation),
+        'torch_threads': torch.get_num_threads(),
+        'models': results,
+        'saved_static_model': saved_path,
+        'peak_rss_mb': peak_rss_mb()
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""
+Download the FaceNet weights into the local model cache
+
+Run at image build time so containers start from the pinned local copy
+instead of downloading the checkpoint on every cold start. Prints the path
+and SHA-256 of each checkpoint; set FACENET_WEIGHTS_SHA256 to that value to
+pin it (startup then refuses any other file).
+
+Usage (from ml-service/):
+    python scripts/fetch_model_weights.py
+    python scripts/fetch_model_weights.py --weights vggface2 --cache-dir /app/models/cache
+"""
+import argparse
+import os
+import sys
+
+SERVICE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVICE_ROOT not in sys.path:
+    sys.path.insert(0, SERVICE_ROOT)
+
+from models.weights import DEFAULT_MODEL_CACHE_DIR, FACENET_CHECKPOINTS, fetch_weights, file_sha256
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--weights', default=os.getenv('FACENET_PRETRAINED', 'vggface2'), choices=sorted(FACENET_CHECKPOINTS))
+    parser.add_argument('--cache-dir', default=os.getenv('MODEL_CACHE_DIR', DEFAULT_MODEL_CACHE_DIR))
+    args = parser.parse_args()
+
+    path = fetch_weights(args.weights, args.cache_dir)
+    print(f"{args.weights}: {path}")
+    print(f"sha256: {file_sha256(path)}")
+
+
+if __name__ == '__main__':
+    main()
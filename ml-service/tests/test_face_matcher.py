@@ -0,0 +1,75 @@
+import numpy as np
+
+from models.face_matcher import FaceMatcher
+from utils.gallery_cache import UserGallery
+
+
+def unit(vector):
+    return (vector / np.linalg.norm(vector)).astype(np.float32)
+
+
+def make_gallery(centers, noise, seed=0):
+    rng = np.random.default_rng(seed)
+    patterns = [unit(center + noise * rng.standard_normal(center.size)) for center in centers]
+    return UserGallery('user', [f"e{index}" for index in range(len(patterns))], np.stack(patterns), [0.9] * len(patterns))
+
+
+def two_cluster_gallery(dim=512, seed=0):
+    """Gallery of one user enrolled once under different conditions (e.g. with glasses) and three times without"""
+    rng = np.random.default_rng(seed)
+    first, second = unit(rng.standard_normal(dim)), unit(rng.standard_normal(dim))
+    return make_gallery([first, second, second, second], 0.01, seed), first, second
+
+
+def test_best_template_match_is_not_rejected_by_the_centroid():
+    gallery, first, _ = two_cluster_gallery()
+    matcher = FaceMatcher(threshold=0.7)
+    query = unit(first + 0.01 * np.random.default_rng(1).standard_normal(first.size))
+
+    verdict = matcher.match_template(query, gallery)
+    best = float((gallery.normalized @ query).max())
+
+    # Far enough below the threshold that a centroid-only decision rejected it
+    assert verdict['centroid_similarity'] < 0.7 - matcher.ambiguous_margin
+    assert best >= 0.7
+    assert verdict['match']
+    assert verdict['stage'] == 'patterns'
+    assert verdict['similarity'] == best
+    assert gallery.embedding_ids[verdict['best_index']] == 'e0'
+
+
+def test_match_reports_best_template_similarity():
+    gallery, first, second = two_cluster_gallery()
+    matcher = FaceMatcher(threshold=0.5)
+    query = unit(first + second)
+
+    verdict = matcher.match_template(query, gallery)
+
+    assert verdict['match']
+    assert verdict['similarity'] == float((gallery.normalized @ query).max())
+    assert verdict['similarity'] != verdict['centroid_similarity']
+
+
+def test_stranger_is_rejected_on_the_centroid():
+    rng = np.random.default_rng(2)
+    center = unit(rng.standard_normal(512))
+    gallery = make_gallery([center] * 5, 0.02)
+    matcher = FaceMatcher(threshold=0.7)
+    stranger = unit(rng.standard_normal(512))
+
+    verdict = matcher.match_template(stranger, gallery)
+
+    assert not verdict['match']
+    assert verdict['stage'] == 'centroid'
+    # Reported score bounds every pattern's
+    assert verdict['similarity'] >= float((gallery.normalized @ stranger).max())
+    assert verdict['similarity'] < 0.7
+
+
+def test_spread_gallery_is_never_rejected_on_the_centroid():
+    gallery, first, second = two_cluster_gallery()
+    matcher = FaceMatcher(threshold=0.7)
+
+    # Anything close to one cluster could match it, so the centroid alone cannot decide
+    for query in (first, second, unit(first - second)):
+        assert matcher.match_template(query, gallery)['stage'] == 'patterns'
@@ -0,0 +1,55 @@
+import numpy as np
+from bson import Binary
+
+from utils.embedding_storage import encode_embedding
+from utils.gallery_cache import UserGallery
+
+
+def document(index, embedding, mode='float32'):
+    stored, version = encode_embedding(np.asarray(embedding, dtype=np.float32), mode)
+    return {'_id': f"e{index}", 'embedding': stored, 'embedding_version': version, 'quality_score': 0.9}
+
+
+def test_corrupt_document_is_skipped():
+    rng = np.random.default_rng(0)
+    documents = [document(0, rng.standard_normal(512)), document(1, rng.standard_normal(512))]
+    documents.insert(1, {'_id': 'bad', 'embedding': Binary(b'\x00' * 7)})
+
+    gallery = UserGallery.from_documents('user', documents)
+
+    assert gallery.embedding_ids == ['e0', 'e1']
+    assert gallery.matrix.shape == (2, 512)
+
+
+def test_legacy_dimension_is_skipped():
+    rng = np.random.default_rng(1)
+    documents = [document(0, rng.standard_normal(128), 'array'), document(1, rng.standard_normal(512))]
+
+    gallery = UserGallery.from_documents('user', documents, dim=512)
+
+    assert gallery.embedding_ids == ['e1']
+
+
+def test_most_common_dimension_is_kept_without_expected_dim():
+    rng = np.random.default_rng(2)
+    documents = [document(index, rng.standard_normal(512)) for index in range(2)]
+    documents.append(document(2, rng.standard_normal(128)))
+
+    gallery = UserGallery.from_documents('user', documents)
+
+    assert gallery.embedding_ids == ['e0', 'e1']
+
+
+def test_non_finite_embedding_is_skipped():
+    documents = [document(0, np.full(512, np.nan)), document(1, np.ones(512))]
+
+    gallery = UserGallery.from_documents('user', documents)
+
+    assert gallery.embedding_ids == ['e1']
+    assert np.isfinite(gallery.normalized).all()
+
+
+def test_no_usable_documents_gives_an_empty_gallery():
+    gallery = UserGallery.from_documents('user', [{'_id': 'bad', 'embedding': Binary(b'\x01')}])
+
+    assert len(gallery) == 0
@@ -0,0 +1,186 @@
+import asyncio
+import heapq
+import itertools
+import os
+import time
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed instead of queued"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def parse_priorities(value):
+    """Parse 'verify_face:10,extract_embedding:0' into {'verify_face': 10, 'extract_embedding': 0}"""
+    priorities = {}
+    for item in value.split(','):
+        if ':' in item:
+            endpoint, priority = item.split(':', 1)
+            priorities[endpoint.strip()] = int(priority)
+    return priorities
+
+
+class AdmissionController:
+    """
+    Concurrency limit with a bounded priority queue in front of the inference endpoints
+    - At most max_concurrent requests run the pipeline at once; up to max_queue
+      more wait, highest endpoint priority first (FIFO within a priority)
+    - A full queue rejects at once: a newcomer displaces the newest waiter of a
+      lower priority if there is one (so enrolment is shed before verification),
+      otherwise it is rejected itself
+    - Waiters give up after max_wait_ms rather than outlive the caller's timeout
+    - on_wait(endpoint, wait_ms) is called for every admitted request and
+      on_load(active, queued) whenever either count changes
+    - Runs on one event loop (one instance per worker process); max_concurrent=0 disables it
+    """
+
+    def __init__(self, max_concurrent=None, max_queue=None, max_wait_ms=None, retry_after=None, priorities=None, on_wait=None, on_load=None):
+        self.max_concurrent = max_concurrent if max_concurrent is not None else int(os.getenv('ADMISSION_MAX_CONCURRENT', 16))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv('ADMISSION_MAX_QUEUE', 64))
+        self.max_wait_ms = max_wait_ms if max_wait_ms is not None else float(os.getenv('ADMISSION_MAX_WAIT_MS', 5000))
+        self.retry_after = retry_after if retry_after is not None else int(os.getenv('ADMISSION_RETRY_AFTER_SECONDS', 2))
+        self.priorities = priorities if priorities is not None else parse_priorities(
+            os.getenv('ADMISSION_PRIORITIES', 'verify_face:10,verify_stream:10,identify_face:10,verify_batch:5,extract_embedding:0')
+        )
+        self.on_wait = on_wait
+        self.on_load = on_load
+
+        self._active = 0
+        self._queued = 0
+        self._heap = []
+        self._sequence = itertools.count()
+
+        # Metrics
+        self._admitted = 0
+        self._queued_total = 0
+        self._rejected = {}
+
+    @property
+    def enabled(self):
+        return self.max_concurrent > 0
+
+    def priority(self, endpoint):
+        return self.priorities.get(endpoint, 0)
+
+    def _reject(self, reason):
+        self._rejected[reason] = self._rejected.get(reason, 0) + 1
+        return AdmissionRejected(reason, self.retry_after)
+
+    def _shed_lower(self, priority):
+        """Reject the newest waiter below `priority` to make room; True if one was shed"""
+        victim = None
+        for entry in self._heap:
+            if entry[2].done() or -entry[0] >= priority:
+                continue
+            if victim is None or entry[:2] > victim[:2]:
+                victim = entry
+
+        if victim is None:
+            return False
+
+        self._queued -= 1
+        self._report_load()
+        victim[2].set_exception(self._reject('preempted'))
+        return True
+
+    async def acquire(self, endpoint):
+        """
+        Wait for a slot to run one request
+
+        Args:
+            endpoint: str, endpoint name (selects the priority and labels the wait)
+
+        Returns:
+            float: time spent queued in milliseconds
+
+        Raises:
+            AdmissionRejected: queue full, displaced by a higher priority request or waited too long
+        """
+        if not self.enabled:
+            return 0.0
+
+        if self._active < self.max_concurrent and self._queued == 0:
+            self._active += 1
+            self._report_load()
+            self._record_wait(endpoint, 0.0)
+            return 0.0
+
+        priority = self.priority(endpoint)
+        if self._queued >= self.max_queue and not self._shed_lower(priority):
+            raise self._reject('queue_full')
+
+        start = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (-priority, next(self._sequence), future))
+        self._queued += 1
+        self._queued_total += 1
+        self._report_load()
+
+        try:
+            await asyncio.wait_for(future, self.max_wait_ms / 1000.0 if self.max_wait_ms > 0 else None)
+        except asyncio.TimeoutError:
+            # wait_for cancelled the future, so release() will skip it
+            self._queued -= 1
+            self._report_load()
+            raise self._reject('queue_timeout')
+        except asyncio.CancelledError:
+            # Caller went away: give up the place in line, or the slot if it was just granted
+            if future.cancelled() or not future.done():
+                self._queued -= 1
+                self._report_load()
+            elif future.exception() is None:
+                self.release()
+            raise
+
+        wait_ms = (time.perf_counter() - start) * 1000.0
+        self._record_wait(endpoint, wait_ms)
+        return wait_ms
+
+    def release(self):
+        """Free a slot, handing it straight to the highest priority waiter"""
+        if not self.enabled:
+            return
+
+        while self._heap:
+            _, _, future = heapq.heappop(self._heap)
+            if not future.done():
+                self._queued -= 1
+                self._report_load()
+                future.set_result(None)
+                return
+
+        self._active -= 1
+        self._report_load()
+
+    def _report_load(self):
+        if self.on_load is not None:
+            self.on_load(self._active, self._queued)
+
+    def _record_wait(self, endpoint, wait_ms):
+        self._admitted += 1
+        if self.on_wait is not None:
+            self.on_wait(endpoint, wait_ms)
+
+    def get_stats(self):
+        """
+        Get admission statistics
+
+        Returns:
+            dict: limits, current load, admitted/queued totals and rejections by reason
+        """
+        return {
+            'enabled': self.enabled,
+            'max_concurrent': self.max_concurrent,
+            'max_queue': self.max_queue,
+            'max_wait_ms': self.max_wait_ms,
+            'priorities': dict(self.priorities),
+            'active': self._active,
+            'queued': self._queued,
+            'admitted': self._admitted,
+            'queued_total': self._queued_total,
+            'rejected': dict(self._rejected)
+        }
@@ -0,0 +1,406 @@
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+from utils.embedding_storage import decode_embedding
+
+
+class EmbeddingIndex:
+    """
+    In-process approximate nearest-neighbour index over face embeddings (IVF)
+    - Embeddings are L2-normalized and grouped into inverted lists around
+      k-means centroids; a query only scans the nprobe closest lists
+    - Each list is a contiguous float32 matrix, so a probe is one matrix-vector product
+    - Supports incremental add/remove and persistence to a .npz file
+    - Falls back to a single exact list until there are enough vectors to train;
+      training is explicit (train()) so callers can run it off the event loop
+    """
+
+    def __init__(self, dim=512, nprobe=None, min_train_size=None):
+        self.dim = dim
+        self.nprobe = nprobe if nprobe is not None else int(os.getenv('ANN_INDEX_NPROBE', 16))
+        self.min_train_size = min_train_size if min_train_size is not None else int(os.getenv('ANN_INDEX_MIN_TRAIN_SIZE', 4096))
+
+        self._lock = threading.RLock()
+        self._reset(np.zeros((1, dim), dtype=np.float32))
+        self._trained_size = 0
+
+    def _reset(self, centroids):
+        """Replace the coarse quantizer and empty every list (caller holds the lock)"""
+        nlist = centroids.shape[0]
+        self._centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self._list_vectors = [np.empty((0, self.dim), dtype=np.float32) for _ in range(nlist)]
+        self._list_sizes = [0] * nlist
+        self._list_ids = [[] for _ in range(nlist)]
+        self._location = {}
+        self._users = {}
+
+    def __len__(self):
+        return len(self._location)
+
+    @property
+    def nlist(self):
+        return self._centroids.shape[0]
+
+    @staticmethod
+    def _normalize(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def _nearest_list(self, vector):
+        if self.nlist == 1:
+            return 0
+        return int(np.argmax(self._centroids @ vector))
+
+    def add(self, embedding_id, user_id, embedding):
+        """
+        Add or replace one embedding
+
+        Args:
+            embedding_id: str, embedding document ID
+            user_id: str, owner of the embedding
+            embedding: numpy array or list (D,)
+        """
+        vector = self._normalize(embedding).reshape(-1)
+        if vector.shape[0] != self.dim:
+            raise ValueError(f"Embedding dimension {vector.shape[0]} does not match index dimension {self.dim}")
+
+        with self._lock:
+            if embedding_id in self._location:
+                self._remove(embedding_id)
+
+            list_no = self._nearest_list(vector)
+            size = self._list_sizes[list_no]
+            vectors = self._list_vectors[list_no]
+
+            # Grow the list matrix geometrically
+            if size == vectors.shape[0]:
+                grown = np.empty((max(8, size * 2), self.dim), dtype=np.float32)
+                grown[:size] = vectors[:size]
+                vectors = grown
+                self._list_vectors[list_no] = vectors
+
+            vectors[size] = vector
+            self._list_ids[list_no].append(embedding_id)
+            self._list_sizes[list_no] = size + 1
+            self._location[embedding_id] = list_no
+            self._users[embedding_id] = user_id
+
+    def add_many(self, embedding_ids, user_ids, embeddings):
+        """
+        Bulk-add embeddings, rebuilding the lists once
+
+        Args:
+            embedding_ids: list of str
+            user_ids: list of str, owner of each embedding
+            embeddings: numpy array (N, D) or list of vectors
+        """
+        if len(embedding_ids) == 0:
+            return
+
+        vectors = self._normalize(embeddings).reshape(-1, self.dim)
+
+        with self._lock:
+            for embedding_id in embedding_ids:
+                if embedding_id in self._location:
+                    self._remove(embedding_id)
+
+            ids, users, existing = self._export()
+            self._load_lists(
+                self._centroids,
+                ids + list(embedding_ids),
+                users + list(user_ids),
+                np.concatenate([existing, vectors])
+            )
+
+    def remove(self, embedding_id):
+        """
+        Remove one embedding
+
+        Args:
+            embedding_id: str, embedding document ID
+
+        Returns:
+            bool: True if it was in the index
+        """
+        with self._lock:
+            if embedding_id not in self._location:
+                return False
+            self._remove(embedding_id)
+            return True
+
+    def _remove(self, embedding_id):
+        """Swap-remove an embedding from its list (caller holds the lock)"""
+        list_no = self._location.pop(embedding_id)
+        del self._users[embedding_id]
+
+        ids = self._list_ids[list_no]
+        row = ids.index(embedding_id)
+        last = self._list_sizes[list_no] - 1
+
+        if row != last:
+            vectors = self._list_vectors[list_no]
+            vectors[row] = vectors[last]
+            ids[row] = ids[last]
+        ids.pop()
+        self._list_sizes[list_no] = last
+
+    def contains(self, embedding_id):
+        with self._lock:
+            return embedding_id in self._location
+
+    def ids(self):
+        """Snapshot of all indexed embedding IDs"""
+        with self._lock:
+            return set(self._location)
+
+    def needs_training(self):
+        """True once the index is large enough to (re)train its coarse quantizer"""
+        with self._lock:
+            size = len(self._location)
+            if size < self.min_train_size:
+                return False
+            # Retrain whenever the index has grown 4x since the last training run
+            return self._trained_size == 0 or size >= 4 * self._trained_size
+
+    def train(self, iterations=8, sample_size=32768, seed=0):
+        """
+        Re-cluster the vectors with spherical k-means and rebuild the lists
+        - Clustering runs on a snapshot without holding the lock, so searches
+          and incremental updates continue while training
+        """
+        with self._lock:
+            _, _, vectors = self._export()
+
+        size = vectors.shape[0]
+        if size == 0:
+            return
+        nlist = max(1, int(4 * np.sqrt(size)))
+
+        rng = np.random.default_rng(seed)
+        sample = vectors[rng.choice(size, min(size, sample_size), replace=False)]
+        nlist = min(nlist, sample.shape[0])
+        centroids = sample[rng.choice(sample.shape[0], nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            order = np.argsort(assignment, kind='stable')
+            clusters, starts = np.unique(assignment[order], return_index=True)
+            # Empty clusters keep their previous centroid
+            sums = centroids.copy()
+            sums[clusters] = np.add.reduceat(sample[order], starts, axis=0)
+            centroids = self._normalize(sums)
+
+        with self._lock:
+            # Reassign the current contents, including changes made while clustering
+            ids, users, vectors = self._export()
+            self._load_lists(centroids, ids, users, vectors)
+            self._trained_size = size
+
+    def _load_lists(self, centroids, ids, users, vectors):
+        """Assign vectors to lists in bulk (caller holds the lock)"""
+        self._reset(centroids)
+        if len(ids) == 0:
+            return
+
+        assignment = np.argmax(vectors @ self._centroids.T, axis=1) if self.nlist > 1 else np.zeros(len(ids), dtype=np.int64)
+        order = np.argsort(assignment, kind='stable')
+        counts = np.bincount(assignment, minlength=self.nlist)
+
+        offset = 0
+        for list_no, count in enumerate(counts):
+            rows = order[offset:offset + count]
+            offset += count
+            self._list_vectors[list_no] = np.ascontiguousarray(vectors[rows])
+            self._list_sizes[list_no] = int(count)
+            self._list_ids[list_no] = [ids[i] for i in rows]
+            for i in rows:
+                self._location[ids[i]] = list_no
+                self._users[ids[i]] = users[i]
+
+    def _export(self):
+        """All ids, users and vectors as flat arrays (caller holds the lock)"""
+        ids = []
+        vectors = []
+        for list_no, size in enumerate(self._list_sizes):
+            if size:
+                ids.extend(self._list_ids[list_no])
+                vectors.append(self._list_vectors[list_no][:size])
+        users = [self._users[embedding_id] for embedding_id in ids]
+        matrix = np.concatenate(vectors) if vectors else np.empty((0, self.dim), dtype=np.float32)
+        return ids, users, matrix
+
+    def search(self, query, k=10, nprobe=None):
+        """
+        Find the k nearest embeddings by cosine similarity
+
+        Args:
+            query: numpy array (D,)
+            k: int, number of neighbours
+            nprobe: int, number of lists to scan (default self.nprobe)
+
+        Returns:
+            list: [(embedding_id, user_id, similarity), ...] best first
+        """
+        vector = self._normalize(query).reshape(-1)
+        nprobe = nprobe or self.nprobe
+
+        with self._lock:
+            if not self._location:
+                return []
+
+            if self.nlist <= nprobe:
+                probe = range(self.nlist)
+            else:
+                probe = np.argpartition(-(self._centroids @ vector), nprobe)[:nprobe]
+
+            candidate_ids = []
+            candidate_scores = []
+            for list_no in probe:
+                size = self._list_sizes[list_no]
+                if size == 0:
+                    continue
+                candidate_scores.append(self._list_vectors[list_no][:size] @ vector)
+                candidate_ids.extend(self._list_ids[list_no])
+
+            if not candidate_ids:
+                return []
+
+            scores = np.concatenate(candidate_scores)
+            k = min(k, scores.shape[0])
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+
+            return [(candidate_ids[i], self._users[candidate_ids[i]], float(scores[i])) for i in top]
+
+    def search_users(self, query, top_k=5, nprobe=None):
+        """
+        Find the top-k distinct users for a query embedding
+
+        Args:
+            query: numpy array (D,)
+            top_k: int, number of users
+            nprobe: int, number of lists to scan
+
+        Returns:
+            list: [{'userId', 'embedding_id', 'similarity'}, ...] best first
+        """
+        # Over-fetch neighbours since one user usually owns several embeddings
+        neighbours = self.search(query, k=top_k * 8, nprobe=nprobe)
+
+        users = []
+        seen = set()
+        for embedding_id, user_id, similarity in neighbours:
+            if user_id in seen:
+                continue
+            seen.add(user_id)
+            users.append({'userId': user_id, 'embedding_id': embedding_id, 'similarity': similarity})
+            if len(users) == top_k:
+                break
+
+        return users
+
+    def on_change(self, user_id, embedding_id, document=None):
+        """
+        DatabaseHelper change listener keeping the index in sync
+
+        Args:
+            user_id: str, owner of the changed embedding
+            embedding_id: str, changed embedding ID
+            document: dict, current document or None if deleted/unknown
+        """
+        if embedding_id is None:
+            return
+
+        if document is not None and document.get('status') == 'active' and document.get('embedding') is not None:
+            embedding = decode_embedding(document['embedding'], document.get('embedding_version'))
+            self.add(embedding_id, document.get('userId', user_id), embedding)
+        else:
+            self.remove(embedding_id)
+
+    def save(self, path):
+        """
+        Persist the index to a .npz file (written atomically, safe from concurrent writers)
+
+        Args:
+            path: str, destination file
+        """
+        with self._lock:
+            ids, users, vectors = self._export()
+            centroids = self._centroids.copy()
+            trained_size = self._trained_size
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Unique temp file in the same directory: every worker may save the index at once
+        fd, tmp_path = tempfile.mkstemp(dir=directory or '.', prefix=f"{os.path.basename(path)}.", suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(
+                    f,
+                    centroids=centroids,
+                    vectors=vectors,
+                    ids=np.array(ids, dtype=str),
+                    users=np.array(users, dtype=str),
+                    trained_size=np.array(trained_size)
+                )
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def load(self, path):
+        """
+        Load an index saved with save()
+
+        Args:
+            path: str, .npz file
+
+        Returns:
+            bool: True if loaded, False if the file does not exist or is incompatible
+        """
+        if not os.path.exists(path):
+            return False
+
+        with np.load(path, allow_pickle=False) as data:
+            centroids = data['centroids']
+            vectors = data['vectors']
+            ids = data['ids'].tolist()
+            users = data['users'].tolist()
+            trained_size = int(data['trained_size'])
+
+        if centroids.shape[1] != self.dim:
+            return False
+
+        with self._lock:
+            self._load_lists(centroids, ids, users, vectors.reshape(-1, self.dim))
+            self._trained_size = trained_size
+
+        return True
+
+    def get_stats(self):
+        """
+        Get index statistics
+
+        Returns:
+            dict: size, list count and list-size spread
+        """
+        with self._lock:
+            sizes = np.array(self._list_sizes) if self._list_sizes else np.zeros(1)
+            return {
+                'embeddings': len(self._location),
+                'users': len(set(self._users.values())),
+                'nlist': self.nlist,
+                'nprobe': self.nprobe,
+                'trained_size': self._trained_size,
+                'max_list_size': int(sizes.max()),
+                'mean_list_size': float(sizes.mean())
+            }
@@ -1,36 +1,151 @@
 from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo import MongoClient
+from pymongo import MongoClient, ReadPreference
+from datetime import datetime
+import logging
 import os
 from dotenv import load_dotenv
 
+from utils.gallery_cache import GalleryCache, UserGallery
+from utils.embedding_watcher import EmbeddingChangeWatcher
+from utils.embedding_storage import EmbeddingMigrator, decode_document, encode_embedding, get_storage_mode
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Fields needed to match against stored embeddings
+MATCHING_PROJECTION = {'_id': 1, 'userId': 1, 'embedding': 1, 'embedding_version': 1, 'quality_score': 1}
+
+# Compound index every per-user lookup relies on
+USER_STATUS_INDEX = [('userId', 1), ('status', 1)]
+
+READ_PREFERENCES = {
+    'primary': ReadPreference.PRIMARY,
+    'primarypreferred': ReadPreference.PRIMARY_PREFERRED,
+    'secondary': ReadPreference.SECONDARY,
+    'secondarypreferred': ReadPreference.SECONDARY_PREFERRED,
+    'nearest': ReadPreference.NEAREST
+}
+
 class DatabaseHelper:
     """
     MongoDB database helper for face embeddings
     """
     
-    def __init__(self):
+    def __init__(self, embedding_dim=None):
+        """
+        Args:
+            embedding_dim: int, dimension of current embeddings; stored vectors of
+                           another size are left out of galleries
+        """
+        self.embedding_dim = embedding_dim
         self.mongodb_uri = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/geo_attendance')
         self.client = None
         self.db = None
+        self.embeddings_read = None
+        self.read_preference = os.getenv('MONGODB_READ_PREFERENCE', 'primary')
+        self.max_pool_size = int(os.getenv('MONGODB_MAX_POOL_SIZE', 50))
+        self.indexes_ok = None
+        self.gallery_cache = GalleryCache()
+        self.change_watcher = None
+        self.storage_mode = get_storage_mode()
+        self.migrator = None
+        self._change_listeners = [self._update_gallery]
         self._connect()
     
     def _connect(self):
-        """Connect to MongoDB"""
+        """Connect to MongoDB with a sized connection pool and bounded timeouts"""
         try:
-            self.client = AsyncIOMotorClient(self.mongodb_uri)
+            self.client = AsyncIOMotorClient(
+                self.mongodb_uri,
+                maxPoolSize=self.max_pool_size,
+                minPoolSize=int(os.getenv('MONGODB_MIN_POOL_SIZE', 0)),
+                maxIdleTimeMS=int(os.getenv('MONGODB_MAX_IDLE_TIME_MS', 60000)),
+                waitQueueTimeoutMS=int(os.getenv('MONGODB_WAIT_QUEUE_TIMEOUT_MS', 2000)),
+                serverSelectionTimeoutMS=int(os.getenv('MONGODB_SERVER_SELECTION_TIMEOUT_MS', 5000)),
+                connectTimeoutMS=int(os.getenv('MONGODB_CONNECT_TIMEOUT_MS', 5000)),
+                socketTimeoutMS=int(os.getenv('MONGODB_SOCKET_TIMEOUT_MS', 10000)),
+                retryReads=True
+            )
             self.db = self.client.get_default_database()
-            print("✅ Connected to MongoDB")
+            self.embeddings_read = self._read_collection()
+            logger.info(f"Connected to MongoDB (reads: {self.read_preference})")
+        except Exception as e:
+            logger.error(f"Error connecting to MongoDB: {str(e)}")
+    
+    def reconnect(self, max_pool_size=None):
+        """
+        Replace the client with a fresh one (e.g. in a pre-forked worker)
+        
+        Motor connects lazily, so a client created before fork never opened
+        sockets and can simply be dropped.
+        
+        Args:
+            max_pool_size: int, connection pool size for this process
+        """
+        if max_pool_size is not None:
+            self.max_pool_size = max(1, int(max_pool_size))
+        self._connect()
+    
+    def _read_collection(self):
+        """
+        face_embeddings handle for reads, honouring MONGODB_READ_PREFERENCE
+        
+        Secondary reads take load off the primary but may lag behind writes by
+        up to MONGODB_MAX_STALENESS_SECONDS; writes always go to the primary.
+        """
+        preference = READ_PREFERENCES.get(self.read_preference.lower().replace('_', ''))
+        if preference is None:
+            logger.warning(f"Unknown MONGODB_READ_PREFERENCE '{self.read_preference}', reading from primary")
+            self.read_preference = 'primary'
+            return self.db.face_embeddings
+        
+        max_staleness = int(os.getenv('MONGODB_MAX_STALENESS_SECONDS', -1))
+        if preference.mode != ReadPreference.PRIMARY.mode:
+            preference = type(preference)(max_staleness=max_staleness)
+        
+        return self.db.face_embeddings.with_options(read_preference=preference)
+    
+    async def check_indexes(self):
+        """
+        Verify the {userId: 1, status: 1} index used by every per-user query
+        
+        Creates it when MONGODB_CREATE_INDEXES=true, otherwise only warns.
+        
+        Returns:
+            bool: True if the index exists (or was created)
+        """
+        try:
+            if self.db is None:
+                return False
+            
+            indexes = await self.db.face_embeddings.index_information()
+            self.indexes_ok = any(
+                list(index['key'])[:len(USER_STATUS_INDEX)] == USER_STATUS_INDEX
+                for index in indexes.values()
+            )
+            
+            if not self.indexes_ok:
+                if os.getenv('MONGODB_CREATE_INDEXES', 'false').lower() == 'true':
+                    await self.db.face_embeddings.create_index(USER_STATUS_INDEX)
+                    self.indexes_ok = True
+                    logger.info("Created face_embeddings {userId, status} index")
+                else:
+                    logger.warning("face_embeddings has no {userId, status} index, per-user queries will scan the collection")
+            
+            return self.indexes_ok
+            
         except Exception as e:
-            print(f"❌ Error connecting to MongoDB: {str(e)}")
+            logger.error(f"Error checking indexes: {str(e)}")
+            return False
     
-    async def get_user_embeddings(self, user_id):
+    async def get_user_embeddings(self, user_id, projection=None):
         """
         Get all active face embeddings for a user
         
         Args:
             user_id: str, user ID
+            projection: dict, fields to return (defaults to MATCHING_PROJECTION)
             
         Returns:
             list: list of embedding documents
@@ -39,19 +154,214 @@ class DatabaseHelper:
             if self.db is None:
                 return []
             
-            cursor = self.db.face_embeddings.find({
-                'userId': user_id,
-                'status': 'active'
-            })
+            cursor = self.embeddings_read.find(
+                {'userId': user_id, 'status': 'active'},
+                projection or MATCHING_PROJECTION
+            )
             
             embeddings = await cursor.to_list(length=None)
             
-            return embeddings
+            return [decode_document(embedding) for embedding in embeddings]
             
         except Exception as e:
-            print(f"Error getting user embeddings: {str(e)}")
+            logger.error(f"Error getting user embeddings: {str(e)}")
             return []
     
+    async def get_user_gallery(self, user_id):
+        """
+        Get a user's active embeddings as a packed float32 matrix (cached)
+        
+        Args:
+            user_id: str, user ID
+            
+        Returns:
+            UserGallery: gallery with one row per active embedding (may be empty)
+        """
+        galleries = await self.get_user_galleries([user_id])
+        return galleries[user_id]
+    
+    async def get_user_galleries(self, user_ids, batch_size=500):
+        """
+        Get the galleries of many users, loading cache misses in batched $in queries
+        
+        Args:
+            user_ids: iterable of str, user IDs
+            batch_size: int, users per query
+            
+        Returns:
+            dict: {user_id: UserGallery} for every requested user (galleries may be empty)
+        """
+        galleries = {}
+        missing = []
+        for user_id in dict.fromkeys(user_ids):
+            gallery = self.gallery_cache.get(user_id)
+            if gallery is not None:
+                galleries[user_id] = gallery
+            else:
+                missing.append(user_id)
+        
+        if not missing:
+            return galleries
+        
+        if self.db is None:
+            galleries.update((user_id, UserGallery.from_documents(user_id, [])) for user_id in missing)
+            return galleries
+        
+        try:
+            token = self.gallery_cache.load_token()
+            
+            documents_by_user = {user_id: [] for user_id in missing}
+            for start in range(0, len(missing), batch_size):
+                cursor = self.embeddings_read.find(
+                    {'userId': {'$in': missing[start:start + batch_size]}, 'status': 'active'},
+                    MATCHING_PROJECTION
+                )
+                async for document in cursor:
+                    documents_by_user[document['userId']].append(document)
+            
+            # Built per user: a bad document only affects its own user
+            for user_id, documents in documents_by_user.items():
+                try:
+                    gallery = UserGallery.from_documents(user_id, documents, self.embedding_dim)
+                except Exception as e:
+                    logger.error(f"Error building gallery for user {user_id}: {str(e)}")
+                    galleries[user_id] = UserGallery.from_documents(user_id, [])
+                    continue
+                if len(gallery) > 0:
+                    self.gallery_cache.put(gallery, token)
+                galleries[user_id] = gallery
+            
+        except Exception as e:
+            logger.error(f"Error getting user galleries: {str(e)}")
+            galleries.update((user_id, UserGallery.from_documents(user_id, [])) for user_id in missing)
+        
+        return galleries
+    
+    async def get_active_embedding_owners(self):
+        """
+        Map every active embedding ID to its user (IDs only, no vectors)
+        
+        Returns:
+            dict: {embedding_id: user_id}, or None if the listing could not be read
+                  (callers must not mistake a failure for "no embeddings")
+        """
+        try:
+            if self.db is None:
+                return None
+            
+            cursor = self.embeddings_read.find(
+                {'status': 'active'},
+                {'_id': 1, 'userId': 1}
+            )
+            
+            owners = {}
+            async for document in cursor:
+                owners[str(document['_id'])] = document['userId']
+            
+            return owners
+            
+        except Exception as e:
+            logger.error(f"Error getting active embedding IDs: {str(e)}")
+            return None
+    
+    async def get_embeddings_by_ids(self, embedding_ids, batch_size=1000):
+        """
+        Fetch embedding vectors for many IDs in batched $in queries
+        
+        Args:
+            embedding_ids: list of str, embedding document IDs
+            batch_size: int, IDs per query
+            
+        Returns:
+            list: documents with '_id', 'userId' and 'embedding' (float32 numpy array),
+                  or None if the query failed; unreadable documents are skipped
+        """
+        try:
+            if self.db is None:
+                return None
+            
+            from bson import ObjectId
+            
+            documents = []
+            for start in range(0, len(embedding_ids), batch_size):
+                chunk = [ObjectId(embedding_id) for embedding_id in embedding_ids[start:start + batch_size]]
+                cursor = self.embeddings_read.find(
+                    {'_id': {'$in': chunk}, 'status': 'active'},
+                    MATCHING_PROJECTION
+                )
+                for document in await cursor.to_list(length=None):
+                    try:
+                        decode_document(document)
+                    except Exception as e:
+                        logger.warning(f"Skipping unreadable embedding {document['_id']}: {str(e)}")
+                        continue
+                    if self.embedding_dim is not None and document['embedding'].size != self.embedding_dim:
+                        logger.warning(f"Skipping {document['embedding'].size}-D embedding {document['_id']} (expected {self.embedding_dim}-D)")
+                        continue
+                    documents.append(document)
+            
+            return documents
+            
+        except Exception as e:
+            logger.error(f"Error getting embeddings by ID: {str(e)}")
+            return None
+    
+    def add_change_listener(self, listener):
+        """
+        Register a callback for face embedding changes
+        
+        Args:
+            listener: callable(user_id, embedding_id, document)
+        """
+        self._change_listeners.append(listener)
+    
+    def notify_change(self, user_id, embedding_id, document=None):
+        """Dispatch an embedding change to all registered listeners"""
+        for listener in self._change_listeners:
+            try:
+                listener(user_id, embedding_id, document)
+            except Exception as e:
+                logger.error(f"Error in embedding change listener: {str(e)}")
+    
+    def _update_gallery(self, user_id, embedding_id, document=None):
+        """Keep the cached gallery (and its template) in step with a change"""
+        if user_id is None and embedding_id is None:
+            self.gallery_cache.clear()
+        elif embedding_id is None:
+            self.gallery_cache.invalidate(user_id=user_id)
+        else:
+            self.gallery_cache.apply_change(user_id, embedding_id, document)
+    
+    def start_change_watcher(self):
+        """Start watching face_embeddings for writes from other services"""
+        if self.db is None or self.change_watcher is not None:
+            return
+        
+        self.change_watcher = EmbeddingChangeWatcher(self.db.face_embeddings, self.notify_change)
+        self.change_watcher.start()
+    
+    async def stop_change_watcher(self):
+        """Stop the face_embeddings watcher"""
+        if self.change_watcher is not None:
+            await self.change_watcher.stop()
+            self.change_watcher = None
+    
+    def start_migration(self):
+        """Start converting legacy array embeddings when a binary storage mode is configured"""
+        if self.db is None or self.migrator is not None or self.storage_mode == 'array':
+            return
+        
+        if os.getenv('EMBEDDING_MIGRATION', 'true').lower() != 'true':
+            return
+        
+        self.migrator = EmbeddingMigrator(self.db.face_embeddings, self.storage_mode)
+        self.migrator.start()
+    
+    async def stop_migration(self):
+        """Stop the embedding migrator"""
+        if self.migrator is not None:
+            await self.migrator.stop()
+    
     async def save_embedding(self, user_id, embedding, metadata=None):
         """
         Save face embedding to database
@@ -68,24 +378,29 @@ class DatabaseHelper:
             if self.db is None:
                 return None
             
-            # Convert numpy array to list if needed
-            if hasattr(embedding, 'tolist'):
-                embedding = embedding.tolist()
+            # Array of doubles, or packed little-endian floats (EMBEDDING_STORAGE)
+            stored_embedding, embedding_version = encode_embedding(embedding, self.storage_mode)
             
+            now = datetime.utcnow()
             document = {
                 'userId': user_id,
-                'embedding': embedding,
-                'embedding_version': 'facenet_v1',
+                'embedding': stored_embedding,
+                'embedding_version': embedding_version,
                 'status': 'active',
-                'metadata': metadata or {}
+                'metadata': metadata or {},
+                'captured_at': now,
+                'created_at': now,
+                'updated_at': now
             }
             
             result = await self.db.face_embeddings.insert_one(document)
             
+            self.notify_change(user_id, str(result.inserted_id), decode_document(dict(document)))
+            
             return str(result.inserted_id)
             
         except Exception as e:
-            print(f"Error saving embedding: {str(e)}")
+            logger.error(f"Error saving embedding: {str(e)}")
             return None
     
     async def delete_embedding(self, embedding_id):
@@ -104,15 +419,21 @@ class DatabaseHelper:
             
             from bson import ObjectId
             
-            result = await self.db.face_embeddings.update_one(
-                {'_id': ObjectId(embedding_id)},
-                {'$set': {'status': 'deleted'}}
+            document = await self.db.face_embeddings.find_one_and_update(
+                {'_id': ObjectId(embedding_id), 'status': {'$ne': 'deleted'}},
+                {'$set': {'status': 'deleted', 'updated_at': datetime.utcnow()}},
+                projection={'embedding': 0}
             )
             
-            return result.modified_count > 0
+            if document is None:
+                return False
+            
+            self.notify_change(document.get('userId'), str(embedding_id), None)
+            
+            return True
             
         except Exception as e:
-            print(f"Error deleting embedding: {str(e)}")
+            logger.error(f"Error deleting embedding: {str(e)}")
             return False
     
     async def get_embedding_by_id(self, embedding_id):
@@ -135,10 +456,10 @@ class DatabaseHelper:
                 '_id': ObjectId(embedding_id)
             })
             
-            return embedding
+            return decode_document(embedding)
             
         except Exception as e:
-            print(f"Error getting embedding: {str(e)}")
+            logger.error(f"Error getting embedding: {str(e)}")
             return None
     
     async def count_user_embeddings(self, user_id):
@@ -155,7 +476,7 @@ class DatabaseHelper:
             if self.db is None:
                 return 0
             
-            count = await self.db.face_embeddings.count_documents({
+            count = await self.embeddings_read.count_documents({
                 'userId': user_id,
                 'status': 'active'
             })
@@ -163,7 +484,7 @@ class DatabaseHelper:
             return count
             
         except Exception as e:
-            print(f"Error counting embeddings: {str(e)}")
+            logger.error(f"Error counting embeddings: {str(e)}")
             return 0
     
     def close(self):
@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# embedding_version tags; the suffix names the stored layout
+ARRAY_VERSION = 'facenet_v1'
+BINARY_VERSIONS = {
+    'float32': 'facenet_v1_f32le',
+    'float16': 'facenet_v1_f16le'
+}
+VERSION_DTYPES = {
+    'facenet_v1_f32le': np.dtype('<f4'),
+    'facenet_v1_f16le': np.dtype('<f2')
+}
+STORAGE_MODES = ('array',) + tuple(BINARY_VERSIONS)
+VALID_DIMENSIONS = (128, 512)
+
+
+def get_storage_mode():
+    """Embedding storage mode from EMBEDDING_STORAGE ('array', 'float32' or 'float16')"""
+    mode = os.getenv('EMBEDDING_STORAGE', 'array').lower()
+    if mode not in STORAGE_MODES:
+        logger.warning(f"Unknown EMBEDDING_STORAGE '{mode}', storing embeddings as arrays")
+        return 'array'
+    return mode
+
+
+def encode_embedding(embedding, mode='array'):
+    """
+    Convert an embedding to its stored form
+
+    Args:
+        embedding: list or numpy array, face embedding
+        mode: str, one of STORAGE_MODES
+
+    Returns:
+        tuple: (value for the 'embedding' field, embedding_version tag)
+    """
+    if mode == 'array':
+        if hasattr(embedding, 'tolist'):
+            embedding = embedding.tolist()
+        return list(embedding), ARRAY_VERSION
+
+    from bson.binary import Binary
+
+    version = BINARY_VERSIONS[mode]
+    packed = np.ascontiguousarray(np.asarray(embedding, dtype=np.float32).ravel(), dtype=VERSION_DTYPES[version])
+    return Binary(packed.tobytes()), version
+
+
+def decode_embedding(value, version=None):
+    """
+    Read a stored embedding as a float32 vector
+
+    Packed float32 values are viewed in place with np.frombuffer (read-only,
+    no copy); float16 values are widened to float32.
+
+    Args:
+        value: BSON array (list) or packed bytes from the 'embedding' field
+        version: str, embedding_version of the document (inferred from the size if missing)
+
+    Returns:
+        numpy array: (D,) float32 embedding
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        dtype = VERSION_DTYPES.get(version) or _infer_dtype(len(value))
+        vector = np.frombuffer(value, dtype=dtype)
+        return vector if dtype == np.float32 else vector.astype(np.float32)
+
+    return np.asarray(value, dtype=np.float32)
+
+
+def _infer_dtype(nbytes):
+    """Guess the packed dtype of a binary embedding from its byte length"""
+    for dtype in (np.dtype('<f4'), np.dtype('<f2')):
+        if nbytes % dtype.itemsize == 0 and nbytes // dtype.itemsize in VALID_DIMENSIONS:
+            return dtype
+    raise ValueError(f"Cannot decode a {nbytes}-byte embedding")
+
+
+def decode_document(document):
+    """Replace a document's stored 'embedding' with its float32 vector (in place)"""
+    if document is not None and document.get('embedding') is not None:
+        document['embedding'] = decode_embedding(document['embedding'], document.get('embedding_version'))
+    return document
+
+
+class EmbeddingMigrator:
+    """
+    Background rewrite of legacy array embeddings into the packed binary format
+    - Converts documents in small batches with a pause between them
+    - Each update only applies if the document still holds an array, so
+      concurrent writes are never overwritten
+    - Leaves updated_at untouched: the vector itself does not change
+    """
+
+    def __init__(self, collection, mode, batch_size=None, pause_seconds=None):
+        self.collection = collection
+        self.mode = mode
+        self.batch_size = batch_size if batch_size is not None else int(os.getenv('EMBEDDING_MIGRATION_BATCH_SIZE', 200))
+        self.pause_seconds = pause_seconds if pause_seconds is not None else float(os.getenv('EMBEDDING_MIGRATION_PAUSE_MS', 100)) / 1000.0
+        self.migrated = 0
+        self.failed = 0
+        self.done = False
+        self._task = None
+
+    def start(self):
+        """Start migrating in a background task on the running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop migrating (already converted documents stay converted)"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        from pymongo import UpdateOne
+
+        legacy = {'embedding': {'$type': 'array'}}
+        last_id = None
+
+        try:
+            while True:
+                query = dict(legacy)
+                if last_id is not None:
+                    query['_id'] = {'$gt': last_id}
+
+                cursor = self.collection.find(query, {'_id': 1, 'embedding': 1}).sort('_id', 1).limit(self.batch_size)
+                documents = await cursor.to_list(length=self.batch_size)
+                if not documents:
+                    break
+
+                updates = []
+                for document in documents:
+                    try:
+                        value, version = encode_embedding(document['embedding'], self.mode)
+                    except Exception:
+                        self.failed += 1
+                        continue
+                    updates.append(UpdateOne(
+                        {'_id': document['_id'], **legacy},
+                        {'$set': {'embedding': value, 'embedding_version': version}}
+                    ))
+
+                if updates:
+                    result = await self.collection.bulk_write(updates, ordered=False)
+                    self.migrated += result.modified_count
+
+                last_id = documents[-1]['_id']
+                await asyncio.sleep(self.pause_seconds)
+
+            self.done = True
+            if self.migrated:
+                logger.info(f"Migrated {self.migrated} embeddings to {BINARY_VERSIONS[self.mode]}")
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error migrating embeddings: {str(e)}")
+
+    def get_stats(self):
+        """
+        Get migration progress
+
+        Returns:
+            dict: target format, converted/failed counts and completion flag
+        """
+        return {
+            'target_version': BINARY_VERSIONS[self.mode],
+            'migrated': self.migrated,
+            'failed': self.failed,
+            'done': self.done
+        }
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingChangeWatcher:
+    """
+    Watch the face_embeddings collection for writes made by any service
+    - Uses a MongoDB change stream when running against a replica set
+    - Falls back to polling the updated_at timestamp on a standalone mongod
+    - Calls on_change(user_id, embedding_id, document) for every change;
+      user_id is None for hard deletes and document is None when unavailable
+    """
+
+    # Server error codes meaning change streams are not supported
+    CHANGE_STREAM_UNSUPPORTED = {40573, 40324, 20}
+
+    def __init__(self, collection, on_change, poll_interval=None):
+        self.collection = collection
+        self.on_change = on_change
+        self.poll_interval = poll_interval if poll_interval is not None else float(os.getenv('EMBEDDING_POLL_INTERVAL_SECONDS', 5))
+        self.mode = None
+        self._task = None
+
+    def start(self):
+        """Start watching in a background task on the running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop watching"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        try:
+            await self._watch_change_stream()
+        except asyncio.CancelledError:
+            raise
+        except OperationFailure as e:
+            if e.code not in self.CHANGE_STREAM_UNSUPPORTED:
+                logger.warning(f"Embedding change stream failed ({str(e)}), falling back to polling")
+            else:
+                logger.info("Change streams unavailable (standalone mongod), polling face_embeddings for changes")
+        except Exception as e:
+            logger.warning(f"Embedding change stream failed ({str(e)}), falling back to polling")
+
+        await self._poll()
+
+    async def _watch_change_stream(self):
+        """Consume the change stream, resuming after transient errors"""
+        resume_token = None
+        self.mode = 'change_stream'
+
+        while True:
+            try:
+                async with self.collection.watch(
+                    full_document='updateLookup',
+                    resume_after=resume_token
+                ) as stream:
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        self._dispatch_change(change)
+            except OperationFailure:
+                raise
+            except PyMongoError as e:
+                logger.warning(f"Embedding change stream interrupted: {str(e)}")
+                await asyncio.sleep(self.poll_interval)
+
+    def _dispatch_change(self, change):
+        operation = change.get('operationType')
+        embedding_id = change.get('documentKey', {}).get('_id')
+        document = change.get('fullDocument')
+
+        if operation in ('drop', 'dropDatabase', 'rename', 'invalidate'):
+            self._notify(None, None, None)
+            return
+
+        user_id = document.get('userId') if document else None
+        self._notify(user_id, embedding_id, document)
+
+    async def _poll(self):
+        """Poll for documents whose updated_at moved past the last seen watermark"""
+        self.mode = 'polling'
+        watermark = datetime.utcnow() - timedelta(seconds=self.poll_interval)
+
+        while True:
+            try:
+                cursor = self.collection.find(
+                    {'updated_at': {'$gt': watermark}}
+                ).sort('updated_at', 1)
+
+                async for document in cursor:
+                    watermark = max(watermark, document['updated_at'])
+                    self._notify(document.get('userId'), document.get('_id'), document)
+            except PyMongoError as e:
+                logger.warning(f"Error polling face_embeddings: {str(e)}")
+
+            await asyncio.sleep(self.poll_interval)
+
+    def _notify(self, user_id, embedding_id, document):
+        try:
+            self.on_change(user_id, str(embedding_id) if embedding_id is not None else None, document)
+        except Exception as e:
+            logger.error(f"Error handling embedding change: {str(e)}")
@@ -0,0 +1,76 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class InferenceExecutor:
+    """
+    Bounded thread pool for blocking CV/Torch work
+    - Keeps image decoding, MTCNN and preprocessing off the asyncio event loop
+    - OpenCV and PyTorch release the GIL, so threads run these stages in parallel
+      without duplicating the model the way a process pool would
+    - on_in_flight(count) is called whenever the number of unfinished tasks changes
+    """
+
+    def __init__(self, max_workers=None, on_in_flight=None):
+        if max_workers is None:
+            max_workers = int(os.getenv('ML_WORKER_THREADS', min(4, os.cpu_count() or 1)))
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+
+        self.max_workers = max_workers
+        self.on_in_flight = on_in_flight
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ml-worker')
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    async def run(self, func, *args, timer=None, stage=None):
+        """
+        Run a blocking function in the pool
+
+        Args:
+            func: callable to execute
+            *args: positional arguments for func
+            timer: StageTimer, optional per-request timer
+            stage: str, stage name recorded on the timer
+
+        Returns:
+            Any: return value of func
+        """
+        loop = asyncio.get_running_loop()
+
+        with self._lock:
+            self._in_flight += 1
+            self._report()
+        try:
+            future = loop.run_in_executor(self._pool, func, *args)
+            if timer is not None and stage is not None:
+                return await timer.measure_async(stage, future)
+            return await future
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._report()
+
+    def _report(self):
+        """Pass the in-flight count to on_in_flight (caller holds the lock)"""
+        if self.on_in_flight is not None:
+            self.on_in_flight(self._in_flight)
+
+    def get_stats(self):
+        """
+        Get pool statistics
+
+        Returns:
+            dict: pool size and number of submitted tasks not yet finished
+        """
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'in_flight': self._in_flight
+            }
+
+    def shutdown(self, wait=True):
+        """Shut down the worker pool"""
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,367 @@
+import logging
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+
+import numpy as np
+
+from utils.embedding_storage import decode_embedding
+
+logger = logging.getLogger(__name__)
+
+def normalize_rows(matrix):
+    """L2-normalize rows (zero rows stay zero)"""
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return (matrix / np.maximum(norms, 1e-12)).astype(np.float32)
+
+
+class UserGallery:
+    """
+    Stored face embeddings of one user packed for matching, plus the user's template
+    - matrix: contiguous (N, D) float32 array, one row per active embedding
+    - embedding_ids: embedding document IDs in row order
+    - quality_scores: (N,) float32 array of stored quality scores
+    - normalized: (N, D) float32 unit-length rows of matrix
+    - pattern_sum: (D,) float64 sum of the normalized rows; a unit query
+      dotted with pattern_sum / N is its mean cosine similarity to the patterns
+    - centroid: (D,) float32 L2-normalized pattern_sum
+    - radius: largest distance from a normalized row to the centroid; a unit
+      query scores at most (query . centroid) + radius against any pattern
+    Galleries are never modified once built: with_embedding / without_embedding
+    return a new gallery, updating pattern_sum incrementally.
+    """
+
+    def __init__(self, user_id, embedding_ids, matrix, quality_scores, normalized=None, pattern_sum=None, loaded_at=None):
+        self.user_id = user_id
+        self.embedding_ids = list(embedding_ids)
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        self.quality_scores = np.asarray(quality_scores, dtype=np.float32)
+        self.loaded_at = loaded_at if loaded_at is not None else time.monotonic()
+
+        self.normalized = normalized if normalized is not None else normalize_rows(self.matrix)
+        if pattern_sum is None:
+            pattern_sum = self.normalized.sum(axis=0, dtype=np.float64)
+        self.pattern_sum = pattern_sum
+        self.centroid = normalize_rows(pattern_sum.reshape(1, -1))[0] if len(self.embedding_ids) else np.zeros(0, dtype=np.float32)
+        self.radius = float(np.linalg.norm(self.normalized - self.centroid, axis=1).max()) if len(self.embedding_ids) else 0.0
+
+    @classmethod
+    def from_documents(cls, user_id, documents, dim=None):
+        """
+        Build a gallery from face_embeddings documents
+
+        Documents whose embedding cannot be decoded, is not finite or has another
+        dimension (e.g. a legacy 128-D vector) are logged and left out, so one bad
+        document never costs the user the rest of the gallery.
+
+        Args:
+            user_id: str, user ID
+            documents: list of dicts with '_id', 'embedding' (array or packed binary),
+                optional 'embedding_version' and 'quality_score'
+            dim: int, expected embedding dimension (default: the most common one)
+
+        Returns:
+            UserGallery: packed gallery (empty if no usable documents)
+        """
+        decoded = []
+        for doc in documents:
+            try:
+                vector = decode_embedding(doc['embedding'], doc.get('embedding_version'))
+                if vector.ndim != 1 or not np.isfinite(vector).all():
+                    raise ValueError("not a finite vector")
+                decoded.append((doc, vector))
+            except Exception as e:
+                logger.warning(f"Skipping unreadable embedding {doc.get('_id')} of user {user_id}: {str(e)}")
+
+        if decoded and dim is None:
+            dim = Counter(vector.size for _, vector in decoded).most_common(1)[0][0]
+
+        usable = []
+        for doc, vector in decoded:
+            if vector.size == dim:
+                usable.append((doc, vector))
+            else:
+                logger.warning(f"Skipping {vector.size}-D embedding {doc.get('_id')} of user {user_id} (expected {dim}-D)")
+
+        if not usable:
+            return cls(user_id, [], np.empty((0, 0), dtype=np.float32), [])
+
+        matrix = np.stack([vector for _, vector in usable])
+        quality_scores = [doc.get('quality_score') or 0.0 for doc, _ in usable]
+        embedding_ids = [str(doc['_id']) for doc, _ in usable]
+
+        return cls(user_id, embedding_ids, matrix, quality_scores)
+
+    def __len__(self):
+        return len(self.embedding_ids)
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the gallery arrays"""
+        return self.matrix.nbytes + self.normalized.nbytes + self.quality_scores.nbytes + self.pattern_sum.nbytes + self.centroid.nbytes
+
+    def with_embedding(self, embedding_id, embedding, quality_score=0.0):
+        """
+        Gallery with one embedding added (or replaced if the ID is already present)
+
+        Args:
+            embedding_id: str, embedding document ID
+            embedding: (D,) float32 vector
+            quality_score: float, stored quality score
+
+        Returns:
+            UserGallery: new gallery, or None if the dimension does not match
+        """
+        vector = np.asarray(embedding, dtype=np.float32).reshape(1, -1)
+        if len(self) and vector.shape[1] != self.matrix.shape[1]:
+            return None
+
+        gallery = self.without_embedding(embedding_id)
+        unit = normalize_rows(vector)
+        pattern_sum = unit[0].astype(np.float64) if not len(gallery) else gallery.pattern_sum + unit[0]
+
+        return UserGallery(
+            self.user_id,
+            gallery.embedding_ids + [embedding_id],
+            np.concatenate([gallery.matrix, vector]) if len(gallery) else vector,
+            np.append(gallery.quality_scores, np.float32(quality_score)),
+            normalized=np.concatenate([gallery.normalized, unit]) if len(gallery) else unit,
+            pattern_sum=pattern_sum,
+            loaded_at=self.loaded_at
+        )
+
+    def without_embedding(self, embedding_id):
+        """
+        Gallery with one embedding removed
+
+        Args:
+            embedding_id: str, embedding document ID
+
+        Returns:
+            UserGallery: new gallery (self if the ID is not in the gallery)
+        """
+        if embedding_id not in self.embedding_ids:
+            return self
+
+        row = self.embedding_ids.index(embedding_id)
+        keep = np.arange(len(self)) != row
+
+        return UserGallery(
+            self.user_id,
+            self.embedding_ids[:row] + self.embedding_ids[row + 1:],
+            self.matrix[keep],
+            self.quality_scores[keep],
+            normalized=self.normalized[keep],
+            pattern_sum=self.pattern_sum - self.normalized[row],
+            loaded_at=self.loaded_at
+        )
+
+
+class GalleryCache:
+    """
+    Process-local LRU cache of per-user embedding galleries
+    - Bounded by number of users and total matrix bytes
+    - Entries expire after a TTL as a safety net for missed invalidations
+    - Embedding writes update cached galleries in place (apply_change)
+    - Tracks hit, miss, eviction, invalidation and update counts
+    """
+
+    def __init__(self, max_users=None, max_bytes=None, ttl_seconds=None):
+        self.max_users = max_users if max_users is not None else int(os.getenv('GALLERY_CACHE_MAX_USERS', 10000))
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv('GALLERY_CACHE_MAX_MB', 256)) * 1024 * 1024
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv('GALLERY_CACHE_TTL_SECONDS', 600))
+
+        self._entries = OrderedDict()
+        self._embedding_owner = {}
+        self._bytes = 0
+        self._version = 0
+        self._lock = threading.Lock()
+
+        # Metrics
+        self._hits = 0
+        self._misses = 0
+        self._expirations = 0
+        self._evictions = 0
+        self._invalidations = 0
+        self._updates = 0
+
+    def get(self, user_id):
+        """
+        Look up a user's gallery
+
+        Args:
+            user_id: str, user ID
+
+        Returns:
+            UserGallery: cached gallery or None on miss/expiry
+        """
+        with self._lock:
+            gallery = self._entries.get(user_id)
+
+            if gallery is None:
+                self._misses += 1
+                return None
+
+            if self.ttl_seconds > 0 and time.monotonic() - gallery.loaded_at > self.ttl_seconds:
+                self._remove(user_id)
+                self._expirations += 1
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(user_id)
+            self._hits += 1
+            return gallery
+
+    def load_token(self):
+        """
+        Token to take before loading a gallery from the database
+
+        Returns:
+            int: current invalidation version, passed back to put()
+        """
+        with self._lock:
+            return self._version
+
+    def put(self, gallery, token=None):
+        """
+        Store a user's gallery, evicting least recently used users if needed
+
+        Args:
+            gallery: UserGallery
+            token: int from load_token(); the gallery is dropped if an
+                invalidation arrived while it was being loaded
+        """
+        with self._lock:
+            if token is not None and token != self._version:
+                return
+
+            if gallery.user_id in self._entries:
+                self._remove(gallery.user_id)
+
+            # Never cache a single gallery larger than the whole budget
+            if gallery.nbytes > self.max_bytes:
+                return
+
+            self._insert(gallery)
+
+            while self._entries and (len(self._entries) > self.max_users or self._bytes > self.max_bytes):
+                oldest_user = next(iter(self._entries))
+                self._remove(oldest_user)
+                self._evictions += 1
+
+    def apply_change(self, user_id, embedding_id, document=None):
+        """
+        Update a cached gallery for one embedding write instead of dropping it
+
+        Args:
+            user_id: str, owner of the changed embedding (None if unknown)
+            embedding_id: str, changed embedding ID
+            document: dict, current document (None if deleted or unknown); an
+                active document with an embedding adds or replaces its row,
+                anything else removes the row
+
+        Returns:
+            bool: True if a cached gallery was updated
+        """
+        if document is not None and document.get('status') == 'active' and document.get('embedding') is not None:
+            embedding = decode_embedding(document['embedding'], document.get('embedding_version'))
+            change = lambda gallery: gallery.with_embedding(embedding_id, embedding, document.get('quality_score') or 0.0)
+        else:
+            change = lambda gallery: gallery.without_embedding(embedding_id)
+
+        with self._lock:
+            # Loads already in flight may have missed this write
+            self._version += 1
+
+            if user_id is None:
+                user_id = self._embedding_owner.get(str(embedding_id))
+
+            gallery = self._entries.get(user_id)
+            if gallery is None:
+                return False
+
+            updated = change(gallery)
+            if updated is gallery:
+                return False
+
+            self._remove(user_id)
+            if updated is None or len(updated) == 0 or updated.nbytes > self.max_bytes:
+                self._invalidations += 1
+                return False
+
+            self._insert(updated)
+            self._updates += 1
+            return True
+
+    def invalidate(self, user_id=None, embedding_id=None):
+        """
+        Drop a cached gallery
+
+        Args:
+            user_id: str, user whose gallery changed
+            embedding_id: str, changed embedding (used when the user is unknown)
+
+        Returns:
+            bool: True if an entry was removed
+        """
+        with self._lock:
+            self._version += 1
+
+            if user_id is None and embedding_id is not None:
+                user_id = self._embedding_owner.get(str(embedding_id))
+
+            if user_id is None or user_id not in self._entries:
+                return False
+
+            self._remove(user_id)
+            self._invalidations += 1
+            return True
+
+    def clear(self):
+        """Drop every cached gallery"""
+        with self._lock:
+            self._version += 1
+            self._invalidations += len(self._entries)
+            self._entries.clear()
+            self._embedding_owner.clear()
+            self._bytes = 0
+
+    def _insert(self, gallery):
+        """Add an entry as most recently used (caller holds the lock)"""
+        self._entries[gallery.user_id] = gallery
+        self._bytes += gallery.nbytes
+        for embedding_id in gallery.embedding_ids:
+            self._embedding_owner[embedding_id] = gallery.user_id
+
+    def _remove(self, user_id):
+        """Remove an entry (caller holds the lock)"""
+        gallery = self._entries.pop(user_id)
+        self._bytes -= gallery.nbytes
+        for embedding_id in gallery.embedding_ids:
+            if self._embedding_owner.get(embedding_id) == user_id:
+                del self._embedding_owner[embedding_id]
+
+    def get_stats(self):
+        """
+        Get cache metrics
+
+        Returns:
+            dict: size, memory and hit/miss counters
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'users': len(self._entries),
+                'bytes': self._bytes,
+                'max_users': self.max_users,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': (self._hits / lookups) if lookups else 0.0,
+                'expirations': self._expirations,
+                'evictions': self._evictions,
+                'invalidations': self._invalidations,
+                'updates': self._updates
+            }
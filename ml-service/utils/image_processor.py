@@ -3,46 +3,393 @@ import numpy as np
 import base64
 from PIL import Image
 import io
+import logging
 import os
+import struct
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Actionable messages for frames rejected by the quality gate
+QUALITY_MESSAGES = {
+    'too_dark': "Image is too dark. Move to a brighter place or face a light source.",
+    'too_bright': "Image is overexposed. Avoid strong light shining directly into the camera.",
+    'face_too_small': "Face is too small. Move closer to the camera.",
+    'too_blurry': "Image is too blurry. Hold the camera steady and make sure your face is in focus."
+}
+
+# Smallest face (px) the default Haar cascade can detect
+HAAR_WINDOW = 24
+
+# Faces are resized to this side before measuring blur, so sharpness does not depend on face size
+SHARPNESS_FACE_SIZE = 64
 
 class ImageProcessor:
     """
     Image processing utilities for face recognition
     """
     
-    def __init__(self):
+    def __init__(self, on_gate=None):
+        """
+        Args:
+            on_gate: callable(result, elapsed_ms), called after every quality gate check
+        """
         self.max_image_size = int(os.getenv('MAX_IMAGE_SIZE', 2048))
+        self.detection_max_size = int(os.getenv('DETECTION_MAX_SIZE', 640))
+        # Group photos keep more resolution so small faces stay above MTCNN's 20 px minimum (0 = full size)
+        self.group_detection_max_size = int(os.getenv('GROUP_DETECTION_MAX_SIZE', 1280))
         self.allowed_formats = ['jpg', 'jpeg', 'png']
+        
+        # Pre-inference quality gate (measured on a small grayscale copy)
+        self.quality_gate_enabled = os.getenv('QUALITY_GATE_ENABLED', 'true').lower() == 'true'
+        self.quality_gate_size = int(os.getenv('QUALITY_GATE_SIZE', 240))
+        self.min_brightness = float(os.getenv('QUALITY_MIN_BRIGHTNESS', 40))
+        self.max_brightness = float(os.getenv('QUALITY_MAX_BRIGHTNESS', 220))
+        self.min_sharpness = float(os.getenv('QUALITY_MIN_SHARPNESS', 25))
+        self.min_face_size = int(os.getenv('QUALITY_MIN_FACE_SIZE', 80))
+        
+        # Corrections are applied only to frames that pass but need them
+        self.normalize_below = float(os.getenv('QUALITY_NORMALIZE_BELOW', 80))
+        self.normalize_above = float(os.getenv('QUALITY_NORMALIZE_ABOVE', 180))
+        self.enhance_below_contrast = float(os.getenv('QUALITY_ENHANCE_BELOW_CONTRAST', 35))
+        
+        self.face_cascade_path = os.getenv(
+            'FACE_CASCADE_PATH', os.path.join(getattr(cv2, 'data', None) and cv2.data.haarcascades or '', 'haarcascade_frontalface_default.xml')
+        )
+        self.on_gate = on_gate
+        self._local = threading.local()
+        self._cascade_available = hasattr(cv2, 'CascadeClassifier') and os.path.exists(self.face_cascade_path)
+        if self.quality_gate_enabled and not self._cascade_available:
+            logger.warning(f"Face cascade unavailable ({self.face_cascade_path}); quality gate will skip the face size check")
+        
+        # Gate statistics (checks run concurrently in the worker pool)
+        self._gate_lock = threading.Lock()
+        self._gate_checked = 0
+        self._gate_results = {}
+        self._gate_corrections = {}
+        self._gate_total_ms = 0.0
     
-    def decode_base64(self, base64_string):
+    def base64_to_bytes(self, base64_string):
         """
-        Decode base64 string to image
+        Decode a base64 string (optionally a data URL) to the encoded image bytes
         
         Args:
             base64_string: str, base64 encoded image
             
         Returns:
-            numpy array: decoded image in BGR format
+            bytes: encoded image file or None
         """
         try:
             # Remove data URL prefix if present
             if 'base64,' in base64_string:
                 base64_string = base64_string.split('base64,')[1]
             
-            # Decode base64
-            image_bytes = base64.b64decode(base64_string)
+            return base64.b64decode(base64_string)
+            
+        except Exception as e:
+            logger.error(f"Error decoding base64 image: {str(e)}")
+            return None
+    
+    def decode_base64(self, base64_string):
+        """
+        Decode base64 string to image
+        
+        Args:
+            base64_string: str, base64 encoded image
+            
+        Returns:
+            numpy array: decoded image in BGR format
+        """
+        image_bytes = self.base64_to_bytes(base64_string)
+        
+        if image_bytes is None:
+            return None
+        
+        # Decode image
+        return self.decode_bytes(image_bytes)
+    
+    def decode_bytes(self, image_bytes):
+        """
+        Decode raw encoded image bytes (JPEG/PNG) to image
+        
+        Args:
+            image_bytes: bytes, bytearray or memoryview holding the encoded file
             
-            # Convert to numpy array
+        Returns:
+            numpy array: decoded image in BGR format
+        """
+        try:
+            # Wrap the buffer without copying it
             nparr = np.frombuffer(image_bytes, np.uint8)
             
+            # Let libjpeg scale large JPEGs down while decoding (DCT scaling)
+            header = self.read_image_header(image_bytes)
+            flags = cv2.IMREAD_COLOR
+            if header is not None and header['format'] == 'jpeg':
+                flags = self._reduced_decode_flag(max(header['width'], header['height']))
+            
             # Decode image
-            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            image = cv2.imdecode(nparr, flags)
             
-            return image
+            if image is None:
+                return None
+            
+            # Bound whatever is left (PNGs, non power-of-two ratios) to MAX_IMAGE_SIZE
+            return self.resize_image(image, self.max_image_size)
             
         except Exception as e:
-            print(f"Error decoding base64 image: {str(e)}")
+            logger.error(f"Error decoding image bytes: {str(e)}")
+            return None
+    
+    def decode_scale(self, image_bytes, image):
+        """
+        Factor mapping coordinates in a decode_bytes image back to the uploaded image
+        
+        Args:
+            image_bytes: bytes, the encoded file passed to decode_bytes
+            image: numpy array, the decoded image (or None)
+            
+        Returns:
+            float: original = decoded * scale (1.0 unless the upload was reduced while decoding)
+        """
+        header = self.read_image_header(image_bytes) if image_bytes else None
+        
+        if header is None or image is None:
+            return 1.0
+        
+        return max(header['width'], header['height']) / float(max(image.shape[:2]))
+    
+    def _reduced_decode_flag(self, longest_side):
+        """Pick the smallest IMREAD_REDUCED_COLOR_* factor that fits the image within MAX_IMAGE_SIZE"""
+        for factor, flag in ((1, cv2.IMREAD_COLOR),
+                             (2, cv2.IMREAD_REDUCED_COLOR_2),
+                             (4, cv2.IMREAD_REDUCED_COLOR_4)):
+            if longest_side / factor <= self.max_image_size:
+                return flag
+        return cv2.IMREAD_REDUCED_COLOR_8
+    
+    def read_image_header(self, image_bytes):
+        """
+        Read format and dimensions from a JPEG or PNG header without decoding
+        
+        Args:
+            image_bytes: bytes, bytearray or memoryview holding the encoded file
+            
+        Returns:
+            dict: {'format', 'width', 'height'} or None if unknown
+        """
+        data = memoryview(image_bytes)
+        
+        if len(data) >= 24 and data[:8] == b'\x89PNG\r\n\x1a\n':
+            width, height = struct.unpack('>II', data[16:24])
+            return {'format': 'png', 'width': width, 'height': height}
+        
+        if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
             return None
+        
+        # Walk JPEG markers up to the start-of-frame segment
+        i = 2
+        while i + 9 < len(data):
+            if data[i] != 0xFF:
+                i += 1
+                continue
+            marker = data[i + 1]
+            if marker == 0xFF:
+                i += 1
+                continue
+            if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+                i += 2
+                continue
+            if marker in (0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF):
+                height, width = struct.unpack('>HH', data[i + 5:i + 9])
+                return {'format': 'jpeg', 'width': width, 'height': height}
+            if marker == 0xDA:
+                return None
+            segment_length = struct.unpack('>H', data[i + 2:i + 4])[0]
+            i += 2 + segment_length
+        
+        return None
+    
+    def prepare_detection_image(self, image, max_size=None):
+        """
+        Downscale an image for face detection
+        
+        Args:
+            image: numpy array (BGR format)
+            max_size: int, longest side of the detection image (default DETECTION_MAX_SIZE)
+            
+        Returns:
+            tuple: (detection_image, scale) where original = detection * scale
+        """
+        if max_size is None:
+            max_size = self.detection_max_size
+        
+        height, width = image.shape[:2]
+        longest_side = max(height, width)
+        
+        if max_size <= 0 or longest_side <= max_size:
+            return image, 1.0
+        
+        scale = longest_side / float(max_size)
+        size = (max(1, int(round(width / scale))), max(1, int(round(height / scale))))
+        small = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        
+        return small, scale
+    
+    def _face_cascade(self):
+        """Haar cascade for the calling thread (CascadeClassifier is not thread-safe)"""
+        cascade = getattr(self._local, 'cascade', None)
+        if cascade is None:
+            cascade = cv2.CascadeClassifier(self.face_cascade_path)
+            self._local.cascade = cascade
+        return cascade
+    
+    def check_quality(self, image, check_face_size=True):
+        """
+        Cheap pre-inference quality gate: brightness, face size and blur
+        
+        Runs on a small grayscale copy (QUALITY_GATE_SIZE, or just fine enough
+        for the Haar cascade to see a QUALITY_MIN_FACE_SIZE face), so it costs
+        a fraction of an MTCNN pass and rejects unusable frames before any CNN
+        runs. Brightness is checked on the whole frame; blur and the correction
+        hints on the largest face the cascade finds (the whole frame if it finds
+        none, in which case detection is left to MTCNN).
+        
+        Args:
+            image: numpy array (BGR format)
+            check_face_size: bool, reject faces smaller than QUALITY_MIN_FACE_SIZE
+                             (off for group photos)
+            
+        Returns:
+            dict: {'passed', 'reason', 'message', 'brightness', 'contrast',
+                   'sharpness', 'face_size', 'corrections', 'elapsed_ms'}
+        """
+        result = {
+            'passed': True,
+            'reason': None,
+            'message': None,
+            'brightness': None,
+            'contrast': None,
+            'sharpness': None,
+            'face_size': None,
+            'corrections': []
+        }
+        
+        if not self.quality_gate_enabled:
+            result['elapsed_ms'] = 0.0
+            return result
+        
+        start = time.perf_counter()
+        
+        # Gate resolution, but fine enough for the cascade to see a face of QUALITY_MIN_FACE_SIZE
+        detect_faces = check_face_size and self._cascade_available
+        longest_side = max(image.shape[:2])
+        scale = longest_side / float(self.quality_gate_size)
+        if detect_faces:
+            scale = min(scale, self.min_face_size / float(HAAR_WINDOW))
+        
+        small, scale = self.prepare_detection_image(image, int(round(longest_side / scale)) if scale > 1 else 0)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        
+        brightness = float(gray.mean())
+        result['brightness'] = round(brightness, 1)
+        
+        if brightness < self.min_brightness:
+            result['reason'] = 'too_dark'
+        elif brightness > self.max_brightness:
+            result['reason'] = 'too_bright'
+        else:
+            region = gray
+            if detect_faces:
+                faces = self._face_cascade().detectMultiScale(gray, scaleFactor=1.2, minNeighbors=4)
+                if len(faces) > 0:
+                    x, y, w, h = max(faces, key=lambda face: face[2] * face[3])
+                    region = cv2.resize(gray[y:y + h, x:x + w], (SHARPNESS_FACE_SIZE, SHARPNESS_FACE_SIZE), interpolation=cv2.INTER_AREA)
+                    result['face_size'] = int(round(min(w, h) * scale))
+            
+            if result['face_size'] is not None and result['face_size'] < self.min_face_size:
+                result['reason'] = 'face_too_small'
+            else:
+                sharpness = float(cv2.Laplacian(region, cv2.CV_64F).var())
+                result['sharpness'] = round(sharpness, 1)
+                
+                if sharpness < self.min_sharpness:
+                    result['reason'] = 'too_blurry'
+                else:
+                    # Lighting/contrast corrections, only where they help the face
+                    region_brightness = float(region.mean())
+                    contrast = float(region.std())
+                    result['contrast'] = round(contrast, 1)
+                    
+                    if region_brightness < self.normalize_below or region_brightness > self.normalize_above:
+                        result['corrections'].append('normalize_lighting')
+                    elif contrast < self.enhance_below_contrast:
+                        result['corrections'].append('enhance')
+        
+        if result['reason'] is not None:
+            result['passed'] = False
+            result['message'] = QUALITY_MESSAGES[result['reason']]
+        
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+        result['elapsed_ms'] = round(elapsed_ms, 3)
+        self._record_gate(result, elapsed_ms)
+        
+        return result
+    
+    def apply_corrections(self, image, quality):
+        """
+        Apply the lighting/contrast corrections the quality gate asked for
+        
+        Args:
+            image: numpy array (BGR format)
+            quality: dict returned by check_quality
+            
+        Returns:
+            numpy array: corrected image (the input itself if none were needed)
+        """
+        for correction in quality['corrections']:
+            if correction == 'normalize_lighting':
+                image = self.normalize_lighting(image)
+            elif correction == 'enhance':
+                image = self.enhance_image(image)
+        return image
+    
+    def _record_gate(self, result, elapsed_ms):
+        outcome = result['reason'] or 'passed'
+        with self._gate_lock:
+            self._gate_checked += 1
+            self._gate_total_ms += elapsed_ms
+            self._gate_results[outcome] = self._gate_results.get(outcome, 0) + 1
+            for correction in result['corrections']:
+                self._gate_corrections[correction] = self._gate_corrections.get(correction, 0) + 1
+        
+        if self.on_gate is not None:
+            self.on_gate(outcome, elapsed_ms)
+    
+    def get_quality_stats(self):
+        """
+        Get quality gate statistics
+        
+        Returns:
+            dict: checks, results by reason, rejection rate, corrections applied and mean gate time
+        """
+        with self._gate_lock:
+            checked = self._gate_checked
+            results = dict(self._gate_results)
+            corrections = dict(self._gate_corrections)
+            total_ms = self._gate_total_ms
+        
+        rejected = checked - results.get('passed', 0)
+        return {
+            'enabled': self.quality_gate_enabled,
+            'face_size_check': self._cascade_available,
+            'checked': checked,
+            'results': results,
+            'rejection_rate': round(rejected / checked, 4) if checked else 0.0,
+            'corrections': corrections,
+            'avg_ms': round(total_ms / checked, 3) if checked else 0.0
+        }
     
     def encode_base64(self, image):
         """
@@ -64,7 +411,7 @@ class ImageProcessor:
             return base64_string
             
         except Exception as e:
-            print(f"Error encoding image to base64: {str(e)}")
+            logger.error(f"Error encoding image to base64: {str(e)}")
             return None
     
     def is_valid_image(self, image):
@@ -78,22 +425,22 @@ class ImageProcessor:
             bool: True if valid, False otherwise
         """
         if image is None:
-            print("❌ Image is None")
+            logger.warning("Image is None")
             return False
         
         if not isinstance(image, np.ndarray):
-            print(f"❌ Image is not numpy array, got {type(image)}")
+            logger.warning(f"Image is not numpy array, got {type(image)}")
             return False
         
         if len(image.shape) != 3:
-            print(f"❌ Image shape invalid: {image.shape}, expected 3 dimensions")
+            logger.warning(f"Image shape invalid: {image.shape}, expected 3 dimensions")
             return False
         
         if image.shape[2] != 3:
-            print(f"❌ Image channels invalid: {image.shape[2]}, expected 3 (BGR)")
+            logger.warning(f"Image channels invalid: {image.shape[2]}, expected 3 (BGR)")
             return False
         
-        print(f"✅ Valid image: {image.shape}")
+        logger.debug("Valid image: %s", image.shape)
         return True
     
     def resize_image(self, image, max_size=None):
@@ -131,7 +478,7 @@ class ImageProcessor:
             return resized
             
         except Exception as e:
-            print(f"Error resizing image: {str(e)}")
+            logger.error(f"Error resizing image: {str(e)}")
             return image
     
     def enhance_image(self, image):
@@ -164,7 +511,7 @@ class ImageProcessor:
             return enhanced
             
         except Exception as e:
-            print(f"Error enhancing image: {str(e)}")
+            logger.error(f"Error enhancing image: {str(e)}")
             return image
     
     def normalize_lighting(self, image):
@@ -190,7 +537,7 @@ class ImageProcessor:
             return normalized
             
         except Exception as e:
-            print(f"Error normalizing lighting: {str(e)}")
+            logger.error(f"Error normalizing lighting: {str(e)}")
             return image
     
     def crop_face(self, image, face_box, margin=0.2):
@@ -227,7 +574,7 @@ class ImageProcessor:
             return cropped
             
         except Exception as e:
-            print(f"Error cropping face: {str(e)}")
+            logger.error(f"Error cropping face: {str(e)}")
             return image
 
 import os
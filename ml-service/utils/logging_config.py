@@ -0,0 +1,54 @@
+import logging
+import os
+import sys
+
+LOG_LEVELS = {
+    'DEBUG': logging.DEBUG,
+    'INFO': logging.INFO,
+    'WARNING': logging.WARNING,
+    'ERROR': logging.ERROR,
+    'CRITICAL': logging.CRITICAL
+}
+
+
+def configure_logging(level=None, log_format=None):
+    """
+    Configure leveled logging for the ML service
+
+    - LOG_LEVEL: DEBUG, INFO (default), WARNING, ERROR, CRITICAL or OFF
+    - LOG_FORMAT: 'json' (default, one JSON object per line) or 'text'
+    - Extra fields passed with logger.info(..., extra={...}) become JSON keys
+
+    Args:
+        level: str, overrides LOG_LEVEL
+        log_format: str, overrides LOG_FORMAT
+    """
+    level = (level or os.getenv('LOG_LEVEL', 'INFO')).upper()
+    log_format = (log_format or os.getenv('LOG_FORMAT', 'json')).lower()
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+    if level == 'OFF':
+        root.addHandler(logging.NullHandler())
+        root.setLevel(logging.CRITICAL + 1)
+        return
+
+    handler = logging.StreamHandler(sys.stdout)
+
+    if log_format == 'json':
+        try:
+            from pythonjsonlogger import jsonlogger
+            formatter = jsonlogger.JsonFormatter(
+                '%(asctime)s %(levelname)s %(name)s %(message)s',
+                rename_fields={'asctime': 'time', 'levelname': 'level', 'name': 'logger'}
+            )
+        except ImportError:
+            formatter = logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s')
+    else:
+        formatter = logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    handler.setFormatter(formatter)
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVELS.get(level, logging.INFO))
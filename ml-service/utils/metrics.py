@@ -0,0 +1,166 @@
+import os
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+
+# Millisecond-scale pipeline stages up to multi-second cold paths
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+STAGE_SECONDS = Histogram(
+    'ml_stage_duration_seconds',
+    'Duration of one pipeline stage of a request',
+    ['stage'],
+    buckets=LATENCY_BUCKETS
+)
+
+REQUEST_SECONDS = Histogram(
+    'ml_request_duration_seconds',
+    'End-to-end HTTP request duration',
+    ['endpoint', 'status'],
+    buckets=LATENCY_BUCKETS
+)
+
+OUTCOMES = Counter(
+    'ml_outcomes_total',
+    'Request (or batch item) outcomes: success, match, no_match, no_face, invalid_image, not_enrolled, error, '
+    'rejected by the quality gate: too_dark, too_bright, face_too_small, too_blurry, '
+    'or shed by admission control: queue_full, queue_timeout, preempted',
+    ['endpoint', 'outcome']
+)
+
+QUEUE_WAIT_SECONDS = Histogram(
+    'ml_admission_queue_wait_seconds',
+    'Time an inference request waited for an admission slot',
+    ['endpoint'],
+    buckets=(0.0, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+
+QUALITY_GATE = Counter(
+    'ml_quality_gate_total',
+    'Pre-inference quality gate checks by result: passed, too_dark, too_bright, face_too_small, too_blurry',
+    ['result']
+)
+
+QUALITY_GATE_SECONDS = Histogram(
+    'ml_quality_gate_duration_seconds',
+    'Duration of one pre-inference quality gate check',
+    buckets=LATENCY_BUCKETS
+)
+
+FAST_DETECTIONS = Counter(
+    'ml_fast_detections_total',
+    'Fast first-stage face detector attempts by result: accepted, or the MTCNN fallback reason '
+    '(no_face, multiple_faces, low_confidence, error)',
+    ['detector', 'result']
+)
+
+STREAM_FRAMES = Counter(
+    'ml_stream_frames_total',
+    'Frames received by streaming verification sessions by result: match, no_match, no_face, invalid_image, '
+    'a quality gate reason, busy (shed by admission control) or skipped (superseded by a newer frame)',
+    ['result']
+)
+
+STREAM_DECISION_SECONDS = Histogram(
+    'ml_stream_time_to_decision_seconds',
+    'Time from the start of a streaming verification session to its decision',
+    ['decision'],
+    buckets=LATENCY_BUCKETS
+)
+
+STREAM_FRAMES_PER_DECISION = Histogram(
+    'ml_stream_frames_per_decision',
+    'Frames run through the pipeline per streaming verification session',
+    buckets=(1, 2, 3, 4, 6, 8, 12, 16, 24, 32)
+)
+
+FORWARD_SECONDS = Histogram(
+    'ml_forward_pass_duration_seconds',
+    'Duration of one batched FaceNet forward pass',
+    buckets=LATENCY_BUCKETS
+)
+
+BATCH_SIZE = Histogram(
+    'ml_forward_pass_batch_size',
+    'Faces per FaceNet forward pass',
+    buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+
+# Updated where the value changes (set_function gauges read 0 in multiprocess mode)
+# and summed over live workers when PROMETHEUS_MULTIPROC_DIR is set (pre-fork serving)
+IN_FLIGHT = Gauge('ml_requests_in_flight', 'HTTP requests currently being handled', multiprocess_mode='livesum')
+QUEUE_DEPTH = Gauge('ml_batch_queue_depth', 'Faces waiting in the batch scheduler queue', multiprocess_mode='livesum')
+EXECUTOR_IN_FLIGHT = Gauge('ml_executor_in_flight', 'Tasks submitted to the CV worker pool and not yet finished', multiprocess_mode='livesum')
+ADMISSION_ACTIVE = Gauge('ml_admission_active', 'Inference requests holding an admission slot', multiprocess_mode='livesum')
+ADMISSION_QUEUED = Gauge('ml_admission_queued', 'Inference requests waiting for an admission slot', multiprocess_mode='livesum')
+
+
+def observe_stage(stage, elapsed_ms):
+    """StageStats hook: record one stage duration"""
+    STAGE_SECONDS.labels(stage=stage).observe(elapsed_ms / 1000.0)
+
+
+def observe_forward_pass(batch_size, elapsed_ms):
+    """BatchScheduler hook: record one forward pass"""
+    FORWARD_SECONDS.observe(elapsed_ms / 1000.0)
+    BATCH_SIZE.observe(batch_size)
+
+
+def observe_queue_wait(endpoint, wait_ms):
+    """AdmissionController hook: record how long a request waited for a slot"""
+    QUEUE_WAIT_SECONDS.labels(endpoint=endpoint).observe(wait_ms / 1000.0)
+
+
+def observe_admission_load(active, queued):
+    """AdmissionController hook: current slot holders and waiters"""
+    ADMISSION_ACTIVE.set(active)
+    ADMISSION_QUEUED.set(queued)
+
+
+def observe_quality_gate(result, elapsed_ms):
+    """ImageProcessor hook: record one quality gate check"""
+    QUALITY_GATE.labels(result=result).inc()
+    QUALITY_GATE_SECONDS.observe(elapsed_ms / 1000.0)
+
+
+def observe_face_detection(detector, result):
+    """FaceEncoder hook: record one fast detector attempt"""
+    FAST_DETECTIONS.labels(detector=detector, result=result).inc()
+
+
+def observe_stream_decision(decision, elapsed_ms, frames_processed):
+    """Record the decision of one streaming verification session"""
+    STREAM_DECISION_SECONDS.labels(decision=decision).observe(elapsed_ms / 1000.0)
+    STREAM_FRAMES_PER_DECISION.observe(frames_processed)
+
+
+def record_outcome(endpoint, outcome):
+    """Count one request or batch item outcome"""
+    OUTCOMES.labels(endpoint=endpoint, outcome=outcome).inc()
+
+
+def render_metrics():
+    """
+    Render every metric in the Prometheus text format
+
+    With PROMETHEUS_MULTIPROC_DIR set, values from every worker process are
+    aggregated, so any worker can answer the scrape.
+
+    Returns:
+        tuple: (payload bytes, content type)
+    """
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid):
+    """Drop the live gauges of an exited worker (gunicorn child_exit)"""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(pid)
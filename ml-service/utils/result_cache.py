@@ -0,0 +1,129 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def content_hash(data):
+    """
+    Fast hash of raw image bytes
+
+    Args:
+        data: bytes, encoded image as uploaded
+
+    Returns:
+        str: 32-character hex BLAKE2b digest
+    """
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class FaceResultCache:
+    """
+    Process-local LRU cache of detection + embedding results keyed by image hash
+    - Lets retried or resubmitted frames skip decode, MTCNN and FaceNet
+    - Only successful results (a face was found) are cached
+    - Bounded by entry count, entries expire after a TTL; max_entries=0 disables it
+    - Tracks hit, miss, expiration and eviction counts
+    """
+
+    def __init__(self, max_entries=None, ttl_seconds=None):
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv('RESULT_CACHE_MAX_ENTRIES', 1024))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv('RESULT_CACHE_TTL_SECONDS', 300))
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Metrics
+        self._hits = 0
+        self._misses = 0
+        self._expirations = 0
+        self._evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def get(self, image_hash):
+        """
+        Look up the result for an image
+
+        Args:
+            image_hash: str, content_hash() of the image bytes
+
+        Returns:
+            dict: {'box', 'probability', 'embedding', 'decode_scale'} or None on miss/expiry
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(image_hash)
+
+            if entry is None:
+                self._misses += 1
+                return None
+
+            stored_at, result = entry
+            if self.ttl_seconds > 0 and time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[image_hash]
+                self._expirations += 1
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(image_hash)
+            self._hits += 1
+            return dict(result)
+
+    def put(self, image_hash, result):
+        """
+        Store the result for an image, evicting the least recently used entries
+
+        Args:
+            image_hash: str, content_hash() of the image bytes
+            result: dict with 'box', 'probability', 'embedding' and 'decode_scale' (other keys are dropped)
+        """
+        if not self.enabled:
+            return
+
+        embedding = result['embedding']
+        embedding.setflags(write=False)
+        entry = (time.monotonic(), {
+            'box': tuple(result['box']),
+            'probability': result['probability'],
+            'embedding': embedding,
+            'decode_scale': result['decode_scale']
+        })
+
+        with self._lock:
+            self._entries[image_hash] = entry
+            self._entries.move_to_end(image_hash)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self):
+        """Drop every cached result"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        """
+        Get cache metrics
+
+        Returns:
+            dict: size, limits and hit/miss counters
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': (self._hits / lookups) if lookups else 0.0,
+                'expirations': self._expirations,
+                'evictions': self._evictions
+            }
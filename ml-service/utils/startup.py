@@ -0,0 +1,69 @@
+import threading
+import time
+from contextlib import contextmanager
+
+STARTUP_STATES = ('starting', 'loading', 'warming_up', 'ready', 'failed')
+
+
+class StartupTracker:
+    """
+    Cold-start progress of the ML service
+    - state moves starting -> loading -> warming_up -> ready (or failed)
+    - measure(component) records the import or load time of each component
+    - ready only once the models are loaded and the warm-up pass has run
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self.state = 'starting'
+        self.error = None
+        self.components = {}
+        self.ready_after_ms = None
+
+    @property
+    def ready(self):
+        return self.state == 'ready'
+
+    def set_state(self, state):
+        if state not in STARTUP_STATES:
+            raise ValueError(f"Unknown startup state '{state}'")
+        with self._lock:
+            self.state = state
+            if state == 'ready':
+                self.ready_after_ms = round((time.perf_counter() - self._started) * 1000.0, 1)
+
+    def fail(self, error):
+        with self._lock:
+            self.state = 'failed'
+            self.error = str(error)
+
+    def record(self, component, elapsed_ms):
+        """Record the import/load duration of one component in milliseconds"""
+        with self._lock:
+            self.components[component] = round(elapsed_ms, 1)
+
+    @contextmanager
+    def measure(self, component):
+        """Time a block as one startup component"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(component, (time.perf_counter() - start) * 1000.0)
+
+    def get_stats(self):
+        """
+        Get startup progress
+
+        Returns:
+            dict: state, per-component milliseconds, time to ready and error (if any)
+        """
+        with self._lock:
+            return {
+                'state': self.state,
+                'components_ms': dict(self.components),
+                'ready_after_ms': self.ready_after_ms,
+                'uptime_s': round(time.perf_counter() - self._started, 1),
+                'error': self.error
+            }
@@ -0,0 +1,82 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StageStats:
+    """
+    Aggregated per-stage latency statistics shared across requests
+    - on_record(stage, elapsed_ms) is called for every measurement (e.g. to export metrics)
+    """
+
+    def __init__(self, on_record=None):
+        self._lock = threading.Lock()
+        self._stages = {}
+        self.on_record = on_record
+
+    def record(self, stage, elapsed_ms):
+        """Record one stage duration in milliseconds"""
+        if self.on_record is not None:
+            self.on_record(stage, elapsed_ms)
+
+        with self._lock:
+            entry = self._stages.get(stage)
+            if entry is None:
+                entry = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+                self._stages[stage] = entry
+            entry['count'] += 1
+            entry['total_ms'] += elapsed_ms
+            entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+
+    def get_stats(self):
+        """
+        Get aggregated stage timings
+
+        Returns:
+            dict: {stage: {'count', 'avg_ms', 'max_ms'}}
+        """
+        with self._lock:
+            return {
+                stage: {
+                    'count': entry['count'],
+                    'avg_ms': entry['total_ms'] / entry['count'] if entry['count'] else 0.0,
+                    'max_ms': entry['max_ms']
+                }
+                for stage, entry in self._stages.items()
+            }
+
+
+class StageTimer:
+    """
+    Per-request stage timer
+    - Collects wall-clock duration of each pipeline stage in milliseconds
+    - Forwards every measurement to a shared StageStats aggregator
+    """
+
+    def __init__(self, stats=None):
+        self.stats = stats
+        self.timings = {}
+
+    def record(self, stage, elapsed_ms):
+        """Record a stage duration (repeated stages are summed)"""
+        self.timings[stage] = self.timings.get(stage, 0.0) + elapsed_ms
+        if self.stats is not None:
+            self.stats.record(stage, elapsed_ms)
+
+    @contextmanager
+    def measure(self, stage):
+        """Context manager timing the enclosed block as one stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, (time.perf_counter() - start) * 1000.0)
+
+    async def measure_async(self, stage, awaitable):
+        """Await a coroutine or future and time it as one stage"""
+        with self.measure(stage):
+            return await awaitable
+
+    def as_dict(self):
+        """Stage timings rounded for API responses"""
+        return {stage: round(ms, 2) for stage, ms in self.timings.items()}